@@ -1,18 +1,27 @@
 from backend.models.agenda import Agenda, Decision, Expectation, Goal, Step
-from backend.models.effectors import Callback, Effector
+from backend.models.effectors import Callback, Capability, CapabilityExecutor, Effector, EffectorPool, EffectorTelemetry, TimerWheel
 from backend.models.environment import Environment
+from backend.models.mps import Deferred, MPRegistry
+from backend.models.output import TemplateRegistry
 from backend.models.statement import TransientFrame
-from backend.models.tmr import TMR
+from backend.models.tmr import TMR, TMRFrame
 from backend.models.vmr import VMR
 from backend.models.xmr import XMR
 from backend.utils.AgentLogger import AgentLogger, CachedAgentLogger
+from backend.utils.IngestPool import IngestPool, parse
+from backend.utils.InputQueue import InputQueue
+from backend.utils.SlotIndex import SlotFillerIndex
 from ontograph import graph
 from ontograph.Frame import Frame
 from ontograph.Index import Identifier
 from ontograph.Query import IsAComparator, Query
 from ontograph.Space import Space
+from collections import deque
 from typing import Any, List, Union
 
+import os
+import time
+
 
 class Agent(object):
     """
@@ -39,6 +48,12 @@ class Agent(object):
         self.input_memory = []
         self.action_queue = []
 
+        self._executor: CapabilityExecutor = None
+        self._ingest_pool: IngestPool = None
+        self._inbox = deque()
+        self._input_queue = InputQueue()
+        self._timeouts = TimerWheel()
+
         self._logger = CachedAgentLogger()
 
     def logger(self, logger=None) -> AgentLogger:
@@ -117,60 +132,169 @@ class Agent(object):
         # If input is visual input, create VMR, else create tmr and continue
         if type == "VISUAL":
             xmr = VMR.from_json(input, source=source)
-            xmr.update_environment(self.env())
-            xmr.update_memory(self.wo_memory)
         else:
             xmr = TMR.from_json(input, source=source)
 
-        # Takes graph obj and writes it to the network
-        # registered_xMR = self.register(input)
+        self._register_input(xmr)
+
+    def queue_input(self, input: dict, source: Union[str, Identifier, Frame]=None, type: str=None, timeout: float=None):
+        """
+        Queues an input to be registered at the start of the next Decide; safe to call from any thread.  The queue is
+        bounded by the INPUT_QUEUE_BOUND preference (0, the default, is unbounded), and overflows according to the
+        INPUT_QUEUE_POLICY preference (BLOCK, DROP-OLDEST or COALESCE; see InputQueue).  The preferences are read on the
+        loop thread, once per Decide (see configure_input_queue), so a change takes effect from the next cycle.
+
+        :raises queue.Full: if the policy is to block, and the timeout elapses first
+        """
+
+        self.input_queue().put(input, source=source, type=type, timeout=timeout)
+
+    def input_queue(self) -> InputQueue:
+        return self._input_queue
+
+    def configure_input_queue(self):
+        # The queue itself is never replaced; it is reconfigured under its own lock, so request threads blocked on it
+        # (or racing a drain) see the new bound and policy consistently
+        bound = self.preference("INPUT_QUEUE_BOUND", 0)
+        policy = InputQueue.Policy(self.preference("INPUT_QUEUE_POLICY", InputQueue.Policy.BLOCK.value))
+        if bound != self._input_queue.bound or policy != self._input_queue.policy:
+            self._input_queue.configure(bound, policy)
+
+    def ingest(self, batch: List[dict], source: Union[str, Identifier, Frame]=None, type: str=None) -> List[XMR]:
+        """
+        Ingests many analyses and / or observations at once.  Each input is parsed into a detached batch of index rows
+        on the agent's ingest pool (of INGEST_WORKERS processes; by default, one per core; see IngestPool), and the
+        batches are committed to the graph, and registered as inputs, in arrival order.  Namespaces are assigned up front from TMR.counter and
+        VMR.counter, so they are the same as if each input had been given to _input in turn.
+
+        :param batch: TMR or VMR dicts
+        :param source: The source of every input
+        :param type: "VISUAL" or "LANGUAGE" for every input; if omitted, inputs with a "tmr" key are treated as language
+        """
+
+        jobs = []
+        for input in batch:
+            visual = type == "VISUAL" if type is not None else "tmr" not in input
+            if visual:
+                jobs.append((XMR.Type.VISUAL.name, input, "VMR#" + str(VMR.counter.increment()), None))
+            else:
+                jobs.append((XMR.Type.LANGUAGE.name, input, "TMR#" + str(TMR.counter.increment()), TMRFrame.slot_kinds))
+
+        if len(jobs) == 0:
+            return []
+
+        # The slot kind table is built once here, so that workers do not need the ontology
+        TMRFrame.slot_kinds.references()
+
+        pool = self.ingest_pool()
+        if pool is not None and len(jobs) > 1:
+            rows = pool.map(jobs)
+        else:
+            rows = map(parse, jobs)
+
+        xmrs = []
+        for (kind, input, _, _), input_rows in zip(jobs, rows):
+            if kind == XMR.Type.VISUAL.name:
+                xmr = VMR.from_rows(input_rows, source=source)
+            else:
+                xmr = TMR.from_rows(input_rows, input, source=source)
+            self._register_input(xmr)
+            xmrs.append(xmr)
+
+        return xmrs
+
+    def ingest_pool(self) -> Union[IngestPool, None]:
+        # Kept between calls (and replaced only if INGEST_WORKERS changes); there is no pool with fewer than 2 workers
+        workers = self.preference("INGEST_WORKERS", os.cpu_count() or 1)
+        if self._ingest_pool is not None and self._ingest_pool.workers != workers:
+            self._ingest_pool.shutdown()
+            self._ingest_pool = None
+        if self._ingest_pool is None and workers > 1:
+            self._ingest_pool = IngestPool(workers)
+        return self._ingest_pool
+
+    def _register_input(self, xmr: XMR):
+        if isinstance(xmr, VMR):
+            xmr.update_environment(self.env())
+            xmr.update_memory(self.wo_memory)
 
         self.identity["HAS-INPUT"] += xmr.frame
 
     def _decide(self):
+        # Inputs queued by the service since the last cycle are all registered here, in the order they arrived
+        self.configure_input_queue()
+        for input, source, type in self.input_queue().drain():
+            self._input(input=input, source=source, type=type)
+
         agenda = self.agenda()
         agenda.fire_triggers()
 
         priority_weight = self.preference("PRIORITY_WEIGHT", 0.5)
         resources_weight = self.preference("RESOURCES_WEIGHT", 0.5)
 
+        # Asynchronous MPs that have not finished within MP_TIMEOUT seconds are cancelled, so one MP that never
+        # resolves cannot stall the loop
+        timeout = self.preference("MP_TIMEOUT", 30.0)
+
+        # Plan selection MPs (which may be asynchronous) are all started before any are waited on
         goals = agenda.goals(pending=True, active=True)
+        selections = []
         for goal in goals:
             for plan in goal.plans():
-                if plan.select(goal):
-                    step = list(filter(lambda step: step.is_pending(), plan.steps()))[0]
+                selections.append((goal, plan, plan.select(goal, wait=False)))
+        selected = Deferred.wait_all(list(map(lambda s: s[2], selections)), timeout=timeout)
 
-                    existing_decisions = self.decisions()
-                    existing_decisions = filter(lambda d: d.goal().frame == goal.frame, existing_decisions)
-                    existing_decisions = filter(lambda d: d.plan() == plan, existing_decisions)
-                    existing_decisions = filter(lambda d: d.step() == step, existing_decisions)
+        for (goal, plan, pending), is_selected in zip(selections, selected):
+            if isinstance(pending, Deferred) and pending.timed_out():
+                self.logger().log("Plan selection for " + plan.frame.id + " timed out")
+                continue
+            if is_selected:
+                step = list(filter(lambda step: step.is_pending(), plan.steps()))[0]
 
-                    if len(list(existing_decisions)) > 0:
-                        continue
+                existing_decisions = self.decisions()
+                existing_decisions = filter(lambda d: d.goal().frame == goal.frame, existing_decisions)
+                existing_decisions = filter(lambda d: d.plan() == plan, existing_decisions)
+                existing_decisions = filter(lambda d: d.step() == step, existing_decisions)
 
-                    decision = Decision.build(self.internal, goal, plan, step)
-                    self.identity["HAS-DECISION"] += decision.frame
+                if len(list(existing_decisions)) > 0:
+                    continue
+
+                decision = Decision.build(self.internal, goal, plan, step)
+                self.identity["HAS-DECISION"] += decision.frame
+
+        # Likewise, priority and resources MPs for every pending decision are awaited together before scoring
+        EffectorTelemetry.retain(self.decisions())
 
         decisions = list(filter(lambda decision: decision.status() == Decision.Status.PENDING, self.decisions()))
+        pending = []
         for decision in decisions:
-            decision.inspect()
+            pending.append(decision.inspect(wait=False))
+        Deferred.wait_all([deferred for inspection in pending for deferred in inspection], timeout=timeout)
 
-        decisions = list(filter(lambda decision: decision.status() != Decision.Status.BLOCKED, decisions))
+        for decision, inspection in zip(decisions, pending):
+            if any(map(lambda deferred: isinstance(deferred, Deferred) and deferred.timed_out(), inspection)):
+                self.logger().log("Decision " + decision.frame.id + " timed out")
+                decision.timed_out()
+
+        decisions = list(filter(lambda decision: decision.status() not in [Decision.Status.BLOCKED, Decision.Status.TIMED_OUT], decisions))
 
         decisions = sorted(decisions, key=lambda d: (d.priority() * priority_weight) - (d.cost() * resources_weight), reverse=True)
-        effectors = self.effectors()
+        # Pools are matched against each capability once, and then allocate one of their free slots by policy
+        sources = self._effector_sources()
 
         selected_goals = []
         for decision in decisions:
             effector_map = {}
 
             for output in decision.outputs():
-                candidate_effectors = list(effectors)
-                candidate_effectors = list(filter(lambda effector: effector.is_free(), candidate_effectors))
-                candidate_effectors = list(filter(lambda effector: output.capability() in effector.capabilities(), candidate_effectors))
-                candidate_effectors = list(filter(lambda effector: effector not in effector_map.values(), candidate_effectors))
-                if len(candidate_effectors) > 0:
-                    effector_map[output.frame.id] = candidate_effectors[0]
+                capability = output.capability()
+                for source in sources:
+                    if capability not in source.capabilities():
+                        continue
+                    effector = source.allocate(exclude=list(effector_map.values()))
+                    if effector is not None:
+                        effector_map[output.frame.id] = effector
+                        break
 
             if len(effector_map) == len(decision.outputs()) and decision.goal().frame.id not in selected_goals:
                 selected_goals.append(decision.goal().frame.id)
@@ -180,7 +304,8 @@ class Agent(object):
                     effector = effector_map[output.frame.id]
                     effector.reserve(decision, output, output.capability())
             else:
-                decision.decline()
+                unavailable = list(map(lambda output: output.capability().frame, filter(lambda output: output.frame.id not in effector_map, decision.outputs())))
+                decision.decline(unavailable=unavailable)
         for goal in selected_goals:
             Goal(Frame(goal)).status(Goal.Status.ACTIVE)
         for decision in self.decisions():
@@ -195,10 +320,32 @@ class Agent(object):
     def _assess(self):
         reassess = False
 
-        for decision in self.decisions():
-            for callback in decision.callbacks():
-                if callback.status() == Callback.Status.RECEIVED:
-                    callback.process()
+        # Failures posted by capabilities running on worker threads are handled here, on the loop thread: the effector is
+        # released, and the callback failed (unless it was delivered or timed out first)
+        for failure in self.executor().drain():
+            self.logger().log("Capability " + failure.capability.frame.id + " failed on " + failure.effector.frame.id + ": " + str(failure.error))
+            self._timeouts.cancel(failure.callback.frame.id)
+            if self._exists(failure.callback.frame.id) and failure.callback.status() == Callback.Status.WAITING:
+                failure.callback.failed()
+
+        # Only callbacks delivered since the last assessment are processed; the inbox is drained in bulk
+        for callback in self.delivered_callbacks(drain=True):
+            self._timeouts.cancel(callback.frame.id)
+            if callback.status() == Callback.Status.TIMED_OUT or callback.status() == Callback.Status.FAILED:
+                continue
+            callback.received()
+            callback.process()
+
+        # Callbacks that have not been delivered within their capability's timeout release their effectors; the decision
+        # is released for replanning once any other outstanding callbacks have been processed
+        for id in self._timeouts.expire():
+            if not self._exists(id):
+                continue
+            callback = Callback(Frame(id))
+            if callback.status() != Callback.Status.WAITING:
+                continue
+            self.logger().log("Callback " + id + " timed out on " + callback.effector().frame.id)
+            callback.timed_out()
 
         for decision in self.decisions():
             for expectation in decision.expectations():
@@ -210,6 +357,12 @@ class Agent(object):
                     self.agenda().add_goal(impasse)
 
         for decision in list(filter(lambda decision: decision.status() == Decision.Status.EXECUTING, self.decisions())):
+            if len(decision.callbacks()) == 0 and len(decision.failures()) > 0:
+                decision.decline()
+                continue
+            if len(decision.callbacks()) == 0 and len(decision.timeouts()) > 0:
+                decision.frame["STATUS"] = Decision.Status.PENDING
+                continue
             if len(decision.callbacks()) == 0 and len(list(filter(lambda e: e.status() != Expectation.Status.SATISFIED, decision.expectations()))) == 0:
                 decision.frame["STATUS"] = Decision.Status.FINISHED
                 decision.step().frame["STATUS"] = Step.Status.FINISHED
@@ -219,6 +372,8 @@ class Agent(object):
             outputs = decision.outputs()
             for output in outputs:
                 output.frame.delete()
+            for callback in decision.timeouts() + decision.failures():
+                callback.frame.delete()
             decision.frame.delete()
             for output in outputs:
                 output.frame.delete()
@@ -244,6 +399,38 @@ class Agent(object):
                 continue
             transient_frame.delete()
 
+        self._retain_inputs()
+
+    def _retain_inputs(self):
+        # Processed inputs beyond the INPUT_RETENTION_COUNT most recent, or processed more than INPUT_RETENTION_SECONDS
+        # ago, are evicted: by default their spaces are removed and their XMR frames archived with a rendering (so the
+        # I/O history is intact); with INPUT_RETENTION_MODE = "DELETE" the XMR frames are removed too.  Neither
+        # preference is set by default, so all inputs are retained.
+        count = self.preference("INPUT_RETENTION_COUNT", None)
+        seconds = self.preference("INPUT_RETENTION_SECONDS", None)
+        if count is None and seconds is None:
+            return
+
+        inputs = map(lambda input: XMR.from_instance(input), self.identity["HAS-INPUT"])
+        processed = list(filter(lambda input: input.status() != XMR.InputStatus.RECEIVED, inputs))
+
+        evicted = {}
+        if count is not None:
+            for input in processed[:max(0, len(processed) - count)]:
+                evicted[input.frame.id] = input
+        if seconds is not None:
+            cutoff = time.time() - seconds
+            for input in filter(lambda input: input.processed() < cutoff, processed):
+                evicted[input.frame.id] = input
+
+        archive = self.preference("INPUT_RETENTION_MODE", "ARCHIVE") != "DELETE"
+        for input in evicted.values():
+            self.identity["HAS-INPUT"] -= input.frame
+            if archive:
+                input.archive()
+            else:
+                input.discard()
+
     def agenda(self):
         return Agenda(self.identity)
 
@@ -251,10 +438,22 @@ class Agent(object):
         return list(map(lambda decision: Decision(decision), self.identity["HAS-DECISION"]))
 
     def env(self):
-        return Environment(self.environment)
+        return Environment.of(self.environment)
 
     def effectors(self) -> List[Effector]:
-        return list(map(lambda e: Effector(e), self.identity["HAS-EFFECTOR"]))
+        effectors = []
+        for source in self._effector_sources():
+            if isinstance(source, EffectorPool):
+                effectors.extend(source.slots())
+            else:
+                effectors.append(source)
+        return effectors
+
+    def effector_pools(self) -> List[EffectorPool]:
+        return list(filter(lambda source: isinstance(source, EffectorPool), self._effector_sources()))
+
+    def _effector_sources(self) -> List[Union[Effector, EffectorPool]]:
+        return list(map(lambda e: EffectorPool(e) if e ^ "@EXE.EFFECTOR-POOL" else Effector(e), self.identity["HAS-EFFECTOR"]))
 
     def pending_inputs(self) -> List[Space]:
         inputs = map(lambda input: XMR(input), self.identity["HAS-INPUT"])
@@ -263,15 +462,51 @@ class Agent(object):
 
         return list(inputs)
 
+    def executor(self) -> CapabilityExecutor:
+        workers = self.preference("EFFECTOR_WORKERS", 0)
+        if self._executor is None or self._executor.workers != workers:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._executor = CapabilityExecutor(workers=workers)
+        return self._executor
+
+    def telemetry(self, effector: Union[str, Identifier, Frame, Effector]=None, capability: Union[str, Identifier, Frame, Capability]=None) -> dict:
+        if isinstance(effector, Effector):
+            effector = effector.frame
+        if isinstance(capability, Capability):
+            capability = capability.frame
+        return EffectorTelemetry.stats(effector=effector, capability=capability)
+
+    def timeouts(self) -> TimerWheel:
+        return self._timeouts
+
     def callback(self, callback: Union[str, Identifier, Frame, 'Callback']):
-        if isinstance(callback, str):
-            callback = Frame(callback)
-        if isinstance(callback, Identifier):
-            callback = Frame(callback.id)
-        if isinstance(callback, Frame):
-            callback = Callback(callback)
+        # Safe to call from any thread (service requests, capability workers); the graph is not touched until Assess
+        if isinstance(callback, Callback):
+            callback = callback.frame
+        if isinstance(callback, Frame) or isinstance(callback, Identifier):
+            callback = callback.id
+
+        self._inbox.append(callback)
+
+    def delivered_callbacks(self, drain: bool=False) -> List[Callback]:
+        if drain:
+            delivered = []
+            while True:
+                try:
+                    delivered.append(self._inbox.popleft())
+                except IndexError:
+                    break
+        else:
+            delivered = list(self._inbox)
+
+        # Duplicate deliveries, and callbacks whose frames have since been removed, are ignored
+        delivered = list(dict.fromkeys(filter(self._exists, delivered)))
+        return list(map(lambda id: Callback(Frame(id)), delivered))
 
-        callback.received()
+    def _exists(self, id: str) -> bool:
+        space = id.lstrip("@").split(".")[0]
+        return space in graph and id in Space(space)
 
     def preference(self, property: str, default: Any):
         if property in self.identity:
@@ -279,7 +514,23 @@ class Agent(object):
         return default
 
     def reset(self):
+        # Loop state from before the reset (undelivered callbacks, pending timeouts, queued inputs, telemetry) refers
+        # to frames in the old graph, so is discarded along with it
+        self._inbox.clear()
+        self._timeouts = TimerWheel()
+        self._input_queue.drain()
+        if self._executor is not None:
+            self._executor.drain()
+        if self._ingest_pool is not None:
+            self._ingest_pool.shutdown()
+            self._ingest_pool = None
+        EffectorTelemetry.clear()
+
         graph.reset()
+        Environment.clear_shared()
+        SlotFillerIndex.clear()
+        TemplateRegistry.clear()
+        MPRegistry.clear_memo()
         self._bootstrap()
 
     def _bootstrap(self):
@@ -303,4 +554,4 @@ class Agent(object):
 
     def __iter__(self):
         for space in self.spaces():
-            yield space
\ No newline at end of file
+            yield space
@@ -1,3 +1,8 @@
-from backend.Agent import Agent
-agent = Agent()
-# agent = None
\ No newline at end of file
+import multiprocessing
+
+# Worker processes (see IngestPool) import the package only for its parsing code, and so do not build an agent
+if multiprocessing.current_process().name == "MainProcess":
+    from backend.Agent import Agent
+    agent = Agent()
+else:
+    agent = None
@@ -1,3 +1,4 @@
+from backend.models.mps import Deferred
 from backend.models.statement import AssertStatement, Statement, StatementScope, VariableMap
 from enum import Enum
 from functools import reduce
@@ -192,13 +193,11 @@ class Goal(VariableMap):
     def effects(self) -> List['Effect']:
         return list(map(lambda effect: Effect(effect), self.frame["HAS-EFFECT"]))
 
-    def priority(self):
+    def priority(self, wait: bool=True):
         try:
             stmt: Statement = Statement.from_instance(self.frame["PRIORITY", Role.LOC].singleton())
-            priority = stmt.run(StatementScope(), self)
-
-            self.frame["_PRIORITY"] = priority
-            return priority
+            priority = stmt.run(StatementScope(defer=not wait), self)
+            return Deferred.chain(priority, self._cache_priority)
         except: pass # Not a Statement
 
         try:
@@ -212,18 +211,20 @@ class Goal(VariableMap):
             self.frame["_PRIORITY"] = priority
             return priority
 
+    def _cache_priority(self, priority):
+        self.frame["_PRIORITY"] = priority
+        return priority
+
     def _cached_priority(self):
         if "_PRIORITY" in self.frame:
             return self.frame["_PRIORITY"].singleton()
         return 0.0
 
-    def resources(self):
+    def resources(self, wait: bool=True):
         try:
             stmt: Statement = Statement.from_instance(self.frame["RESOURCES"].singleton())
-            resources = stmt.run(StatementScope(), self)
-
-            self.frame["_RESOURCES"] = resources
-            return resources
+            resources = stmt.run(StatementScope(defer=not wait), self)
+            return Deferred.chain(resources, self._cache_resources)
         except: pass # Not a Statement
 
         try:
@@ -237,6 +238,10 @@ class Goal(VariableMap):
             self.frame["_RESOURCES"] = resources
             return resources
 
+    def _cache_resources(self, resources):
+        self.frame["_RESOURCES"] = resources
+        return resources
+
     def _cached_resources(self):
         if "_RESOURCES" in self.frame:
             return self.frame["_RESOURCES"].singleton()
@@ -334,16 +339,16 @@ class Plan(object):
             return self.frame["NEGATE"].singleton()
         return False
 
-    def select(self, varmap: VariableMap) -> bool:
+    def select(self, varmap: VariableMap, wait: bool=True) -> Union[bool, Deferred]:
         if self.is_default():
             return True
 
         if "SELECT" in self.frame:
             select = self.frame["SELECT"].singleton()
             if isinstance(select, Frame) and (select ^ "@EXE.BOOLEAN-STATEMENT" or select ^ "@EXE.MP-STATEMENT"):
-                result = Statement.from_instance(select).run(StatementScope(), varmap)
+                result = Statement.from_instance(select).run(StatementScope(defer=not wait), varmap)
                 if self.is_negated():
-                    result = not result
+                    result = Deferred.chain(result, lambda r: not r)
                 return result
         return False
 
@@ -645,6 +650,7 @@ class Decision(object):
         BLOCKED = "BLOCKED"
         EXECUTING = "EXECUTING"
         FINISHED = "FINISHED"
+        TIMED_OUT = "TIMED_OUT"
 
     '''
     EXE.DECISION = {
@@ -656,9 +662,11 @@ class Decision(object):
       HAS-PRIORITY? Literal(dbl);
       HAS-COST?     Literal(dbl);
       REQUIRES*     ^EXE.CAPABILITY;
-      STATUS        Literal(str[PENDING | SELECTED | DECLINED | BLOCKED | EXECUTING | FINISHED]);
+      STATUS        Literal(str[PENDING | SELECTED | DECLINED | BLOCKED | EXECUTING | FINISHED | TIMED_OUT]);
       HAS-EFFECTOR* ^EXE.EFFECTOR;
       HAS-CALLBACK* ^EXE.CALLBACK;
+      HAS-TIMEOUT*  ^EXE.CALLBACK;
+      HAS-FAILURE*  ^EXE.CALLBACK;
     }
     '''
 
@@ -732,16 +740,37 @@ class Decision(object):
         from backend.models.effectors import Callback
         return list(map(lambda c: Callback(c), self.frame["HAS-CALLBACK"]))
 
+    def timeouts(self) -> List['Callback']:
+        from backend.models.effectors import Callback
+        return list(map(lambda c: Callback(c), self.frame["HAS-TIMEOUT"]))
+
+    def failures(self) -> List['Callback']:
+        from backend.models.effectors import Callback
+        return list(map(lambda c: Callback(c), self.frame["HAS-FAILURE"]))
+
     def select(self):
+        from backend.models.effectors import EffectorTelemetry
         self.frame["STATUS"] = Decision.Status.SELECTED
+        EffectorTelemetry.selected(self)
 
-    def decline(self):
+    def decline(self, unavailable: List[Union[str, Identifier, Frame]]=None):
+        # Optionally, the capabilities for which no effector was free (the decline is recorded against these alone)
+        from backend.models.effectors import EffectorTelemetry
         self.frame["STATUS"] = Decision.Status.DECLINED
+        EffectorTelemetry.declined(self, unavailable)
+
+    def timed_out(self):
+        # Its priority or cost MPs did not finish within the MP timeout; like a declined decision, it is removed (and the
+        # step left to be planned again) at the next assessment.
+        self.frame["STATUS"] = Decision.Status.TIMED_OUT
 
-    def inspect(self):
+    def inspect(self, wait: bool=True) -> List[Any]:
         self._generate_outputs()
-        self._calculate_priority()
-        self._calculate_cost()
+        pending = [self._calculate_priority(wait=False), self._calculate_cost(wait=False)]
+
+        if wait:
+            return Deferred.wait_all(pending)
+        return pending
 
     def _generate_outputs(self):
         try:
@@ -755,14 +784,26 @@ class Decision(object):
                 self.goal().frame["HAS-GOAL"] += impasse
             self.frame["STATUS"] = Decision.Status.BLOCKED
 
-    def _calculate_priority(self):
-        self.frame["HAS-PRIORITY"] = self.goal().priority()
+    def _calculate_priority(self, wait: bool=True) -> Union[float, Deferred]:
+        def record(priority):
+            self.frame["HAS-PRIORITY"] = priority
+            return priority
+
+        priority = Deferred.chain(self.goal().priority(wait=False), record)
+        return Deferred.resolve(priority) if wait else priority
+
+    def _calculate_cost(self, wait: bool=True) -> Union[float, Deferred]:
+        def record(cost):
+            self.frame["HAS-COST"] = cost
+            return cost
 
-    def _calculate_cost(self):
-        self.frame["HAS-COST"] = self.goal().resources()
+        cost = Deferred.chain(self.goal().resources(wait=False), record)
+        return Deferred.resolve(cost) if wait else cost
 
     def execute(self, agent: 'Agent', effectors: List['Effector']):
-        from backend.models.effectors import Callback
+        from backend.models.effectors import Callback, CapabilityExecutor
+
+        executor = CapabilityExecutor() if agent is None else agent.executor()
 
         self.frame["STATUS"] = Decision.Status.EXECUTING
 
@@ -773,13 +814,27 @@ class Decision(object):
             callback = Callback.build(self.frame.space(), self, effector)
             self.frame["HAS-CALLBACK"] += callback.frame
 
-            effector.on_capability().run(agent, effector.on_output(), callback)
-            effector.on_output().frame["TIMESTAMP"] = time.time()
+            timeout = effector.on_capability().timeout()
+            if agent is not None and timeout is not None:
+                agent.timeouts().schedule(callback.frame.id, timeout)
+
+            executor.dispatch(agent, effector, callback)
+            effector.on_output().set_timestamp(time.time())
 
     def callback_received(self, callback: 'Callback'):
         self.frame["HAS-EFFECTOR"] -= callback.effector().frame
         self.frame["HAS-CALLBACK"] -= callback.frame
 
+    def callback_timed_out(self, callback: 'Callback'):
+        self.frame["HAS-EFFECTOR"] -= callback.effector().frame
+        self.frame["HAS-CALLBACK"] -= callback.frame
+        self.frame["HAS-TIMEOUT"] += callback.frame
+
+    def callback_failed(self, callback: 'Callback'):
+        self.frame["HAS-EFFECTOR"] -= callback.effector().frame
+        self.frame["HAS-CALLBACK"] -= callback.frame
+        self.frame["HAS-FAILURE"] += callback.frame
+
     def assess_impasses(self):
         self.frame["HAS-IMPASSE"] = list(map(lambda i: i.frame, filter(lambda i: not i.is_satisfied(), self.impasses())))
 
@@ -1,16 +1,23 @@
 from backend.models.agenda import Decision
 from backend.models.mps import MPRegistry
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 from ontograph.Frame import Frame
 from ontograph.Index import Identifier
 from ontograph.Space import Space
-from typing import Callable, List, Union
+from typing import Callable, Dict, List, Union
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from backend.agent import Agent
     from backend.models.xmr import XMR
 
+import heapq
+import math
+import queue
+import threading
+import time
+
 
 class Effector(object):
 
@@ -66,6 +73,28 @@ class Effector(object):
     def capabilities(self) -> List["Capability"]:
         return list(map(lambda c: Capability(c), self.frame["HAS-CAPABILITY"]))
 
+    def reservations(self) -> int:
+        if "RESERVATIONS" not in self.frame:
+            return 0
+        return self.frame["RESERVATIONS"].singleton()
+
+    def last_reserved(self) -> float:
+        if "LAST-RESERVED" not in self.frame:
+            return 0.0
+        return self.frame["LAST-RESERVED"].singleton()
+
+    def pool(self) -> Union['EffectorPool', None]:
+        if "SLOT-OF" not in self.frame:
+            return None
+        return EffectorPool(self.frame["SLOT-OF"].singleton())
+
+    def allocate(self, exclude: List['Effector']=None) -> Union['Effector', None]:
+        if not self.is_free():
+            return None
+        if exclude is not None and self in exclude:
+            return None
+        return self
+
     def on_decision(self) -> Union[Decision, None]:
         if "ON-DECISION" not in self.frame:
             return None
@@ -98,13 +127,26 @@ class Effector(object):
         self.frame["ON-DECISION"] = decision
         self.frame["ON-OUTPUT"] = output
         self.frame["ON-CAPABILITY"] = capability
+        self.frame["RESERVATIONS"] = self.reservations() + 1
+        self.frame["LAST-RESERVED"] = time.time()
+
+        if self.pool() is not None:
+            self.pool().reserved(self)
+
+        EffectorTelemetry.reserved(self.frame, capability)
 
     def release(self):
+        if "ON-CAPABILITY" in self.frame:
+            EffectorTelemetry.released(self.frame, self.frame["ON-CAPABILITY"].singleton())
+
         self.frame["STATUS"] = Effector.Status.FREE
         del self.frame["ON-DECISION"]
         del self.frame["ON-OUTPUT"]
         del self.frame["ON-CAPABILITY"]
 
+        if self.pool() is not None:
+            self.pool().released(self)
+
     def __eq__(self, other):
         if isinstance(other, Effector):
             return self.frame == other.frame
@@ -113,6 +155,180 @@ class Effector(object):
         return super().__eq__(other)
 
 
+class EffectorPool(object):
+
+    # A single declaration standing in for a number of identical effectors.  The pool holds one effector frame per slot
+    # (created once, when the pool is created or its knowledge is loaded; see materialize), so reservations, callbacks
+    # and timeouts work on slots exactly as they do on individual effectors; during Decide, though, the pool is matched
+    # against a capability once, and a free slot is then allocated by policy (least-recently-used, or least-loaded by
+    # number of reservations).  The free slots are kept in a heap ordered by policy (see EffectorPool.State), which is
+    # updated as slots are reserved and released, so allocation does not scan the pool.
+    #
+    # In a .knowledge file:
+    #   @SELF.GRIPPER-POOL.1 = {
+    #       IS-A @EXE.EFFECTOR-POOL;
+    #       TYPE "PHYSICAL";
+    #       CAPACITY 20;
+    #       POLICY "LEAST-LOADED";
+    #       HAS-CAPABILITY @EXE.GRASP-CAPABILITY;
+    #   };
+    #   @SELF.ROBOT.1 += { HAS-EFFECTOR @SELF.GRIPPER-POOL.1; };
+
+    class Policy(Enum):
+        LRU = "LRU"
+        LEAST_LOADED = "LEAST-LOADED"
+
+    @classmethod
+    def instance(cls, space: Space, type: Union[str, Effector.Type], capabilities: List[Union["Capability", Frame]], capacity: int, policy: Union[str, 'EffectorPool.Policy']=None) -> 'EffectorPool':
+        if isinstance(type, str):
+            type = Effector.Type[type]
+        if policy is None:
+            policy = EffectorPool.Policy.LRU
+        if isinstance(policy, str):
+            policy = EffectorPool.Policy(policy)
+
+        frame = Frame("@" + space.name + ".EFFECTOR-POOL.?").add_parent(Frame("@EXE.EFFECTOR-POOL"))
+        frame["TYPE"] = type.name
+        frame["CAPACITY"] = capacity
+        frame["POLICY"] = policy.value
+
+        for capability in capabilities:
+            if isinstance(capability, Capability):
+                capability = capability.frame
+            frame["HAS-CAPABILITY"] += capability
+
+        pool = EffectorPool(frame)
+        pool.materialize()
+
+        return pool
+
+    def __init__(self, frame: Frame):
+        self.frame = frame
+
+    def type(self) -> Effector.Type:
+        type = self.frame["TYPE"].singleton()
+        if isinstance(type, Effector.Type):
+            return type
+        return Effector.Type[type]
+
+    def capacity(self) -> int:
+        return int(self.frame["CAPACITY"].singleton())
+
+    def policy(self) -> 'EffectorPool.Policy':
+        if "POLICY" not in self.frame:
+            return EffectorPool.Policy.LRU
+        policy = self.frame["POLICY"].singleton()
+        if isinstance(policy, EffectorPool.Policy):
+            return policy
+        return EffectorPool.Policy(policy)
+
+    def capabilities(self) -> List["Capability"]:
+        return list(map(lambda c: Capability(c), self.frame["HAS-CAPABILITY"]))
+
+    def materialize(self):
+        # Creates any missing slot frames (up to CAPACITY); called once, when the pool is created or loaded.
+        slots = list(self.frame["HAS-SLOT"])
+
+        while len(slots) < self.capacity():
+            slot = Effector.instance(self.frame.space(), self.type(), list(self.frame["HAS-CAPABILITY"]))
+            slot.frame["SLOT-OF"] = self.frame
+            self.frame["HAS-SLOT"] += slot.frame
+            slots.append(slot.frame)
+
+        if EffectorPool.State.SLOT in self.frame:
+            del self.frame[EffectorPool.State.SLOT]
+
+    def slots(self) -> List[Effector]:
+        return list(map(lambda s: Effector(s), self.frame["HAS-SLOT"]))[:self.capacity()]
+
+    def state(self) -> 'EffectorPool.State':
+        state = self.frame[EffectorPool.State.SLOT].singleton()
+        if state is None:
+            state = EffectorPool.State(self.policy(), self.slots())
+            self.frame[EffectorPool.State.SLOT] = state
+        return state
+
+    def free(self) -> List[Effector]:
+        return self.state().free()
+
+    def allocate(self, exclude: List[Effector]=None) -> Union[Effector, None]:
+        return self.state().allocate(exclude=exclude)
+
+    def reserved(self, slot: Effector):
+        self.state().reserved(slot)
+
+    def released(self, slot: Effector):
+        self.state().released(slot)
+
+    class State(object):
+
+        # The free slots of a pool, in a heap ordered by (last reserved, reservations) for LRU or (reservations, last
+        # reserved) for LEAST-LOADED.  Entries are invalidated lazily: a slot's current key is kept in entries, and heap
+        # items that no longer match it (the slot was reserved, or re-released) are discarded as they reach the top.
+        # The state is built from the slots once, and is then kept on the pool frame (in the POOL-STATE slot).
+
+        SLOT = "POOL-STATE"
+
+        def __init__(self, policy: 'EffectorPool.Policy', slots: List[Effector]):
+            self.policy = policy
+            self.heap = []
+            self.entries: Dict[str, tuple] = {}
+
+            for slot in slots:
+                if slot.is_free():
+                    self.released(slot)
+
+        def key(self, slot: Effector) -> tuple:
+            if self.policy == EffectorPool.Policy.LEAST_LOADED:
+                return (slot.reservations(), slot.last_reserved())
+            return (slot.last_reserved(), slot.reservations())
+
+        def reserved(self, slot: Effector):
+            self.entries.pop(slot.frame.id, None)
+
+        def released(self, slot: Effector):
+            key = self.key(slot)
+            self.entries[slot.frame.id] = key
+            heapq.heappush(self.heap, (key, slot.frame.id))
+
+        def free(self) -> List[Effector]:
+            slots = map(lambda id: Effector(Frame(id)), list(self.entries.keys()))
+            return sorted(filter(lambda slot: slot.is_free(), slots), key=lambda slot: (self.entries[slot.frame.id], slot.frame.id))
+
+        def allocate(self, exclude: List[Effector]=None) -> Union[Effector, None]:
+            excluded = set(map(lambda slot: slot.frame.id, exclude or []))
+            skipped = []
+            result = None
+
+            while len(self.heap) > 0:
+                key, id = self.heap[0]
+                if self.entries.get(id) != key:
+                    heapq.heappop(self.heap)
+                    continue
+                if not Effector(Frame(id)).is_free():
+                    # Reserved without going through the pool; dropped until it is released
+                    heapq.heappop(self.heap)
+                    del self.entries[id]
+                    continue
+                if id in excluded:
+                    skipped.append(heapq.heappop(self.heap))
+                    continue
+                result = Effector(Frame(id))
+                break
+
+            for item in skipped:
+                heapq.heappush(self.heap, item)
+
+            return result
+
+    def __eq__(self, other):
+        if isinstance(other, EffectorPool):
+            return self.frame == other.frame
+        if isinstance(other, Frame):
+            return self.frame == other
+        return super().__eq__(other)
+
+
 class Capability(object):
 
     @classmethod
@@ -138,6 +354,11 @@ class Capability(object):
     def events(self) -> List[Frame]:
         return list(self.frame["COVERS-EVENT"])
 
+    def timeout(self) -> Union[float, None]:
+        if "TIMEOUT" not in self.frame:
+            return None
+        return float(self.frame["TIMEOUT"].singleton())
+
     def __eq__(self, other):
         if isinstance(other, Capability):
             return self.frame == other.frame
@@ -146,11 +367,126 @@ class Capability(object):
         return super().__eq__(other)
 
 
+class CapabilityExecutor(object):
+
+    # Dispatches capabilities (OutputMethods) for reserved effectors during the Execute stage.  With no workers,
+    # capabilities are run inline on the calling thread.  Otherwise physical and verbal capabilities are run on a pool
+    # of worker threads (mental capabilities modify the agent directly, and are always run inline).  Everything the
+    # executor needs from the graph (the MP, output and callback) is resolved on the loop thread before the work is
+    # submitted; the worker only runs the OutputMethod, which must limit itself to its I/O and report back through
+    # callbacks.  Callbacks go to the agent's inbox (Agent.callback); any errors are posted to a thread-safe queue that
+    # the agent drains in Assess, where the effector is released and the callback failed (see Callback.failed).
+
+    def __init__(self, workers: int=0):
+        self.workers = workers
+        self._pool = None
+        self._queue = queue.Queue()
+
+        if workers > 0:
+            self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="CapabilityExecutor")
+
+    def dispatch(self, agent: 'Agent', effector: Effector, callback: 'Callback'):
+        capability = effector.on_capability()
+        output = effector.on_output()
+
+        if self._pool is None or effector.type() == Effector.Type.MENTAL:
+            capability.run(agent, output, callback)
+            return
+
+        mp = capability.mp_name()
+
+        def run():
+            try:
+                MPRegistry.output(mp, agent, output, callback)
+            except Exception as e:
+                self._queue.put(CapabilityExecutor.Failure(effector, capability, callback, e))
+
+        self._pool.submit(run)
+
+    def drain(self) -> List['CapabilityExecutor.Failure']:
+        results = []
+        while True:
+            try:
+                results.append(self._queue.get_nowait())
+            except queue.Empty:
+                return results
+
+    def shutdown(self, wait: bool=True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+
+    class Failure(object):
+
+        def __init__(self, effector: Effector, capability: Capability, callback: 'Callback', error: Exception):
+            self.effector = effector
+            self.capability = capability
+            self.callback = callback
+            self.error = error
+
+
+class TimerWheel(object):
+
+    # A hashed timer wheel for callback timeouts.  Each scheduled key is placed in the slot for the tick on which it
+    # expires (modulo the wheel size); advancing the wheel only visits the slots for the ticks that have elapsed since
+    # the last advance, so checking once per cycle costs O(expired), rather than a scan of everything outstanding.
+
+    def __init__(self, tick: float=0.1, slots: int=512, clock: Callable[[], float]=time.time):
+        self.tick = tick
+        self._clock = clock
+        self._slots: List[Dict[str, int]] = [{} for _ in range(slots)]
+        self._entries: Dict[str, int] = {}
+        self._cursor = self._now()
+
+    def _now(self) -> int:
+        return int(math.floor(self._clock() / self.tick))
+
+    def schedule(self, key: str, timeout: float):
+        self.cancel(key)
+
+        target = int(math.ceil((self._clock() + timeout) / self.tick))
+        target = max(target, self._cursor + 1)
+
+        self._slots[target % len(self._slots)][key] = target
+        self._entries[key] = target
+
+    def cancel(self, key: str) -> bool:
+        if key not in self._entries:
+            return False
+        target = self._entries.pop(key)
+        del self._slots[target % len(self._slots)][key]
+        return True
+
+    def pending(self) -> List[str]:
+        return list(self._entries.keys())
+
+    def expire(self) -> List[str]:
+        now = self._now()
+        if now <= self._cursor:
+            return []
+
+        expired = []
+        for tick in range(self._cursor + 1, min(now, self._cursor + len(self._slots)) + 1):
+            slot = self._slots[tick % len(self._slots)]
+            for key, target in list(slot.items()):
+                if target <= now:
+                    del slot[key]
+                    del self._entries[key]
+                    expired.append(key)
+
+        self._cursor = now
+        return expired
+
+    def __len__(self):
+        return len(self._entries)
+
+
 class Callback(object):
 
     class Status(Enum):
         WAITING = "WAITING"
         RECEIVED = "RECEIVED"
+        TIMED_OUT = "TIMED_OUT"
+        FAILED = "FAILED"
 
     @classmethod
     def build(cls, space: Space, decision: Union[str, Identifier, Frame, Decision], effector: Union[str, Identifier, Frame, Effector]) -> 'Callback':
@@ -193,9 +529,185 @@ class Callback(object):
         self.decision().callback_received(self)
         self.frame.delete()
 
+    def timed_out(self):
+        # The callback frame is kept (and marked) so that a late delivery can be recognized and discarded; it is removed
+        # along with its decision once the decision is released for replanning.
+        self.frame["STATUS"] = Callback.Status.TIMED_OUT
+        if self.effector().on_decision() == self.decision():
+            self.effector().release()
+        self.decision().callback_timed_out(self)
+
+    def failed(self):
+        # The capability raised rather than delivering the callback; as with a timeout, the effector is released and the
+        # callback kept (and marked) until its decision is removed, which it is (declined) once no others are outstanding.
+        self.frame["STATUS"] = Callback.Status.FAILED
+        if self.effector().on_decision() == self.decision():
+            self.effector().release()
+        self.decision().callback_failed(self)
+
     def __eq__(self, other):
         if isinstance(other, Callback):
             return self.frame == other.frame
         if isinstance(other, Frame):
             return self.frame == other
-        return super().__eq__(other)
\ No newline at end of file
+        return super().__eq__(other)
+
+
+class Telemetry(object):
+
+    # Records effector utilization (time spent OPERATING, from reserve to release), how long decisions wait for an
+    # effector (from the first time a decision for a goal / plan / step is declined, to when one is selected), and how
+    # often decisions are declined, per effector and per capability.
+
+    def __init__(self, clock: Callable[[], float]=time.time):
+        self._clock = clock
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._started = self._clock()
+            self._effectors = dict()
+            self._capabilities = dict()
+            self._waiting = dict()
+
+    def reserved(self, effector: Union[str, Identifier, Frame], capability: Union[str, Identifier, Frame]):
+        with self._lock:
+            now = self._clock()
+            stats = self._effector_stats(Telemetry._id(effector))
+            stats["reservations"] += 1
+            stats["since"] = now
+
+            stats = self._capability_stats(Telemetry._id(capability))
+            stats["reservations"] += 1
+            stats["effectors"].add(Telemetry._id(effector))
+
+    def released(self, effector: Union[str, Identifier, Frame], capability: Union[str, Identifier, Frame]):
+        with self._lock:
+            stats = self._effector_stats(Telemetry._id(effector))
+            if stats["since"] is None:
+                return
+
+            operating = self._clock() - stats["since"]
+            stats["operating"] += operating
+            stats["since"] = None
+
+            self._capability_stats(Telemetry._id(capability))["operating"] += operating
+
+    def selected(self, decision: Decision):
+        with self._lock:
+            since = self._waiting.pop(Telemetry._decision_key(decision), None)
+            wait = 0.0 if since is None else self._clock() - since
+
+            for capability in Telemetry._requires(decision):
+                stats = self._capability_stats(capability)
+                stats["selections"] += 1
+                stats["waits"] += 1
+                stats["wait"] += wait
+                stats["max-wait"] = max(stats["max-wait"], wait)
+
+    def declined(self, decision: Decision, capabilities: List[Union[str, Identifier, Frame]]=None):
+        with self._lock:
+            capabilities = Telemetry._requires(decision) if capabilities is None else list(map(Telemetry._id, capabilities))
+            if len(capabilities) == 0:
+                return
+
+            self._waiting.setdefault(Telemetry._decision_key(decision), self._clock())
+
+            for capability in capabilities:
+                self._capability_stats(capability)["declines"] += 1
+
+    def retain(self, decisions: List[Decision]):
+        # Waits are only tracked for the goal / plan / steps that still have a decision; the rest (whose goals were
+        # abandoned or satisfied, or whose decisions were otherwise removed without being selected) are evicted.
+        with self._lock:
+            keys = set(map(Telemetry._decision_key, decisions))
+            for key in list(filter(lambda key: key not in keys, self._waiting.keys())):
+                del self._waiting[key]
+
+    def stats(self, effector: Union[str, Identifier, Frame]=None, capability: Union[str, Identifier, Frame]=None) -> dict:
+        with self._lock:
+            elapsed = self._clock() - self._started
+
+            # Reports never create entries, so that querying unknown effectors or capabilities leaves no trace
+            if effector is not None:
+                return self._effector_report(self._effectors.get(Telemetry._id(effector), Telemetry._effector_template()), elapsed)
+            if capability is not None:
+                return self._capability_report(Telemetry._id(capability), elapsed)
+
+            return {
+                "effectors": dict((id, self._effector_report(stats, elapsed)) for id, stats in self._effectors.items()),
+                "capabilities": dict((id, self._capability_report(id, elapsed)) for id in self._capabilities.keys())
+            }
+
+    def _effector_stats(self, effector: str) -> dict:
+        if effector not in self._effectors:
+            self._effectors[effector] = Telemetry._effector_template()
+        return self._effectors[effector]
+
+    def _capability_stats(self, capability: str) -> dict:
+        if capability not in self._capabilities:
+            self._capabilities[capability] = Telemetry._capability_template()
+        return self._capabilities[capability]
+
+    @classmethod
+    def _effector_template(cls) -> dict:
+        return {"reservations": 0, "operating": 0.0, "since": None}
+
+    @classmethod
+    def _capability_template(cls) -> dict:
+        return {"reservations": 0, "operating": 0.0, "effectors": set(), "selections": 0, "declines": 0, "waits": 0, "wait": 0.0, "max-wait": 0.0}
+
+    def _operating(self, stats: dict) -> float:
+        # Includes the time spent on any reservation that has not yet been released
+        if stats["since"] is None:
+            return stats["operating"]
+        return stats["operating"] + (self._clock() - stats["since"])
+
+    def _effector_report(self, stats: dict, elapsed: float) -> dict:
+        operating = self._operating(stats)
+        return {
+            "reservations": stats["reservations"],
+            "operating": operating,
+            "utilization": 0.0 if elapsed <= 0 else operating / elapsed
+        }
+
+    def _capability_report(self, capability: str, elapsed: float) -> dict:
+        stats = self._capabilities.get(capability, Telemetry._capability_template())
+
+        operating = stats["operating"]
+        for effector in stats["effectors"]:
+            effector = self._effectors.get(effector, Telemetry._effector_template())
+            if effector["since"] is not None:
+                operating += self._clock() - effector["since"]
+
+        capacity = elapsed * len(stats["effectors"])
+        considered = stats["selections"] + stats["declines"]
+
+        return {
+            "reservations": stats["reservations"],
+            "operating": operating,
+            "utilization": 0.0 if capacity <= 0 else operating / capacity,
+            "selections": stats["selections"],
+            "declines": stats["declines"],
+            "decline-rate": 0.0 if considered == 0 else stats["declines"] / considered,
+            "mean-wait": 0.0 if stats["waits"] == 0 else stats["wait"] / stats["waits"],
+            "max-wait": stats["max-wait"]
+        }
+
+    @classmethod
+    def _id(cls, value: Union[str, Identifier, Frame]) -> str:
+        if isinstance(value, Frame) or isinstance(value, Identifier):
+            return value.id
+        return str(value)
+
+    @classmethod
+    def _decision_key(cls, decision: Decision) -> tuple:
+        return tuple(map(lambda slot: Telemetry._id(decision.frame[slot].singleton()), ["ON-GOAL", "ON-PLAN", "ON-STEP"]))
+
+    @classmethod
+    def _requires(cls, decision: Decision) -> List[str]:
+        return list(map(lambda capability: Telemetry._id(capability.frame), decision.requires()))
+
+
+EffectorTelemetry = Telemetry()
@@ -1,40 +1,143 @@
 from ontograph.Frame import Frame
 from ontograph.Index import Identifier
 from ontograph.Space import Space
-from typing import List, Union
+from typing import Dict, List, Tuple, Union
+
+import threading
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# The shared instance of each environment (see Environment.of), by space name
+_shared: Dict[str, 'Environment'] = {}
+_shared_lock = threading.Lock()
 
 
 class Environment(object):
+    """
+    Epochs are stored as deltas over the epoch they follow: ENTERED and EXITED list the objects that joined or left the
+    environment, and LOCATION holds a frame only for each object whose location changed (a RANGE of None marks an
+    object that left).  Every `checkpoint` epochs (and the first epoch) is a CHECKPOINT instead, holding the full
+    CONTAINS and LOCATION state, so reconstructing any epoch replays at most `checkpoint - 1` deltas.  If `retain` is
+    set, advancing compacts the history down to the most recent `retain` epochs.
+
+    The ordered list of epochs, the reconstructed state of each epoch (an object -> frame dict of its contents and an
+    object -> location dict), and the LOCATION frames of the current epoch are indexed on first use and then kept up to
+    date by advance, enter, exit, move and compact.  Changes made to the space through another Environment instance
+    are not seen by this one, so the agent (and anything else that reads or updates an environment over time) uses the
+    shared instance for the space, from Environment.of(space).  Historical questions (where an object was at an epoch, what was present over a span of
+    epochs, how an object moved) are answered from an IntervalIndex of each object's location runs.  If NumPy is
+    available, comparisons between epochs (moved, entered, exited) and location queries (objects_at) are answered from
+    a SceneMatrix of location codes instead of per-object lookups; the results are the same either way.
+    """
+
+    CHECKPOINT = 16
+    RETAIN = None
+
+    @classmethod
+    def of(cls, space: Space) -> 'Environment':
+        with _shared_lock:
+            environment = _shared.get(space.name)
+            if environment is None:
+                environment = Environment(space)
+                _shared[space.name] = environment
+            return environment
+
+    @classmethod
+    def clear_shared(cls):
+        # The shared instances index frames in the graph, so are dropped whenever it is reset (see Agent.reset)
+        with _shared_lock:
+            _shared.clear()
 
-    def __init__(self, space: Space):
+    def __init__(self, space: Space, checkpoint: int=None, retain: int=None):
         self.space = space
+        self.checkpoint = Environment.CHECKPOINT if checkpoint is None else checkpoint
+        self.retain = Environment.RETAIN if retain is None else retain
+
+        self._epochs: List[Frame] = None
+        self._states: Dict[str, Tuple[Dict[str, Frame], Dict[str, Union[str, Frame]]]] = {}
+        self._location_frames: Tuple[str, Dict[str, Frame]] = None
+        self._intervals: IntervalIndex = None
+        self._matrix: SceneMatrix = None
 
     def advance(self) -> Frame:
         # Create a new timestamp
-        epochs = self.history()
+        epochs = self._history()
 
         epoch = Frame("@" + self.space.name + ".EPOCH.?").add_parent("@ENV.EPOCH")
-        epoch["TIME"] = len(epochs) + 1
+        time = 1 if len(epochs) == 0 else epochs[-1]["TIME"].singleton() + 1
+        epoch["TIME"] = time
 
         if len(epochs) > 0:
             last = epochs[-1]
             epoch["FOLLOWS"] = last
 
-            for obj in last["CONTAINS"]:
-                epoch["CONTAINS"] += obj
+        if len(epochs) == 0 or (time - 1) % self.checkpoint == 0:
+            contains, locations = ({}, {}) if len(epochs) == 0 else self._state(epochs[-1])
+            self._write_checkpoint(epoch, contains, locations)
+
+        self._epochs.append(epoch)
+        if self._intervals is not None:
+            self._intervals.add_epoch(epoch, time)
+        if self._matrix is not None:
+            self._matrix.add_epoch(time)
+
+        if self.retain is not None:
+            self.compact(self.retain)
 
-            for location in last["LOCATION"]:
-                copy = Frame("@" + self.space.name + ".SPATIAL-LOCATION.?").add_parent("@ONT.LOCATION")
-                copy["DOMAIN"] = location["DOMAIN"].singleton()
-                copy["RANGE"] = location["RANGE"].singleton()
-                epoch["LOCATION"] += copy
         return epoch
 
     def history(self) -> List[Frame]:
-        epochs = list(filter(lambda f: f ^ "@ENV.EPOCH" and f != Frame("@ENV.EPOCH"), self.space))
-        epochs = sorted(epochs, key=lambda e: e["TIME"].singleton())
+        return list(self._history())
+
+    def _history(self) -> List[Frame]:
+        if self._epochs is None:
+            epochs = list(filter(lambda f: f ^ "@ENV.EPOCH" and f != Frame("@ENV.EPOCH"), self.space))
+            self._epochs = sorted(epochs, key=lambda e: e["TIME"].singleton())
+
+        return self._epochs
+
+    def compact(self, keep: int) -> int:
+        # Drops all but the most recent `keep` epochs; the oldest epoch kept becomes a checkpoint (if it is not one
+        # already) so that it no longer depends on anything removed.  Returns the number of epochs removed.
+        epochs = self._history()
+        if keep < 1 or len(epochs) <= keep:
+            return 0
+
+        removed = epochs[:-keep]
+        oldest = epochs[-keep]
 
-        return epochs
+        if not self.is_checkpoint(oldest):
+            contains, locations = self._state(oldest)
+            for d in list(oldest["LOCATION"]):
+                d.delete()
+            for slot in ["LOCATION", "ENTERED", "EXITED"]:
+                if slot in oldest:
+                    del oldest[slot]
+            self._write_checkpoint(oldest, contains, locations)
+        if "FOLLOWS" in oldest:
+            del oldest["FOLLOWS"]
+
+        for epoch in removed:
+            self._states.pop(epoch.id, None)
+            for d in list(epoch["LOCATION"]):
+                d.delete()
+            epoch.delete()
+
+        self._epochs = epochs[-keep:]
+        self._location_frames = None
+        if self._intervals is not None:
+            self._intervals.truncate(oldest["TIME"].singleton())
+        if self._matrix is not None:
+            self._matrix.truncate(oldest["TIME"].singleton())
+
+        return len(removed)
+
+    def is_checkpoint(self, epoch: Frame) -> bool:
+        return "CHECKPOINT" in epoch and epoch["CHECKPOINT"].singleton() is True
 
     def enter(self, obj: Union[str, Identifier, Frame], location: Frame=None):
         if isinstance(obj, str):
@@ -43,67 +146,461 @@ class Environment(object):
         if location is None:
             location = "@ONT.LOCATION"
 
-        epoch = self.history()[-1]
+        epoch = self._history()[-1]
+        contains = self._state(epoch)[0]
 
-        if obj not in epoch["CONTAINS"]:
-            epoch["CONTAINS"] += obj
+        if obj.id not in contains:
+            if self.is_checkpoint(epoch):
+                epoch["CONTAINS"] += obj
+            elif obj in epoch["EXITED"]:
+                epoch["EXITED"] -= obj
+            else:
+                epoch["ENTERED"] += obj
+            contains[obj.id] = obj
             self.move(obj, location=location)
 
     def exit(self, obj: Union[str, Identifier, Frame]):
         if isinstance(obj, str):
             obj = Frame(obj)
 
-        epoch = self.history()[-1]
-        epoch["CONTAINS"] -= obj
+        epoch = self._history()[-1]
+        contains, locations = self._state(epoch)
+
+        if obj.id not in contains:
+            return
+
+        if self.is_checkpoint(epoch):
+            epoch["CONTAINS"] -= obj
+        elif obj in epoch["ENTERED"]:
+            epoch["ENTERED"] -= obj
+        else:
+            epoch["EXITED"] += obj
+        del contains[obj.id]
+        locations.pop(obj.id, None)
+        if self._intervals is not None:
+            self._intervals.locate(obj.id, None, epoch["TIME"].singleton())
+        if self._matrix is not None:
+            self._matrix.locate(obj.id, None)
 
-        for d in epoch["LOCATION"]:
-            if d["DOMAIN"] == obj:
-                d["RANGE"] = None
+        self._set_location(epoch, obj, None)
 
     def move(self, obj: Union[str, Identifier, Frame], location: Frame):
         if isinstance(obj, str):
             obj = Frame(obj)
+        if isinstance(location, str):
+            location = Frame(location)
 
-        epoch = self.history()[-1]
-        for d in epoch["LOCATION"]:
-            if d["DOMAIN"] == obj:
-                d["RANGE"] = location
-                return
+        epoch = self._history()[-1]
+        self._state(epoch)[1][obj.id] = location
+        self._set_location(epoch, obj, location)
+        if self._intervals is not None:
+            self._intervals.locate(obj.id, location, epoch["TIME"].singleton())
+        if self._matrix is not None:
+            self._matrix.locate(obj.id, location)
+
+    def _set_location(self, epoch: Frame, obj: Frame, location: Union[str, Frame, None]):
+        if self._location_frames is None or self._location_frames[0] != epoch.id:
+            frames = {}
+            for d in epoch["LOCATION"]:
+                frames[d["DOMAIN"].singleton().id] = d
+            self._location_frames = (epoch.id, frames)
+
+        frames = self._location_frames[1]
+        if obj.id in frames:
+            frames[obj.id]["RANGE"] = location
+            return
 
         d = Frame("@" + self.space.name + ".LOCATION.?").add_parent("@ONT.LOCATION")
         d["DOMAIN"] = obj
         d["RANGE"] = location
         epoch["LOCATION"] += d
+        frames[obj.id] = d
+
+    def _write_checkpoint(self, epoch: Frame, contains: Dict[str, Frame], locations: Dict[str, Union[str, Frame]]):
+        epoch["CHECKPOINT"] = True
+
+        for obj in contains.values():
+            epoch["CONTAINS"] += obj
+
+        for obj, location in locations.items():
+            copy = Frame("@" + self.space.name + ".SPATIAL-LOCATION.?").add_parent("@ONT.LOCATION")
+            copy["DOMAIN"] = Frame(obj)
+            copy["RANGE"] = location
+            epoch["LOCATION"] += copy
+
+        self._states[epoch.id] = (dict(contains), dict(locations))
+
+    def _state(self, epoch: Frame) -> Tuple[Dict[str, Frame], Dict[str, Union[str, Frame]]]:
+        # Reconstructs the contents and locations of the epoch by replaying the deltas that follow the nearest
+        # checkpoint (or the earliest epoch, if there is no checkpoint), or that follow the nearest epoch that has
+        # already been reconstructed.  Every epoch replayed along the way is indexed.
+        chain = [epoch]
+        while chain[-1].id not in self._states and not self.is_checkpoint(chain[-1]) and len(chain[-1]["FOLLOWS"]) > 0:
+            chain.append(chain[-1]["FOLLOWS"].singleton())
+        chain.reverse()
+
+        base = chain[0]
+        if base.id not in self._states:
+            contains = {}
+            for obj in base["CONTAINS"]:
+                contains[obj.id] = obj
+
+            locations = {}
+            for d in base["LOCATION"]:
+                location = d["RANGE"].singleton()
+                if location is not None:
+                    locations[d["DOMAIN"].singleton().id] = location
+
+            self._states[base.id] = (contains, locations)
+
+        contains, locations = self._states[base.id]
+
+        for delta in chain[1:]:
+            contains = dict(contains)
+            locations = dict(locations)
+
+            for obj in delta["EXITED"]:
+                contains.pop(obj.id, None)
+            for obj in delta["ENTERED"]:
+                contains[obj.id] = obj
+
+            for d in delta["LOCATION"]:
+                location = d["RANGE"].singleton()
+                obj = d["DOMAIN"].singleton().id
+                if location is None:
+                    locations.pop(obj, None)
+                else:
+                    locations[obj] = location
+
+            self._states[delta.id] = (contains, locations)
+
+        return self._states[epoch.id]
 
     def view(self, epoch: Union[int, str, Identifier, Frame]) -> List[Frame]:
-        if isinstance(epoch, int):
-            epoch = self.history()[epoch]
-        if isinstance(epoch, str):
-            epoch = Frame(epoch)
-        if isinstance(epoch, Identifier):
-            epoch = Frame(epoch.id)
+        epoch = self._epoch(epoch)
 
-        return list(epoch["CONTAINS"])
+        return list(self._state(epoch)[0].values())
 
     def current(self):
-        return self.view(self.history()[-1])
+        return self.view(self._history()[-1])
+
+    def locations(self, epoch: Union[int, str, Identifier, Frame]=-1) -> Dict[str, Union[str, Frame]]:
+        # The location of every located object in the epoch, keyed by object id.
+        epoch = self._epoch(epoch)
+
+        return dict(self._state(epoch)[1])
 
     def location(self, obj: Union[str, Identifier, Frame], epoch: Union[int, str, Identifier, Frame]=-1) -> Frame:
+        epoch = self._epoch(epoch)
+
+        if isinstance(obj, str):
+            obj = Frame(obj)
+        if isinstance(obj, Identifier):
+            obj = Frame(obj.id)
+
+        index = self._index()
+        if epoch.id not in index.times:
+            locations = self._state(epoch)[1]
+            if obj.id in locations:
+                return locations[obj.id]
+            raise Exception("Location unknown.")
+
+        location = index.at(obj.id, index.times[epoch.id])
+        if location is not None:
+            return location
+        raise Exception("Location unknown.")
+
+    def present(self, start: Union[int, str, Identifier, Frame], end: Union[int, str, Identifier, Frame]=-1) -> List[Frame]:
+        # Every object that was in the environment at any point from the start epoch to the end epoch (inclusive).
+        index = self._index()
+        start = index.times[self._epoch(start).id]
+        end = index.times[self._epoch(end).id]
+
+        return list(map(lambda obj: Frame(obj), index.present(start, end)))
+
+    def movements(self, obj: Union[str, Identifier, Frame]) -> List[Tuple[Union[str, Frame], Frame, Frame]]:
+        # The location history of the object, as (location, first epoch, last epoch) runs in order; the last epoch of
+        # a run that is still ongoing is the current epoch.
+        if isinstance(obj, Frame) or isinstance(obj, Identifier):
+            obj = obj.id
+
+        index = self._index()
+        current = self._history()[-1]
+
+        return list(map(lambda run: (run[0], index.epochs[run[1]], current if run[2] is None else index.epochs[run[2]]), index.runs.get(obj, [])))
+
+    def moved(self, then: Union[int, str, Identifier, Frame], now: Union[int, str, Identifier, Frame]=-1) -> List[Frame]:
+        # Objects present in both epochs, at a different location in each.
+        return self._compare(then, now, lambda a, b: a is not None and b is not None and IntervalIndex._key(a) != IntervalIndex._key(b), "moved")
+
+    def entered(self, then: Union[int, str, Identifier, Frame], now: Union[int, str, Identifier, Frame]=-1) -> List[Frame]:
+        # Objects present in the later epoch but not the earlier one.
+        return self._compare(then, now, lambda a, b: a is None and b is not None, "entered")
+
+    def exited(self, then: Union[int, str, Identifier, Frame], now: Union[int, str, Identifier, Frame]=-1) -> List[Frame]:
+        # Objects present in the earlier epoch but not the later one.
+        return self._compare(then, now, lambda a, b: a is not None and b is None, "exited")
+
+    def objects_at(self, location: Union[str, Identifier, Frame], epoch: Union[int, str, Identifier, Frame]=-1) -> List[Frame]:
+        epoch = self._epoch(epoch)
+
+        scene = self._scene()
+        if scene is not None and epoch.id in self._index().times:
+            ids = scene.objects_at(location, self._index().times[epoch.id])
+        else:
+            key = IntervalIndex._key(location)
+            ids = list(map(lambda item: item[0], filter(lambda item: IntervalIndex._key(item[1]) == key, self._state(epoch)[1].items())))
+
+        return list(map(lambda obj: Frame(obj), ids))
+
+    def _compare(self, then: Union[int, str, Identifier, Frame], now: Union[int, str, Identifier, Frame], test, operation: str) -> List[Frame]:
+        then = self._epoch(then)
+        now = self._epoch(now)
+
+        scene = self._scene()
+        times = self._index().times if scene is not None else {}
+        if scene is not None and then.id in times and now.id in times:
+            ids = getattr(scene, operation)(times[then.id], times[now.id])
+        else:
+            before = self._state(then)[1]
+            after = self._state(now)[1]
+            ids = list(filter(lambda obj: test(before.get(obj), after.get(obj)), list(before) + list(filter(lambda obj: obj not in before, after))))
+
+        return list(map(lambda obj: Frame(obj), ids))
+
+    def _epoch(self, epoch: Union[int, str, Identifier, Frame]) -> Frame:
         if isinstance(epoch, int):
-            epoch = self.history()[epoch]
+            epoch = self._history()[epoch]
         if isinstance(epoch, str):
             epoch = Frame(epoch)
         if isinstance(epoch, Identifier):
             epoch = Frame(epoch.id)
+        return epoch
 
-        if isinstance(obj, str):
-            obj = Frame(obj)
-        if isinstance(obj, Identifier):
-            obj = Frame(obj.id)
+    def _index(self) -> 'IntervalIndex':
+        # Built by replaying the history once: checkpoints are diffed against the running state, deltas applied as-is.
+        if self._intervals is None:
+            index = IntervalIndex()
+            current = {}
 
-        for d in epoch["LOCATION"]:
-            if d["DOMAIN"] == obj:
-                location = d["RANGE"].singleton()
-                if location is not None:
-                    return location
-        raise Exception("Location unknown.")
\ No newline at end of file
+            for epoch in self._history():
+                time = epoch["TIME"].singleton()
+                index.add_epoch(epoch, time)
+
+                changes = {}
+                if self.is_checkpoint(epoch) or len(epoch["FOLLOWS"]) == 0:
+                    for obj in current:
+                        changes[obj] = None
+                    for d in epoch["LOCATION"]:
+                        changes[d["DOMAIN"].singleton().id] = d["RANGE"].singleton()
+                else:
+                    for d in epoch["LOCATION"]:
+                        changes[d["DOMAIN"].singleton().id] = d["RANGE"].singleton()
+
+                for obj, location in changes.items():
+                    index.locate(obj, location, time)
+                    if location is None:
+                        current.pop(obj, None)
+                    else:
+                        current[obj] = location
+
+            self._intervals = index
+
+        return self._intervals
+
+    def _scene(self) -> Union['SceneMatrix', None]:
+        # Only available with NumPy; filled from the interval index.
+        if numpy is None:
+            return None
+
+        if self._matrix is None:
+            self._matrix = SceneMatrix.from_index(self._index())
+
+        return self._matrix
+
+
+class IntervalIndex(object):
+    """
+    For each object, the runs of consecutive epochs it spent at one location, as [location, first time, last time]
+    (by epoch TIME); the last time of the run the object is currently in is None.
+    """
+
+    def __init__(self):
+        self.runs: Dict[str, List[list]] = {}
+        self.epochs: Dict[int, Frame] = {}
+        self.times: Dict[str, int] = {}
+
+    def add_epoch(self, epoch: Frame, time: int):
+        self.epochs[time] = epoch
+        self.times[epoch.id] = time
+
+    def locate(self, obj: str, location: Union[str, Frame, None], time: int):
+        # Records the object's location (None if it left) as of the given time, which must be the latest time.
+        runs = self.runs.setdefault(obj, [])
+
+        if len(runs) > 0 and runs[-1][2] is None:
+            run = runs[-1]
+            if location is not None and IntervalIndex._key(run[0]) == IntervalIndex._key(location):
+                return
+            if run[1] == time:
+                runs.pop()
+            else:
+                run[2] = time - 1
+
+        if location is None:
+            return
+
+        # Leaving and returning to the same location within one epoch continues the earlier run
+        if len(runs) > 0 and runs[-1][2] == time - 1 and IntervalIndex._key(runs[-1][0]) == IntervalIndex._key(location):
+            runs[-1][2] = None
+            return
+
+        runs.append([location, time, None])
+
+    def at(self, obj: str, time: int) -> Union[str, Frame, None]:
+        runs = self.runs.get(obj, [])
+
+        low, high = 0, len(runs)
+        while low < high:
+            middle = (low + high) // 2
+            if runs[middle][1] <= time:
+                low = middle + 1
+            else:
+                high = middle
+
+        if low == 0:
+            return None
+        run = runs[low - 1]
+        if run[2] is None or run[2] >= time:
+            return run[0]
+        return None
+
+    def present(self, start: int, end: int) -> List[str]:
+        return list(filter(lambda obj: any(map(lambda run: run[1] <= end and (run[2] is None or run[2] >= start), self.runs[obj])), self.runs))
+
+    def truncate(self, time: int):
+        # Forgets everything before the given time.
+        for epoch in list(self.epochs):
+            if epoch < time:
+                del self.times[self.epochs[epoch].id]
+                del self.epochs[epoch]
+
+        for obj in list(self.runs):
+            runs = list(filter(lambda run: run[2] is None or run[2] >= time, self.runs[obj]))
+            for run in runs:
+                run[1] = max(run[1], time)
+            if len(runs) == 0:
+                del self.runs[obj]
+            else:
+                self.runs[obj] = runs
+
+    @classmethod
+    def _key(cls, location: Union[str, Identifier, Frame]) -> str:
+        if isinstance(location, Frame) or isinstance(location, Identifier):
+            return location.id
+        return str(location)
+
+
+class SceneMatrix(object):
+    """
+    An objects x epochs matrix of location codes (0 where the object is not in the environment), so that whole-scene
+    comparisons are array operations.  Columns are kept for every epoch from the first indexed time onward; rows and
+    columns are allocated by doubling as objects and epochs are added.  Requires NumPy.
+    """
+
+    BLOCK = 64
+
+    def __init__(self, start: int=1):
+        self.start = start
+        self.objects: Dict[str, int] = {}
+        self.ids: List[str] = []
+        self.codes: Dict[str, int] = {}
+        self.columns = 0
+        self.data = numpy.zeros((SceneMatrix.BLOCK, SceneMatrix.BLOCK), dtype=numpy.int32)
+
+    @classmethod
+    def from_index(cls, index: IntervalIndex) -> 'SceneMatrix':
+        times = sorted(index.epochs)
+        matrix = SceneMatrix(start=times[0] if len(times) > 0 else 1)
+        for time in times:
+            matrix.add_epoch(time)
+
+        last = matrix.start + matrix.columns - 1
+        for obj, runs in index.runs.items():
+            row = matrix._row(obj)
+            for run in runs:
+                end = last if run[2] is None else run[2]
+                matrix.data[row, run[1] - matrix.start:end - matrix.start + 1] = matrix._code(run[0])
+
+        return matrix
+
+    def add_epoch(self, time: int):
+        # The new epoch starts as a copy of the previous one.
+        if self.columns == 0:
+            self.start = time
+        self._reserve(len(self.ids), self.columns + 1)
+        if self.columns > 0:
+            self.data[:, self.columns] = self.data[:, self.columns - 1]
+        self.columns += 1
+
+    def locate(self, obj: str, location: Union[str, Frame, None]):
+        # Records the object's location (None if it left) in the latest epoch.
+        row = self._row(obj)
+        self.data[row, self.columns - 1] = 0 if location is None else self._code(location)
+
+    def moved(self, then: int, now: int) -> List[str]:
+        before, after = self._column(then), self._column(now)
+        return self._select((before != 0) & (after != 0) & (before != after))
+
+    def entered(self, then: int, now: int) -> List[str]:
+        before, after = self._column(then), self._column(now)
+        return self._select((before == 0) & (after != 0))
+
+    def exited(self, then: int, now: int) -> List[str]:
+        before, after = self._column(then), self._column(now)
+        return self._select((before != 0) & (after == 0))
+
+    def objects_at(self, location: Union[str, Identifier, Frame], time: int) -> List[str]:
+        key = IntervalIndex._key(location)
+        if key not in self.codes:
+            return []
+        return self._select(self._column(time) == self.codes[key])
+
+    def truncate(self, time: int):
+        # Forgets every epoch before the given time.
+        drop = min(max(0, time - self.start), self.columns)
+        self.data = numpy.ascontiguousarray(self.data[:, drop:])
+        self.columns -= drop
+        self.start += drop
+        self._reserve(len(self.ids), self.columns)
+
+    def _column(self, time: int):
+        return self.data[:len(self.ids), time - self.start]
+
+    def _select(self, mask) -> List[str]:
+        return list(map(lambda row: self.ids[row], numpy.flatnonzero(mask)))
+
+    def _row(self, obj: str) -> int:
+        if obj not in self.objects:
+            self._reserve(len(self.ids) + 1, self.columns)
+            self.objects[obj] = len(self.ids)
+            self.ids.append(obj)
+        return self.objects[obj]
+
+    def _code(self, location: Union[str, Identifier, Frame]) -> int:
+        key = IntervalIndex._key(location)
+        if key not in self.codes:
+            self.codes[key] = len(self.codes) + 1
+        return self.codes[key]
+
+    def _reserve(self, rows: int, columns: int):
+        shape = self.data.shape
+        if rows <= shape[0] and columns <= shape[1]:
+            return
+
+        rows = shape[0] if rows <= shape[0] else max(rows, 2 * shape[0])
+        columns = shape[1] if columns <= shape[1] else max(columns, 2 * shape[1])
+
+        grown = numpy.zeros((rows, columns), dtype=numpy.int32)
+        grown[:shape[0], :shape[1]] = self.data
+        self.data = grown
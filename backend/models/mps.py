@@ -1,6 +1,6 @@
 from ontograph.Frame import Frame
 from ontograph.Index import Identifier
-from typing import Any, List, Union
+from typing import Any, Callable, List, Union
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
@@ -9,13 +9,30 @@ if TYPE_CHECKING:
     from backend.models.output import OutputXMR
     from backend.models.statement import Statement
 
+from collections import OrderedDict
+
+import asyncio
+import concurrent.futures
 import sys
+import threading
 
 
 class Registry(object):
 
-    def __init__(self):
+    # MPs may declare themselves (as class attributes) to be:
+    #   reusable - instances are pooled and rebound to each call's context, rather than constructing one per call; an
+    #              instance is only handed to one call at a time (an async call holds it until its coroutine finishes)
+    #   pure     - results depend only on the resolved parameters, so are memoized in a bounded LRU cache; a pure MP
+    #              must not read the graph (frame parameters are keyed by id, not by content), as the memo is not
+    #              invalidated by graph writes
+
+    def __init__(self, memo_size: int=1024):
         self._storage = dict()
+        self._instances = dict()
+        self._memo = OrderedDict()
+        self._memo_size = memo_size
+        self._stats = dict()
+        self._lock = threading.RLock()
 
     def has_mp(self, name: str) -> bool:
         return name in self._storage
@@ -28,29 +45,175 @@ class Registry(object):
             print("Warning, overwriting meaning procedure '" + name + "'.")
 
         self._storage[name] = mp
+        self._forget(name)
 
     def run(self, mp: str, agent: 'Agent', *args, statement: 'Statement'=None, callback: Union[str, Identifier, Frame, 'Callback']=None, varmap=None, **kwargs) -> Any:
         if mp not in self._storage:
             raise Exception("Unknown meaning procedure '" + mp + "'.")
-        return self._storage[mp](agent, statement=statement, callback=callback, varmap=varmap)(*args, **kwargs)
 
-    def method(self, mp: str, agent: 'Agent', statement: 'Statement'=None, callback: Union[str, Identifier, Frame, 'Callback']=None) -> 'AgentMethod':
+        key = None
+        if getattr(self._storage[mp], "pure", False):
+            key = Registry._memo_key(mp, args, kwargs)
+
+        if key is not None:
+            with self._lock:
+                stats = self._stats_for(mp)
+                if key in self._memo and Registry._failed(self._memo[key]):
+                    del self._memo[key]
+                if key in self._memo:
+                    self._memo.move_to_end(key)
+                    stats["hits"] += 1
+                    return self._memo[key]
+                stats["misses"] += 1
+
+        instance = self._acquire(mp, agent, statement=statement, callback=callback, varmap=varmap)
+        try:
+            result = instance(*args, **kwargs)
+        except:
+            self._release(mp, instance)
+            raise
+
+        if isinstance(result, Deferred):
+            # The instance is held (and a failed result is dropped from the memo) until the coroutine finishes
+            result._future.add_done_callback(lambda future: self._settle(mp, instance, key, future))
+        else:
+            self._release(mp, instance)
+
+        if key is not None:
+            with self._lock:
+                self._memo[key] = result
+                if len(self._memo) > self._memo_size:
+                    self._memo.popitem(last=False)
+            if isinstance(result, Deferred) and result.done():
+                self._settle(mp, None, key, result._future)
+
+        return result
+
+    def method(self, mp: str, agent: 'Agent', statement: 'Statement'=None, callback: Union[str, Identifier, Frame, 'Callback']=None, varmap=None) -> 'AgentMethod':
+        # Always a new instance: the caller decides when (and how often) to call it, so it cannot be pooled.
         if mp not in self._storage:
             raise Exception("Unknown meaning procedure '" + mp + "'.")
-        return self._storage[mp](agent, statement=statement, callback=callback)
+
+        return self._storage[mp](agent, statement=statement, callback=callback, varmap=varmap)
 
     def output(self, mp: str, agent: 'Agent', output: 'OutputXMR', callback: 'Callback'):
         if mp not in self._storage:
             raise Exception("Unknown meaning procedure '" + mp + "'.")
-        self._storage[mp](agent, output, callback)()
+
+        instance = self._acquire(mp, agent, output, callback)
+        try:
+            instance()
+        finally:
+            self._release(mp, instance)
+
+    def stats(self, mp: str=None) -> dict:
+        with self._lock:
+            if mp is not None:
+                return Registry._report(self._stats_for(mp))
+            return dict((name, Registry._report(stats)) for name, stats in self._stats.items())
 
     def clear(self):
-        self._storage = dict()
+        with self._lock:
+            self._storage = dict()
+            self._instances = dict()
+            self._memo = OrderedDict()
+            self._stats = dict()
+
+    def clear_memo(self):
+        with self._lock:
+            self._memo = OrderedDict()
+
+    def _acquire(self, mp: str, *args, **kwargs) -> Union['AgentMethod', 'OutputMethod']:
+        clazz = self._storage[mp]
+        if not getattr(clazz, "reusable", False):
+            return clazz(*args, **kwargs)
+
+        with self._lock:
+            idle = self._instances.setdefault(mp, [])
+            if len(idle) == 0:
+                return clazz(*args, **kwargs)
+            instance = idle.pop()
+            self._stats_for(mp)["reused"] += 1
+
+        instance.bind(*args, **kwargs)
+        return instance
+
+    def _release(self, mp: str, instance: Union['AgentMethod', 'OutputMethod']):
+        if instance is None or not getattr(instance, "reusable", False):
+            return
+
+        with self._lock:
+            # Instances of a replaced MP are not returned to the pool
+            if self._storage.get(mp) is type(instance):
+                self._instances.setdefault(mp, []).append(instance)
+
+    def _settle(self, mp: str, instance: Union['AgentMethod', None], key: Union[tuple, None], future: concurrent.futures.Future):
+        self._release(mp, instance)
+
+        if key is not None and Registry._failed(future):
+            with self._lock:
+                if key in self._memo and isinstance(self._memo[key], Deferred) and self._memo[key]._future is future:
+                    del self._memo[key]
+
+    def _forget(self, name: str):
+        with self._lock:
+            self._instances.pop(name, None)
+            self._stats.pop(name, None)
+            for key in list(filter(lambda key: key[0] == name, self._memo.keys())):
+                del self._memo[key]
+
+    def _stats_for(self, mp: str) -> dict:
+        if mp not in self._stats:
+            self._stats[mp] = {"hits": 0, "misses": 0, "reused": 0}
+        return self._stats[mp]
+
+    @classmethod
+    def _report(cls, stats: dict) -> dict:
+        report = dict(stats)
+        lookups = stats["hits"] + stats["misses"]
+        report["hit-rate"] = 0.0 if lookups == 0 else stats["hits"] / lookups
+        return report
+
+    @classmethod
+    def _failed(cls, value: Any) -> bool:
+        if isinstance(value, Deferred):
+            value = value._future
+        if not isinstance(value, concurrent.futures.Future) or not value.done():
+            return False
+        return value.cancelled() or value.exception() is not None
+
+    @classmethod
+    def _memo_key(cls, mp: str, args: tuple, kwargs: dict) -> Union[tuple, None]:
+        # Frames and identifiers are keyed by id, and other values by (type, value) so that equal values of different
+        # types (1 and True, for example) are not confused; returns None if any parameter cannot be hashed (and so the
+        # call cannot be memoized).
+
+        def freeze(value: Any) -> Any:
+            if isinstance(value, Frame) or isinstance(value, Identifier):
+                return (Identifier, value.id)
+            if isinstance(value, list) or isinstance(value, tuple):
+                return (type(value), tuple(map(freeze, value)))
+            if isinstance(value, dict):
+                return (dict, tuple(sorted(((freeze(k), freeze(v)) for k, v in value.items()), key=repr)))
+            return (type(value), value)
+
+        key = (mp, freeze(args), freeze(kwargs))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
 
 
 class AgentMethod(object):
 
+    reusable = False
+    pure = False
+
     def __init__(self, agent: 'Agent', statement: 'Statement'=None, callback: Union[str, Identifier, Frame, 'Callback']=None, varmap=None):
+        self.bind(agent, statement=statement, callback=callback, varmap=varmap)
+
+    def bind(self, agent: 'Agent', statement: 'Statement'=None, callback: Union[str, Identifier, Frame, 'Callback']=None, varmap=None):
         self.agent = agent
         self.statement = statement
         self.callback = callback
@@ -66,9 +229,122 @@ class AgentMethod(object):
         return self.run(*args, **kwargs)
 
 
+class AsyncAgentMethod(AgentMethod):
+
+    # An AgentMethod whose run(*, **) is a coroutine (async def).  Calling the method starts the coroutine on the
+    # shared MP event loop immediately and returns a Deferred; the caller decides when to wait for the result.  This
+    # allows many I/O bound MPs (e.g., priority or plan selection MPs) to be started together, and awaited together.
+
+    async def run(self, *args, **kwargs):
+        raise Exception("AsyncAgentMethod.run(*, **) must be implemented.")
+
+    def __call__(self, *args, **kwargs) -> 'Deferred':
+        return Deferred(MPEventLoop.submit(self.run(*args, **kwargs)))
+
+
+class Deferred(object):
+
+    # The pending result of an AsyncAgentMethod.  Continuations added with then(fn) are applied on the thread that
+    # calls result(), never on the event loop thread, so any graph writes they make remain single-threaded.
+
+    @classmethod
+    def chain(cls, value: Any, fn: Callable[[Any], Any]) -> Any:
+        if isinstance(value, Deferred):
+            return value.then(fn)
+        return fn(value)
+
+    @classmethod
+    def resolve(cls, value: Any) -> Any:
+        if isinstance(value, Deferred):
+            return value.result()
+        return value
+
+    @classmethod
+    def wait_all(cls, values: List[Any], timeout: float=None) -> List[Any]:
+        # With a timeout (in seconds, for the whole set), any Deferreds still running when it expires are marked as
+        # timed out (see timed_out()), and resolve to None from then on.  Cancellation is only requested: a coroutine
+        # is interrupted at its next await, but code already running (and any graph writes it makes) carries on until
+        # it gets there, or finishes.  Whatever it eventually returns (or raises) is discarded; continuations are never
+        # applied to it.
+        futures = list(map(lambda v: v._future, filter(lambda v: isinstance(v, Deferred), values)))
+        if len(futures) > 0:
+            concurrent.futures.wait(futures, timeout=timeout)
+
+        for value in filter(lambda v: isinstance(v, Deferred) and not v.done(), values):
+            value._expire()
+
+        return list(map(lambda v: None if isinstance(v, Deferred) and v.timed_out() else Deferred.resolve(v), values))
+
+    def __init__(self, future: concurrent.futures.Future):
+        self._future = future
+        self._continuations = []
+        self._resolved = False
+        self._value = None
+        self._timed_out = False
+
+    def then(self, fn: Callable[[Any], Any]) -> 'Deferred':
+        deferred = Deferred(self._future)
+        deferred._continuations = self._continuations + [fn]
+        return deferred
+
+    def done(self) -> bool:
+        return self._future.done()
+
+    def timed_out(self) -> bool:
+        # Also true of Deferreds continuing one that timed out (they share its cancelled future).
+        return self._timed_out or self._future.cancelled()
+
+    def _expire(self):
+        self._timed_out = True
+        self._future.cancel()
+        self._future.add_done_callback(Deferred._discard)
+
+    @classmethod
+    def _discard(cls, future: concurrent.futures.Future):
+        # Late results of timed out Deferreds are retrieved (so errors are not reported as unhandled) and dropped.
+        if not future.cancelled():
+            future.exception()
+
+    def result(self) -> Any:
+        if self.timed_out():
+            return None
+        if not self._resolved:
+            value = self._future.result()
+            for fn in self._continuations:
+                value = fn(value)
+            self._value = value
+            self._resolved = True
+            self._continuations = []
+        return self._value
+
+
+class EventLoop(object):
+
+    # A single asyncio event loop, run on a daemon thread that is started the first time a coroutine is submitted.
+
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, coroutine) -> concurrent.futures.Future:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="MPEventLoop", daemon=True)
+                self._thread.start()
+
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+
 class OutputMethod(object):
 
+    reusable = False
+
     def __init__(self, agent: 'Agent', output: 'OutputXMR', callback: 'Callback'):
+        self.bind(agent, output, callback)
+
+    def bind(self, agent: 'Agent', output: 'OutputXMR', callback: 'Callback'):
         self.agent = agent
         self.output = output
         self.callback = callback
@@ -131,4 +407,5 @@ class MeaningProcedure(object):
         return super().__eq__(other)
 
 
+MPEventLoop = EventLoop()
 MPRegistry = Registry()
\ No newline at end of file
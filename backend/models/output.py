@@ -1,20 +1,91 @@
 from backend.models.effectors import Capability
 from backend.models.xmr import XMR
+from backend.utils.AtomicCounter import AtomicCounter
 from ontograph import graph
 from ontograph.Frame import Frame
 from ontograph.Index import Identifier
 from ontograph.Space import Space
-from typing import Any, List, Union
+from typing import Any, Dict, List, Tuple, Union
+
+import threading
+
+
+class Registry(object):
+    """
+    Output XMR templates by name: the space each template was built in, and its anchor.  Templates are registered as
+    they are built (including by DEFINE ... AS TEMPLATE), so lookups do not search the graph; a template that is not
+    registered is searched for once, and registered when found.  Entries are verified on read (the anchor must still
+    exist and still carry the name), so templates removed elsewhere (for example, by a graph reset) are dropped rather
+    than returned.  If two templates share a name, the first one registered is kept.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._templates: Dict[str, Tuple[str, str]] = {}
+
+    def register(self, name: str, space: Space, anchor: Frame):
+        with self._lock:
+            current = self._templates.get(name)
+            if current is not None and Registry._is_valid(name, current):
+                return
+            self._templates[name] = (space.name, anchor.id)
+
+    def lookup(self, name: str) -> Union[Tuple[Space, Frame], None]:
+        with self._lock:
+            entry = self._templates.get(name)
+            if entry is None:
+                return None
+            if not Registry._is_valid(name, entry):
+                del self._templates[name]
+                return None
+        return Space(entry[0]), Frame(entry[1])
+
+    def names(self) -> List[str]:
+        with self._lock:
+            names = list(self._templates.keys())
+        return list(filter(lambda name: self.lookup(name) is not None, names))
+
+    def clear(self):
+        with self._lock:
+            self._templates = {}
+
+    @classmethod
+    def _is_valid(cls, name: str, entry: Tuple[str, str]) -> bool:
+        space, anchor = entry
+        return space in graph and anchor in Space(space) and name in Frame(anchor)["NAME"]
+
+
+TemplateRegistry = Registry()
 
 
 class OutputXMRTemplate(object):
 
+    # Allocate the XMR-TEMPLATE#n and XMR#n space ids; seeded from the graph when knowledge is loaded
+    counter = AtomicCounter()
+    xmr_counter = AtomicCounter()
+
     @classmethod
-    def build(cls, name: str, type: XMR.Type, capability: Union[str, Identifier, Frame, Capability], params: List[str]) -> 'OutputXMRTemplate':
-        spaces = filter(lambda space: space.name.startswith("XMR-TEMPLATE#"), graph)
-        spaces = list(map(lambda space: int(space.name.replace("XMR-TEMPLATE#", "")), spaces))
+    def seed(cls):
+        OutputXMRTemplate.counter = AtomicCounter(OutputXMRTemplate._max_id("XMR-TEMPLATE#"))
+        OutputXMRTemplate.xmr_counter = AtomicCounter(OutputXMRTemplate._max_id("XMR#"))
+
+    @classmethod
+    def _max_id(cls, prefix: str) -> int:
+        ids = map(lambda space: space.name.replace(prefix, ""), filter(lambda space: space.name.startswith(prefix), graph))
+        ids = list(map(int, filter(lambda id: id.isdigit(), ids)))
+        return max(ids) if len(ids) > 0 else 0
+
+    @classmethod
+    def _next_id(cls, prefix: str, counter: AtomicCounter) -> str:
+        # Skips any ids already in use (by spaces created without the counter since it was seeded)
+        while True:
+            id = prefix + str(counter.increment())
+            if id not in graph:
+                return id
 
-        template_id = "XMR-TEMPLATE#" + str(max(spaces) + 1 if len(spaces) > 0 else 1)
+    @classmethod
+    def build(cls, name: str, type: XMR.Type, capability: Union[str, Identifier, Frame, Capability], params: List[str]) -> 'OutputXMRTemplate':
+        template_id = OutputXMRTemplate._next_id("XMR-TEMPLATE#", OutputXMRTemplate.counter)
 
         space = Space(template_id)
         anchor = Frame("@" + space.name + ".TEMPLATE-ANCHOR.?").add_parent("@EXE.TEMPLATE-ANCHOR")
@@ -31,33 +102,51 @@ class OutputXMRTemplate(object):
         anchor["REQUIRES"] = capability
         anchor["PARAMS"] = params
 
-        return OutputXMRTemplate(space)
+        TemplateRegistry.register(name, space, anchor)
+
+        return OutputXMRTemplate(space, anchor=anchor)
 
     @classmethod
     def lookup(cls, name: str) -> Union['OutputXMRTemplate', None]:
+        entry = TemplateRegistry.lookup(name)
+        if entry is not None:
+            return OutputXMRTemplate(entry[0], anchor=entry[1])
+
+        # Templates that were not registered (for example, built by hand) are searched for, and registered if found
         for space in graph:
             try:
                 template = OutputXMRTemplate(space)
                 if template.name() == name:
+                    TemplateRegistry.register(name, template.space, template.anchor())
                     return template
             except: pass
         return None
 
     @classmethod
     def list(cls) -> List['OutputXMRTemplate']:
-        templates = []
+        templates = map(lambda name: OutputXMRTemplate.lookup(name), TemplateRegistry.names())
+        templates = list(filter(lambda template: template is not None, templates))
+
+        # Only the template spaces not already listed are searched
+        listed = set(map(lambda template: template.space.name, templates))
         for space in graph:
+            if not space.name.startswith("XMR-TEMPLATE#") or space.name in listed:
+                continue
             try:
                 template = OutputXMRTemplate(space)
-                if template.space.name.startswith("XMR-TEMPLATE#") and template.anchor() is not None:
-                    templates.append(template)
+                TemplateRegistry.register(template.name(), template.space, template.anchor())
+                templates.append(template)
             except: pass
         return templates
 
-    def __init__(self, space: Space):
+    def __init__(self, space: Space, anchor: Frame=None):
         self.space = space
+        self._anchor = anchor
 
     def anchor(self) -> Frame:
+        if self._anchor is not None:
+            return self._anchor
+
         if self.space == graph.ontology():
             raise Exception
 
@@ -96,10 +185,7 @@ class OutputXMRTemplate(object):
         anchor["ROOT"] = root
 
     def create(self, space: Space, params: List[Any]) -> XMR:
-        spaces = filter(lambda space: space.name.startswith("XMR#"), graph)
-        spaces = list(map(lambda space: int(space.name.replace("XMR#", "")), spaces))
-
-        graph_id = "XMR#" + str(max(spaces) + 1 if len(spaces) > 0 else 1)
+        graph_id = OutputXMRTemplate._next_id("XMR#", OutputXMRTemplate.xmr_counter)
 
         xmr_graph = Space(graph_id)
         root = None
@@ -1,10 +1,10 @@
-from backend.models.mps import MPRegistry
+from backend.models.mps import Deferred, MPRegistry
 from ontograph.Frame import Frame, Role
 from ontograph.Graph import Graph
 from ontograph.Index import Identifier
 from ontograph.Query import Query
 from ontograph.Space import Space
-from typing import Any, Callable, List, Type, Union
+from typing import Any, Callable, Dict, List, Type, Union
 
 
 from typing import TYPE_CHECKING
@@ -59,6 +59,35 @@ class Variable(object):
         return super().__eq__(other)
 
 
+class LocalVariable(object):
+
+    # A variable binding held in memory by its VariableMap, rather than as a @*.VARIABLE frame in the graph; it
+    # is only written to the graph (as a Variable) when the VariableMap is materialized.
+
+    def __init__(self, name: str, value: Any, varmap: 'VariableMap'):
+        self._name = name
+        self._value = value
+        self._varmap = varmap
+
+    def name(self) -> str:
+        return self._name
+
+    def value(self) -> Any:
+        return self._value
+
+    def set_value(self, value: Any):
+        self._value = value
+
+    def varmap(self) -> 'VariableMap':
+        return self._varmap
+
+    def __eq__(self, other):
+        if isinstance(other, LocalVariable):
+            return self._name == other._name and self._value == other._value and self._varmap == other._varmap
+
+        return super().__eq__(other)
+
+
 class VariableMap(object):
 
     @classmethod
@@ -73,20 +102,61 @@ class VariableMap(object):
         if frame is None:
             frame = Frame("@" + space.name + ".VARMAP.?").add_parent(definition)
 
+        varmap = VariableMap(frame)
         for i, var in enumerate(definition["WITH"]):
             frame["WITH"] += var
-            variable_instance = Frame("@" + space.name + ".VARIABLE.?")
-            variable_instance["NAME"] = var
-            variable_instance["FROM"] = frame
-            variable_instance["VALUE"] = params[i]
+            varmap.bind(var, params[i])
 
-            frame["_WITH"] += variable_instance
+        return varmap
 
-        return VariableMap(frame)
+    # The slot holding the in-memory scope of the varmap
+    SCOPE = "_SCOPE"
+
+    @classmethod
+    def pending_id(cls, frame: Frame, variable: LocalVariable) -> str:
+        # How a variable not yet materialized is identified when shown (for example, by the graph view).
+        return frame.id + "." + variable.name()
 
     def __init__(self, frame: Frame):
         self.frame = frame
 
+    def _scope(self, create: bool=False) -> Union['StatementScope', None]:
+        if VariableMap.SCOPE in self.frame:
+            return self.frame[VariableMap.SCOPE].singleton()
+        if not create:
+            return None
+
+        scope = StatementScope()
+        self.frame[VariableMap.SCOPE] = scope
+        return scope
+
+    def pending(self) -> List[LocalVariable]:
+        # The variables bound in memory and not yet materialized; reading them does not write to the graph.
+        scope = self._scope()
+        if scope is None:
+            return []
+        return list(scope.variables.values())
+
+    def bind(self, name: str, value: Any) -> Union[Variable, LocalVariable]:
+        try:
+            variable = self.find(name)
+            variable.set_value(value)
+            return variable
+        except: pass
+
+        variable = LocalVariable(name, value, self)
+        self._scope(create=True).variables[name] = variable
+        return variable
+
+    def materialize(self):
+        scope = self._scope()
+        if scope is None:
+            return
+
+        for variable in list(scope.variables.values()):
+            Variable.instance(self.frame.space(), variable.name(), variable.value(), self)
+        scope.variables.clear()
+
     def assign(self, name: str, variable: Union[str, Identifier, Frame, Variable]):
         if isinstance(variable, str):
             variable = Frame(variable)
@@ -100,7 +170,11 @@ class VariableMap(object):
     def resolve(self, name: str) -> Any:
         return self.find(name).value()
 
-    def find(self, name: str) -> Variable:
+    def find(self, name: str) -> Union[Variable, LocalVariable]:
+        scope = self._scope()
+        if scope is not None and name in scope.variables:
+            return scope.variables[name]
+
         for var in self.frame["_WITH"]:
             var = Variable(var)
             if var.name() == name:
@@ -155,14 +229,16 @@ class TransientTriple(object):
 
 class StatementScope(object):
 
-    def __init__(self):
+    def __init__(self, defer: bool=False):
         from backend.models.agenda import Expectation
         from backend.models.output import XMR
 
+        # If defer is set, statements may return a Deferred (see AsyncAgentMethod) rather than waiting on the result.
+        self.defer = defer
         self.outputs: List[XMR] = []
         self.expectations: List[Expectation] = []
         self.transients: List[TransientFrame] = []
-        self.variables = {}
+        self.variables: Dict[str, LocalVariable] = {}
 
 
 class Registry(object):
@@ -272,8 +348,12 @@ class AddFillerStatement(Statement):
             if value ^ "@EXE.RETURNING-STATEMENT":
                 value = Statement.from_instance(value).run(StatementScope(), varmap)
 
+        from backend.models.xmr import XMRHeader
+
         for frame in to:
             frame[slot] += value
+            if slot in XMRHeader.SLOTS:
+                XMRHeader.refresh(frame)
 
     def __eq__(self, other):
         if isinstance(other, AddFillerStatement):
@@ -366,8 +446,12 @@ class AssignFillerStatement(Statement):
             if value ^ "@EXE.RETURNING-STATEMENT":
                 value = Statement.from_instance(value).run(StatementScope(), varmap)
 
+        from backend.models.xmr import XMRHeader
+
         for frame in to:
             frame[slot] = value
+            if slot in XMRHeader.SLOTS:
+                XMRHeader.refresh(frame)
 
     def __eq__(self, other):
         if isinstance(other, AssignFillerStatement):
@@ -392,7 +476,7 @@ class AssignVariableStatement(Statement):
         value = self.frame["ASSIGN"].singleton()
         value = self._resolve(value, scope, varmap)
 
-        Variable.instance(self.frame.space(), variable, value, varmap)
+        varmap.bind(variable, value)
 
     def _resolve(self, value, scope: StatementScope, varmap: VariableMap):
         if isinstance(value, list):
@@ -481,11 +565,10 @@ class ForEachStatement(Statement):
         variable: str = self.frame["ASSIGN"].singleton()
         do: List[Statement] = list(map(lambda stmt: Statement.from_instance(stmt), self.frame["DO"]))
 
-        var: Variable = None
         try:
             var = varmap.find(variable)
         except:
-            var = Variable.instance(self.frame.space(), variable, None, varmap)
+            var = varmap.bind(variable, None)
 
         for frame in query.start():
             var.set_value(frame)
@@ -600,7 +683,9 @@ class MeaningProcedureStatement(Statement):
 
         from backend import agent
         result = MPRegistry.run(mp, agent, *params, statement=self, varmap=varmap)
-        return result
+        if scope is not None and scope.defer:
+            return result
+        return Deferred.resolve(result)
 
     def __eq__(self, other):
         if isinstance(other, MeaningProcedureStatement):
@@ -6,31 +6,45 @@ class Syntax(object):
         self._raw_results = syntax_results
         self.dependencies = syntax_results["basicDeps"]
 
-        def is_integer(s):
-            try:
-                int(s)
-                return True
-            except ValueError:
-                return False
+        # Token entries are keyed by their position in the sentence
+        self.index = dict((key, syntax_results[key]) for key in filter(lambda key: key.lstrip("-").isdigit(), syntax_results.keys()))
 
-        self.index = dict((key, syntax_results[key]) for key in filter(lambda key: is_integer(key), syntax_results.keys()))
+        # Positions of the dependencies (in self.dependencies) by type, governor and dependent
+        self._by_type = {}
+        self._by_governor = {}
+        self._by_dependent = {}
 
-    def find_dependencies(self, types=None, governors=None, dependents=None):
-        results = self.dependencies
-
-        if types is not None:
-            if type(types) is not list:
-                types = [types]
-            results = filter(lambda dependency: dependency[0] in types, results)
-
-        if governors is not None:
-            if type(governors) is not list:
-                governors = [governors]
-            results = filter(lambda dependency: dependency[1] in governors, results)
+        for position, dependency in enumerate(self.dependencies):
+            self._by_type.setdefault(dependency[0], []).append(position)
+            self._by_governor.setdefault(dependency[1], []).append(position)
+            self._by_dependent.setdefault(dependency[2], []).append(position)
 
-        if dependents is not None:
-            if type(dependents) is not list:
-                dependents = [dependents]
-            results = filter(lambda dependency: dependency[2] in dependents, results)
-
-        return list(results)
\ No newline at end of file
+    def find_dependencies(self, types=None, governors=None, dependents=None):
+        # Candidates are taken from the smallest of the requested indexes, and checked against the others; results are
+        # in their original order.
+        constraints = []
+
+        for values, index, field in [(types, self._by_type, 0), (governors, self._by_governor, 1), (dependents, self._by_dependent, 2)]:
+            if values is None:
+                continue
+            if type(values) is not list:
+                values = [values]
+
+            positions = []
+            for value in values:
+                positions.extend(index.get(value, []))
+            constraints.append((positions, set(values), field))
+
+        if len(constraints) == 0:
+            return list(self.dependencies)
+
+        constraints.sort(key=lambda constraint: len(constraint[0]))
+        positions = sorted(set(constraints[0][0]))
+
+        results = []
+        for position in positions:
+            dependency = self.dependencies[position]
+            if all(map(lambda constraint: dependency[constraint[2]] in constraint[1], constraints[1:])):
+                results.append(dependency)
+
+        return results
@@ -1,15 +1,122 @@
 from backend.models.syntax import Syntax
-from backend.models.xmr import XMR
+from backend.models.xmr import RowBatch, XMR
+from backend.utils.SlotIndex import SlotFillerIndex
 from backend.utils.AtomicCounter import AtomicCounter
 from ontograph.Frame import Frame
 from ontograph.Index import Identifier
-from ontograph.Query import ExistsComparator, Query
+from ontograph import graph
+from ontograph.Query import AndComparator, InSpaceComparator, IsAComparator, Query
 from ontograph.Space import Space
-from typing import Iterable, Union
+from typing import Dict, Iterable, List, Set, Union
 
 import re
 
 
+# Numbered suffixes on TMR instance names ("CHAIR-1") and on repeated slot keys ("INSTRUMENT-1").
+INSTANCE_SUFFIX = re.compile(r"-([0-9]+)$")
+SLOT_SUFFIX = re.compile(r"-[0-9]+$")
+
+
+class SlotKindTable(object):
+
+    # The ontology properties whose fillers are frame references (RELATION and ONTOLOGY-SLOT, and their descendants),
+    # computed with one query per root the first time they are needed, rather than with two subsumption checks for every
+    # key of every instance.  The table must be invalidated when the ontology changes (the ontology and knowledge
+    # loaders do so); it is then rebuilt on the next lookup.
+
+    ROOTS = ["@ONT.RELATION", "@ONT.ONTOLOGY-SLOT"]
+
+    def __init__(self):
+        self._references: Set[str] = None
+
+    def is_reference(self, key: str) -> bool:
+        return key in self.references()
+
+    def references(self) -> Set[str]:
+        references = self._references
+        if references is None:
+            references = self.refresh()
+        return references
+
+    def refresh(self) -> Set[str]:
+        references = set()
+        for root in SlotKindTable.ROOTS:
+            for frame in Query(AndComparator([InSpaceComparator(graph.ontology()), IsAComparator(root)])).start():
+                references.add(frame.id[len("@ONT."):])
+
+        self._references = references
+        return references
+
+    def invalidate(self):
+        self._references = None
+
+
+class TMRSummary(object):
+
+    # What is asked of a TMR as a whole (its main event, whether it is a prefix or postfix utterance, and which instances
+    # are of a given concept), computed in one pass over its space when it is ingested and stored with the TMR; each
+    # instance is indexed under every concept it descends from, so lookups need no subsumption checks.  A summary is a
+    # snapshot: a TMR space modified after ingestion must be summarized again.  TMRs built from contents (which are
+    # usually filled in by hand afterwards) are not summarized until asked to be; until then, each use summarizes anew.
+
+    def __init__(self, main_event: str=None, prefix: bool=False, postfix: bool=False, concepts: Dict[str, List[str]]=None):
+        self.main_event = main_event
+        self.prefix = prefix
+        self.postfix = postfix
+        self.concepts = concepts if concepts is not None else {}
+
+    @classmethod
+    def summarize(cls, space: Iterable[Frame]) -> 'TMRSummary':
+        summary = TMRSummary()
+        ancestry = {}
+
+        def ancestors(frame: Frame) -> Set[str]:
+            # TMR instances name their concept with INSTANCE-OF, which is followed here along with IS-A
+            if frame.id not in ancestry:
+                ancestry[frame.id] = set()
+                for parent in list(frame.parents()) + list(frame["INSTANCE-OF"]):
+                    parent = parent if isinstance(parent, Frame) else Frame(parent)
+                    ancestry[frame.id].add(parent.id)
+                    ancestry[frame.id].update(ancestors(parent))
+            return ancestry[frame.id]
+
+        instances = list(space)
+        events = []
+
+        for instance in instances:
+            concepts = ancestors(instance)
+            for concept in concepts:
+                summary.concepts.setdefault(concept, []).append(instance.id)
+
+            if "@ONT.EVENT" in concepts:
+                events.append(instance)
+                if [">", "FIND-ANCHOR-TIME"] in instance["TIME"]:
+                    summary.prefix = True
+                if ["<", "FIND-ANCHOR-TIME"] in instance["TIME"]:
+                    summary.postfix = True
+
+            # For closing generic events, such as "Finished."
+            if "@ONT.ASPECT" in concepts and instance["PHASE"] == "END":
+                scopes = list(map(lambda filler: filler.parents()[0], instance["SCOPE"]))
+                if "@ONT.EVENT" in scopes:
+                    summary.postfix = True
+
+        event = events[0] if len(events) > 0 else None
+        while event is not None and "PURPOSE-OF" in event:
+            event = event["PURPOSE-OF"][0]
+        summary.main_event = event.id if event is not None else None
+
+        return summary
+
+    def find_by_concept(self, concept: Union[str, Identifier, Frame]) -> List[str]:
+        if isinstance(concept, Frame) or isinstance(concept, Identifier):
+            concept = concept.id
+        if not concept.startswith("@"):
+            concept = "@ONT." + concept
+
+        return list(self.concepts.get(concept, []))
+
+
 class TMR(XMR):
 
     counter = AtomicCounter()
@@ -36,7 +143,10 @@ class TMR(XMR):
             "tmr": tmr
         }
 
-        return TMR.from_json(tmr_dict, namespace=namespace, source=source)
+        tmr = TMR.from_json(tmr_dict, namespace=namespace, source=source)
+        del tmr.frame["SUMMARY"]
+
+        return tmr
 
     @classmethod
     def from_json(cls, tmr_dict: dict, namespace: str=None, source: Union[str, Identifier, Frame]=None) -> 'TMR':
@@ -44,47 +154,50 @@ class TMR(XMR):
         if namespace is None:
             namespace = "TMR#" + str(TMR.counter.increment())
 
-        space = Space(namespace)
+        return TMR.from_rows(TMR.rows(tmr_dict, namespace), tmr_dict, source=source)
+
+    @classmethod
+    def from_rows(cls, batch: RowBatch, tmr_dict: dict, source: Union[str, Identifier, Frame]=None) -> 'TMR':
+        space = batch.commit()
+
+        summary = TMRSummary.summarize(space)
+        root = Frame(summary.main_event) if summary.main_event is not None else None
+
+        tmr: TMR = XMR.instance(Space("INPUTS"), space, XMR.Signal.INPUT, XMR.Type.LANGUAGE, XMR.InputStatus.RECEIVED, source, root)
+        tmr.frame["SUMMARY"] = summary
+        tmr.frame["SENTENCE"] = tmr_dict["sentence"]
+        tmr.frame["SYNTAX"] = Syntax(tmr_dict["syntax"][0])
+
+        return tmr
+
+    @classmethod
+    def rows(cls, tmr_dict: dict, namespace: str, slot_kinds: 'SlotKindTable'=None) -> RowBatch:
+        # All frame ids are resolved up front, so that every row (including references between instances) can be
+        # built without consulting the graph for the TMR space itself.  Given a built slot kind table, the graph is
+        # not consulted at all (and so the rows can be built in another process).
+
+        batch = RowBatch(namespace)
 
         result = tmr_dict["tmr"][0]["results"][0]["TMR"]
 
         frame_ids = {}
         for key in result:
             if key == key.upper():
-                frame_id = "@" + space.name + "." + re.sub(r"-([0-9]+)$", ".\\1", key)
-                frame_ids[key] = frame_id
+                frame_ids[key] = "@" + namespace + "." + INSTANCE_SUFFIX.sub(".\\1", key)
+        local_ids = set(frame_ids.values())
 
         for key in result:
             if key == key.upper():
                 inst_dict = result[key]
-                frame_id = frame_ids[key]
 
                 concept = inst_dict["concept"]
                 if concept is not None:
                     if not concept.startswith("@ONT."):
                         concept = "@ONT." + concept
 
-                TMRFrame.parse(frame_id, space, frame_ids, properties=inst_dict, isa=concept, index=inst_dict["sent-word-ind"][1])
-
-        def find_root() -> Frame:
-            event = None
-            for instance in space:
-                try:
-                    if instance ^ "@ONT.EVENT":
-                        event = instance
-                        break
-                except: pass
+                TMRFrame.rows(batch, frame_ids[key], local_ids, properties=inst_dict, isa=concept, slot_kinds=slot_kinds)
 
-            while event is not None and "PURPOSE-OF" in event:
-                event = event["PURPOSE-OF"][0]
-
-            return event
-
-        tmr: TMR = XMR.instance(Space("INPUTS"), space, XMR.Signal.INPUT, XMR.Type.LANGUAGE, XMR.InputStatus.RECEIVED, source, find_root())
-        tmr.frame["SENTENCE"] = tmr_dict["sentence"]
-        tmr.frame["SYNTAX"] = Syntax(tmr_dict["syntax"][0])
-
-        return tmr
+        return batch
 
     def syntax(self) -> Syntax:
         return self.frame["SYNTAX"].singleton()
@@ -94,46 +207,28 @@ class TMR(XMR):
             return super().render()
         return self.frame["SENTENCE"].singleton()
 
-    def find_main_event(self):
-        event = None
-        for instance in self.space():
-            if TMRFrame(instance.id).is_event():
-                event = instance
-                break
+    def summary(self) -> TMRSummary:
+        if "SUMMARY" not in self.frame:
+            return TMRSummary.summarize(self.space())
+        return self.frame["SUMMARY"].singleton()
 
-        while event is not None and "PURPOSE-OF" in event:
-            event = event["PURPOSE-OF"][0]
+    def summarize(self) -> TMRSummary:
+        summary = TMRSummary.summarize(self.space())
+        self.frame["SUMMARY"] = summary
+        return summary
 
-        return event
+    def find_main_event(self):
+        event = self.summary().main_event
+        return Frame(event) if event is not None else None
 
     def is_prefix(self):
-        for instance in self.space():
-            if TMRFrame(instance.id).is_event():
-                if [">", "FIND-ANCHOR-TIME"] in instance["TIME"]:
-                    return True
-
-        return False
+        return self.summary().prefix
 
     def is_postfix(self):
-        for instance in self.space():
-            if TMRFrame(instance.id).is_event():
-                if ["<", "FIND-ANCHOR-TIME"] in instance["TIME"]:
-                    return True
-
-        # For closing generic events, such as "Finished."
-        for instance in self.space():
-            if instance.isa("@ONT.ASPECT"):
-                if instance["PHASE"] == "END":
-                    scopes = list(map(lambda filler: filler.parents()[0], instance["SCOPE"]))  # TODO: this needs search functionality ("is a filler in the slot exactly concept X?")
-                    if "@ONT.EVENT" in scopes:
-                        return True
-
-        return False
+        return self.summary().postfix
 
-    # TODO: Ultimately, replace with a generic querying capability
     def find_by_concept(self, concept):
-        instances = list(filter(lambda instance: instance.isa(concept), self.space()))
-        return instances
+        return list(map(lambda instance: Frame(instance), self.summary().find_by_concept(concept)))
 
     def __str__(self):
         return self.sentence
@@ -143,6 +238,8 @@ class TMR(XMR):
 
 class TMRFrame(Frame):
 
+    slot_kinds = SlotKindTable()
+
     @classmethod
     def parse(cls, name, space: Space, frame_ids: dict, properties=None, isa=None, index=None) -> 'TMRFrame':
         frame = TMRFrame(name)
@@ -163,28 +260,14 @@ class TMRFrame(Frame):
             # Sometimes TMR instance slots have a -1, etc., rather than being a list; by dropping this value,
             # and using += below, they are automatically converted to a list if required.
             original_key = key
-            key = re.sub(r"-[0-9]+$", "", key)
+            key = SLOT_SUFFIX.sub("", key)
 
-            key_as_frame = Frame("@ONT." + key, declare=False)
-            if key_as_frame ^ "@ONT.RELATION" or key_as_frame ^ "@ONT.ONTOLOGY-SLOT":
+            if TMRFrame.is_reference_slot(key):
                 value = _properties[original_key]
                 if not isinstance(value, list):
                     value = [value]
                 for v in value:
-                    v = "@" + re.sub(r"-([0-9]+)$", ".\\1", v)
-                    try:
-                        parts = Identifier.parse(v)
-                        if isinstance(parts[0], str) and isinstance(parts[1], str) and parts[2] is None:
-                            as_tmr_frame = "@" + space.name + "." + parts[0] + "." + parts[1]
-                            as_ont_frame = "@ONT." + parts[0] + "." + parts[1]
-                            if as_tmr_frame in frame_ids.values():
-                                v = as_tmr_frame
-                            else:
-                                v = as_ont_frame
-                    except:
-                        v = v.replace("@", "@ONT.")
-
-                    frame[key] += Frame(v)
+                    frame[key] += Frame(TMRFrame.resolve_reference(v, space.name, frame_ids.values()))
             else:
                 frame[key] += _properties[original_key]
 
@@ -192,6 +275,65 @@ class TMRFrame(Frame):
 
         return frame
 
+    @classmethod
+    def rows(cls, batch: RowBatch, name: str, local_ids: Set[str], properties: dict=None, isa: str=None, slot_kinds: SlotKindTable=None):
+        # The row-building equivalent of parse; fillers are added exactly as += would add them (lists are expanded).
+
+        if properties is None:
+            properties = {}
+        if slot_kinds is None:
+            slot_kinds = TMRFrame.slot_kinds
+
+        count = len(batch)
+
+        if isa is not None:
+            batch.add(name, "INSTANCE-OF", Identifier(isa))
+
+        for original_key in properties:
+            if original_key != original_key.upper():
+                continue
+
+            key = SLOT_SUFFIX.sub("", original_key)
+            value = properties[original_key]
+            if not isinstance(value, list):
+                value = [value]
+
+            if slot_kinds.is_reference(key):
+                for v in value:
+                    v = TMRFrame.resolve_reference(v, batch.namespace, local_ids)
+                    if v not in local_ids:
+                        batch.declare(v)
+                    batch.add(name, key, Identifier(v))
+            else:
+                for v in value:
+                    batch.add(name, key, v)
+
+        if len(batch) == count:
+            batch.declare(name)
+
+    @classmethod
+    def is_reference_slot(cls, key: str) -> bool:
+        return TMRFrame.slot_kinds.is_reference(key)
+
+    @classmethod
+    def resolve_reference(cls, value: str, namespace: str, local_ids: Iterable[str]) -> str:
+        # TMR references (e.g. "CHAIR-1") are to other instances in the same TMR if they exist there, and otherwise
+        # to the ontology.
+        value = "@" + INSTANCE_SUFFIX.sub(".\\1", value)
+        try:
+            parts = Identifier.parse(value)
+            if isinstance(parts[0], str) and isinstance(parts[1], str) and parts[2] is None:
+                as_tmr_frame = "@" + namespace + "." + parts[0] + "." + parts[1]
+                as_ont_frame = "@ONT." + parts[0] + "." + parts[1]
+                if as_tmr_frame in local_ids:
+                    value = as_tmr_frame
+                else:
+                    value = as_ont_frame
+        except:
+            value = value.replace("@", "@ONT.")
+
+        return value
+
     def _ISA_type(self):
         return "INSTANCE-OF"
 
@@ -214,7 +356,7 @@ class TMRFrame(Frame):
         return self
 
     def tmr(self) -> TMR:
-        results = list(Query(ExistsComparator(slot="REFERS-TO-GRAPH", filler=self.space().name)).start())
+        results = SlotFillerIndex.lookup("REFERS-TO-SPACE", self.space().name)
         if len(results) != 1:
             raise Exception("TMR wrapper node not found.")
 
@@ -230,38 +372,19 @@ class TMRGraph(Space):
     def _frame_type(self):
         return TMRFrame
 
-    def find_main_event(self):
-        event = None
-        for instance in self.values():
-            if instance.is_event():
-                event = instance
-                break
-
-        while event is not None and "PURPOSE-OF" in event:
-            event = event["PURPOSE-OF"][0].resolve()
+    def summary(self) -> TMRSummary:
+        # The summary stored with the TMR this space belongs to, if there is one.
+        results = SlotFillerIndex.lookup("REFERS-TO-SPACE", self.name)
+        if len(results) == 1:
+            return TMR(results[0]).summary()
+        return TMRSummary.summarize(self)
 
-        return event
+    def find_main_event(self):
+        event = self.summary().main_event
+        return TMRFrame(event) if event is not None else None
 
     def is_prefix(self):
-        for instance in self.values():
-            if instance.is_event():
-                if instance["TIME"] == [[">", "FIND-ANCHOR-TIME"]]:
-                    return True
-
-        return False
+        return self.summary().prefix
 
     def is_postfix(self):
-        for instance in self.values():
-            if instance.is_event():
-                if instance["TIME"] == [["<", "FIND-ANCHOR-TIME"]]:
-                    return True
-
-        # For closing generic events, such as "Finished."
-        for instance in self.values():
-            if instance.isa("ONT.ASPECT"):
-                if instance["PHASE"] == "END":
-                    scopes = list(map(lambda filler: filler.resolve().concept(), instance["SCOPE"]))  # TODO: this needs search functionality ("is a filler in the slot exactly concept X?")
-                    if "ONT.EVENT" in scopes:
-                        return True
-
-        return False
+        return self.summary().postfix
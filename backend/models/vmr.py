@@ -1,10 +1,11 @@
 from backend.models.environment import Environment
-from backend.models.xmr import XMR
+from backend.models.xmr import RowBatch, XMR
 from backend.utils.AtomicCounter import AtomicCounter
 from ontograph.Frame import Frame
 from ontograph.Index import Identifier
 from ontograph.Space import Space
-from typing import List, Union
+from enum import Enum
+from typing import Dict, List, Union
 
 import time
 
@@ -12,6 +13,12 @@ import time
 class VMR(XMR):
     counter = AtomicCounter()
 
+    class Change(Enum):
+        MOVED = "MOVED"
+        ENTERED = "ENTERED"
+        EXITED = "EXITED"
+        OBSERVED = "OBSERVED"
+
     @classmethod
     def from_contents(cls, contains: dict=None, events: dict=None, namespace: str=None, source: Union[str, Identifier, Frame]=None) -> 'VMR':
 
@@ -37,28 +44,42 @@ class VMR(XMR):
         if namespace is None:
             namespace = "VMR#" + str(VMR.counter.increment())
 
-        space = Space(namespace)
+        return VMR.from_rows(VMR.rows(vmr_dict, namespace), source=source)
 
-        reference = Frame("@" + space.name + ".ENVIRONMENT")
-        events = Frame("@" + space.name + ".EVENTS")
+    @classmethod
+    def rows(cls, vmr_dict: dict, namespace: str) -> RowBatch:
+        # Builds the complete row set for the VMR space without touching the graph (see TMR.rows); location markers are
+        # numbered in order, as they would be in a new space.
+
+        batch = RowBatch(namespace)
+
+        reference = "@" + namespace + ".ENVIRONMENT"
+        events = "@" + namespace + ".EVENTS"
+
+        batch.declare(reference)
+        batch.declare(events)
 
         if "ENVIRONMENT" in vmr_dict:
 
-            reference["REFERS-TO"] = vmr_dict["ENVIRONMENT"]["_refers_to"]
-            reference["TIMESTAMP"] = vmr_dict["ENVIRONMENT"]["timestamp"]
+            batch.add(reference, "REFERS-TO", vmr_dict["ENVIRONMENT"]["_refers_to"])
+            batch.add(reference, "TIMESTAMP", vmr_dict["ENVIRONMENT"]["timestamp"])
 
+            count = 0
             for frame in vmr_dict["ENVIRONMENT"]["contains"]:
-                frame = Frame(frame)
-                location = Frame(vmr_dict["ENVIRONMENT"]["contains"][frame]["LOCATION"])
+                location = vmr_dict["ENVIRONMENT"]["contains"][frame]["LOCATION"]
+                batch.declare(frame)
                 if location == "NOT-HERE":
                     continue
 
                 if location == "HERE":
                     location = reference
+                else:
+                    batch.declare(location)
 
-                location_frame = Frame("@" + space.name + ".LOCATION.?")
-                location_frame["DOMAIN"] = frame
-                location_frame["RANGE"] = location
+                count += 1
+                location_frame = "@" + namespace + ".LOCATION." + str(count)
+                batch.add(location_frame, "DOMAIN", Identifier(frame))
+                batch.add(location_frame, "RANGE", Identifier(location))
 
         if "EVENTS" in vmr_dict:
 
@@ -66,14 +87,22 @@ class VMR(XMR):
                 contents = vmr_dict["EVENTS"][frame]
                 parts = Identifier.parse(frame)
                 if isinstance(parts[0], str) and isinstance(parts[1], str) and parts[2] is None:
-                    frame = "@" + space.name + "." + parts[0] + "." + str(parts[1])
-                frame = Frame(frame)
+                    frame = "@" + namespace + "." + parts[0] + "." + str(parts[1])
+                batch.declare(frame)
                 for slot in contents:
                     for filler in contents[slot]:
                         if filler.startswith("@"):
-                            filler = Frame(filler)
-                        frame[slot] += filler
-                events["HAS-EVENT"] += frame
+                            batch.declare(filler)
+                            filler = Identifier(filler)
+                        batch.add(frame, slot, filler)
+                batch.add(events, "HAS-EVENT", Identifier(frame))
+
+        return batch
+
+    @classmethod
+    def from_rows(cls, batch: RowBatch, source: Union[str, Identifier, Frame]=None) -> 'VMR':
+        space = batch.commit()
+        reference = Frame("@" + space.name + ".ENVIRONMENT")
 
         vmr: VMR = XMR.instance(Space("INPUTS"), space, XMR.Signal.INPUT, XMR.Type.VISUAL, XMR.InputStatus.RECEIVED, source, reference)
         return vmr
@@ -82,16 +111,13 @@ class VMR(XMR):
         space = self.space()
         return list(filter(lambda f: Identifier.parse(f.id)[1] == "LOCATION", space))
 
-    def update_environment(self, environment: Union[Space, Environment]):
+    def update_environment(self, environment: Union[Space, Environment]) -> Dict[str, List[str]]:
+        # Only the differences from the current epoch are applied: objects that have entered, exited or moved.  The
+        # delta (lists of object ids) is returned.
         if isinstance(environment, Space):
-            environment = Environment(environment)
-
-        epoch = environment.advance()
-        self.frame["EPOCH"] = epoch
-
-        for object in environment.current():
-            environment.exit(object)
+            environment = Environment.of(environment)
 
+        observed = {}
         for location_marker in self.locations():
             object = location_marker["DOMAIN"].singleton()
             location = location_marker["RANGE"].singleton()
@@ -99,7 +125,105 @@ class VMR(XMR):
             if location == Frame("@" + self.space().name + ".ENVIRONMENT"):
                 location = "@ONT.LOCATION"
 
-            environment.enter(object, location=location)
+            observed[object.id] = (object, location)
+
+        epoch = environment.advance()
+        self.frame["EPOCH"] = epoch
+
+        present = set(map(lambda object: object.id, environment.current()))
+        located = environment.locations(epoch)
+
+        delta = {"entered": [], "exited": [], "moved": []}
+
+        # The same differences are recorded with the VMR as change records, so rendering it never revisits the
+        # environment
+        for object in environment.current():
+            if object.id not in observed:
+                environment.exit(object)
+                delta["exited"].append(object.id)
+                self._record_change(VMR.Change.EXITED, object, source=located.get(object.id))
+
+        for id, (object, location) in observed.items():
+            if id not in present:
+                environment.enter(object, location=location)
+                delta["entered"].append(id)
+                self._record_change(VMR.Change.ENTERED, object, target=location)
+            elif id not in located or VMR._location_id(located[id]) != VMR._location_id(location):
+                environment.move(object, location)
+                delta["moved"].append(id)
+                self._record_change(VMR.Change.MOVED, object, source=located.get(id), target=location)
+
+        self._record_events()
+        self.frame["CHANGES-RECORDED"] = True
+
+        return delta
+
+    def changes(self) -> List[Frame]:
+        # The change records of this VMR, in order (moved/entered/exited objects, then observed events).  A VMR that
+        # did not update the environment on ingestion is compared against the environment once, here, instead.
+        if "CHANGES-RECORDED" not in self.frame:
+            self._record_environment_changes()
+            self._record_events()
+            self.frame["CHANGES-RECORDED"] = True
+
+        return list(self.frame["HAS-CHANGE"])
+
+    def _record_change(self, type: 'VMR.Change', object: Frame, source: Union[str, Frame]=None, target: Union[str, Frame]=None, action: str=None) -> Frame:
+        change = Frame("@" + self.space().name + ".CHANGE.?")
+        change["TYPE"] = type.value
+        change["OBJECT"] = object
+        if isinstance(source, str):
+            source = Frame(source)
+        if isinstance(target, str):
+            target = Frame(target)
+        if source is not None:
+            change["FROM"] = source
+        if target is not None:
+            change["TO"] = target
+        if action is not None:
+            change["ACTION"] = action
+
+        self.frame["HAS-CHANGE"] += change
+        return change
+
+    def _record_environment_changes(self):
+        def get_location(env: Environment, object: Frame, epoch: Frame) -> Union[Frame, None]:
+            try:
+                return env.location(object, epoch)
+            except:
+                return None
+
+        try:
+            env = Environment.of(Space("ENV"))
+
+            now = self.epoch()
+            if len(now["FOLLOWS"]) == 0:
+                then = Frame("@ENV.NO-SUCH-EPOCH", declare=False)
+            else:
+                then = now["FOLLOWS"].singleton()
+
+            for o in env.moved(then, now):
+                self._record_change(VMR.Change.MOVED, o, source=get_location(env, o, then), target=get_location(env, o, now))
+
+            for o in env.entered(then, now):
+                self._record_change(VMR.Change.ENTERED, o, target=get_location(env, o, now))
+
+            for o in env.exited(then, now):
+                self._record_change(VMR.Change.EXITED, o)
+        except: pass
+
+    def _record_events(self):
+        try:
+            for e in self.events():
+                change = self._record_change(VMR.Change.OBSERVED, e["AGENT"].singleton(), action=Identifier.parse(e.id)[1])
+                change["THEME"] = e["THEME"].singleton()
+        except: pass
+
+    @classmethod
+    def _location_id(cls, location: Union[str, Identifier, Frame]) -> str:
+        if isinstance(location, Frame) or isinstance(location, Identifier):
+            return location.id
+        return str(location)
 
     def events(self) -> List[Frame]:
         return list(Frame("@" + self.space().name + ".EVENTS")["HAS-EVENT"])
@@ -124,26 +248,11 @@ class VMR(XMR):
                     frame[slot.property] += filler
 
     def render(self):
+        if self.is_archived():
+            return super().render()
 
         observations = []
 
-        def get_location(env: Environment, object: Frame, epoch: Frame) -> Union[Frame, None]:
-            try:
-                return env.location(object, epoch)
-            except:
-                return None
-
-        def get_then(now: Frame) -> Frame:
-            if len(now["FOLLOWS"]) == 0:
-                return Frame("@ENV.NO-SUCH-EPOCH", declare=False)
-            return now["FOLLOWS"].singleton()
-
-        def get_view(env: Environment, epoch: Frame) -> List[Frame]:
-            try:
-                return env.view(epoch)
-            except:
-                return []
-
         def get_name(frame: Frame) -> str:
             if "NAME" in frame:
                 return frame["NAME"].singleton()
@@ -152,37 +261,18 @@ class VMR(XMR):
             return frame.id
 
         try:
-            env = Environment(Space("ENV"))
-
-            now = self.epoch()
-            then = get_then(now)
-
-            all_known_objects = set(get_view(env, now))
-            all_known_objects = all_known_objects.union(get_view(env, then))
-
-            for o in all_known_objects:
-                location_now = get_location(env, o, now)
-                location_then = get_location(env, o, then)
-
-                if location_now != None and location_then != None and location_now != location_then:
-                    observations.append("I see that " + get_name(o) + " moved from the " + get_name(location_then) + " to the " + get_name(location_now))
-
-                if location_now != None and location_then == None:
-                    observations.append("I see that " + get_name(o) + " is now in the environment, at the " + get_name(location_now))
-
-                if location_now == None and location_then != None:
-                    observations.append("I see that " + get_name(o) + " has left the environment")
-        except: pass
-
-        try:
-            for e in self.events():
-                agent = e["AGENT"].singleton()
-                theme = e["THEME"].singleton()
-                action = Identifier.parse(e.id)[1]
-
-                observations.append("I see that " + get_name(agent) + " did " + action + "(" + get_name(theme) + ")")
-
-
+            for change in self.changes():
+                type = VMR.Change(change["TYPE"].singleton())
+                object = change["OBJECT"].singleton()
+
+                if type == VMR.Change.MOVED:
+                    observations.append("I see that " + get_name(object) + " moved from the " + get_name(change["FROM"].singleton()) + " to the " + get_name(change["TO"].singleton()))
+                if type == VMR.Change.ENTERED:
+                    observations.append("I see that " + get_name(object) + " is now in the environment, at the " + get_name(change["TO"].singleton()))
+                if type == VMR.Change.EXITED:
+                    observations.append("I see that " + get_name(object) + " has left the environment")
+                if type == VMR.Change.OBSERVED:
+                    observations.append("I see that " + get_name(object) + " did " + change["ACTION"].singleton() + "(" + get_name(change["THEME"].singleton()) + ")")
         except: pass
 
         if len(observations) == 0:
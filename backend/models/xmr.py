@@ -1,13 +1,19 @@
 from backend.models.effectors import Capability
+from backend.utils.SlotIndex import SlotFillerIndex
 from enum import Enum
+from ontograph import graph
 from ontograph.Frame import Frame
 from ontograph.Index import Identifier
 from ontograph.Space import Space
-from typing import Union
+from typing import Any, List, Union
 
 import time
 
 
+# XMR frames are found from the space they refer to by reverse lookup.
+SlotFillerIndex.declare("REFERS-TO-SPACE")
+
+
 # XMR is a Frame wrapper object for holding a node as a reference to a particular meaning representation, and resolving
 # a graph from a network for that MR.  An example usage is holding a reference to a TMR as part of agent input
 # and agenda processing.
@@ -70,7 +76,7 @@ class XMR(object):
 
         frame = Frame("@" + space.name + ".XMR.?").add_parent(isa)
 
-        frame["REFERS-TO-SPACE"] = refers_to
+        SlotFillerIndex.set(frame, "REFERS-TO-SPACE", refers_to)
         frame["SIGNAL"] = signal
         frame["TYPE"] = type
         frame["STATUS"] = status
@@ -81,6 +87,8 @@ class XMR(object):
         if capability is not None:
             frame["REQUIRES"] = capability
 
+        frame[XMRHeader.SLOT] = XMRHeader.read(frame)
+
         return XMR.from_instance(frame)
 
     def __eq__(self, other):
@@ -94,8 +102,15 @@ class XMR(object):
     def __init__(self, frame: Frame):
         self.frame = frame
 
+    def header(self) -> 'XMRHeader':
+        # The header kept with the frame (see XMRHeader), or, for a frame not made by XMR.instance, read from its slots.
+        header = self.frame[XMRHeader.SLOT].singleton()
+        if header is None:
+            header = XMRHeader.read(self.frame)
+        return header
+
     def signal(self) -> Signal:
-        return self.frame["SIGNAL"].singleton()
+        return self.header().signal
 
     def is_input(self) -> bool:
         return self.signal() == XMR.Signal.INPUT
@@ -104,29 +119,19 @@ class XMR(object):
         return self.signal() == XMR.Signal.OUTPUT
 
     def status(self) -> Union[InputStatus, OutputStatus]:
-        status = self.frame["STATUS"].singleton()
-        if isinstance(status, str):
-            if status in [item.value for item in XMR.InputStatus]:
-                status = XMR.InputStatus[status]
-            if status in [item.value for item in XMR.OutputStatus]:
-                status = XMR.OutputStatus[status]
-
-        return status
+        return self.header().status
 
     def type(self) -> Type:
-        type = self.frame["TYPE"].singleton()
-        if isinstance(type, str):
-            type = XMR.Type[type]
-        return type
+        return self.header().type
 
     def source(self) -> Frame:
-        return self.frame["SOURCE"].singleton()
+        return self.header().source
 
     def space(self) -> Space:
-        return Space(self.frame["REFERS-TO-SPACE"].singleton())
+        return Space(self.header().space)
 
     def timestamp(self) -> float:
-        return self.frame["TIMESTAMP"].singleton()
+        return self.header().timestamp
 
     def root(self) -> Frame:
         return self.frame["ROOT"].singleton()
@@ -136,14 +141,103 @@ class XMR(object):
 
     def set_status(self, status: Union[InputStatus, OutputStatus]):
         self.frame["STATUS"] = status
+        XMRHeader.refresh(self.frame)
+        if isinstance(status, XMR.InputStatus) and status != XMR.InputStatus.RECEIVED and "PROCESSED" not in self.frame:
+            self.frame["PROCESSED"] = time.time()
+
+    def set_timestamp(self, timestamp: float):
+        self.frame["TIMESTAMP"] = timestamp
+        XMRHeader.refresh(self.frame)
+
+    def processed(self) -> float:
+        # When the input left the RECEIVED status (or, if that was not recorded, when it arrived).
+        if "PROCESSED" in self.frame:
+            return self.frame["PROCESSED"].singleton()
+        return self.timestamp()
+
+    def is_archived(self) -> bool:
+        return "RENDERED" in self.frame
+
+    def archive(self):
+        # Keeps only this frame, holding its rendering, and the root frame (so that ROOT does not dangle) in place of the
+        # space it refers to.  Archived XMRs render from RENDERED alone.
+        self.frame["RENDERED"] = self.render()
+        self._clear_space(keep=self.root())
+
+        # Change records (of VMRs) are frames in the cleared space
+        if "HAS-CHANGE" in self.frame:
+            del self.frame["HAS-CHANGE"]
+
+    def discard(self):
+        self._clear_space()
+        SlotFillerIndex.forget(self.frame)
+        XMRHeader.invalidate(self.frame)
+        self.frame.delete()
+
+    def _clear_space(self, keep: Frame=None):
+        for frame in list(self.space()):
+            if frame != keep:
+                frame.delete()
 
     def render(self) -> str:
+        if self.is_archived():
+            return self.frame["RENDERED"].singleton()
         return self.frame.id
 
 
+# XMRHeader is the metadata of an XMR frame (everything the I/O views list and sort by), read from its slots when the
+# XMR is made and kept with the frame, so that accessors do not read and parse the slots again.  The kept header is
+# trusted: writes to its slots must refresh it (set_status and set_timestamp do, as do the knowledge-script statements).
+# Frames made some other way have no kept header, and are read on each access.
+
+class XMRHeader(object):
+
+    SLOT = "HEADER"
+
+    __slots__ = ("status", "type", "signal", "timestamp", "space", "source")
+
+    SLOTS = ("SIGNAL", "TYPE", "STATUS", "TIMESTAMP", "REFERS-TO-SPACE", "SOURCE")
+
+    STATUSES = dict(list(map(lambda item: (item.value, item), XMR.InputStatus)) + list(map(lambda item: (item.value, item), XMR.OutputStatus)))
+    TYPES = dict(map(lambda item: (item.value, item), XMR.Type))
+
+    @classmethod
+    def read(cls, frame: Frame) -> 'XMRHeader':
+        header = XMRHeader()
+        header.status = XMRHeader.parse_status(frame["STATUS"].singleton())
+        header.type = frame["TYPE"].singleton()
+        if isinstance(header.type, str):
+            header.type = XMRHeader.TYPES[header.type]
+        header.signal = frame["SIGNAL"].singleton()
+        header.timestamp = frame["TIMESTAMP"].singleton()
+        header.space = frame["REFERS-TO-SPACE"].singleton()
+        header.source = frame["SOURCE"].singleton()
+        return header
+
+    @classmethod
+    def parse_status(cls, status: Any) -> Any:
+        if isinstance(status, str) and status in XMRHeader.STATUSES:
+            return XMRHeader.STATUSES[status]
+        return status
+
+    @classmethod
+    def refresh(cls, frame: Frame):
+        # Reads the kept header again, after one of its slots was written; frames with no kept header are left as they are.
+        if XMRHeader.SLOT in frame:
+            frame[XMRHeader.SLOT] = XMRHeader.read(frame)
+
+    @classmethod
+    def invalidate(cls, frame: Frame):
+        if XMRHeader.SLOT in frame:
+            del frame[XMRHeader.SLOT]
+
+
 class AMR(XMR):
 
     def render(self):
+        if self.is_archived():
+            return super().render()
+
         try:
             from backend import agent
             if self.source().id != agent.identity.id:
@@ -160,6 +254,9 @@ class AMR(XMR):
 class MMR(XMR):
 
     def render(self):
+        if self.is_archived():
+            return super().render()
+
         try:
             from backend import agent
             if Identifier.parse(self.root().id)[1] != "INIT-GOAL":
@@ -175,4 +272,39 @@ class MMR(XMR):
 
             return "I am adding the " + goal + " goal."
 
-        except: return super().render()
\ No newline at end of file
+        except: return super().render()
+
+
+# RowBatch holds the complete set of index rows for an XMR space, built without touching the graph (so it can be built
+# ahead of time, or elsewhere), and then written straight into graph.index in a single pass, the same way the ontology
+# loaders do.  Frames that would otherwise have no rows (and any referenced frames that must exist) are declared.
+
+class RowBatch(object):
+
+    FACET = "LOC"
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self.rows: List[tuple] = []
+        self.declared: List[str] = []
+
+    def add(self, frame: str, slot: str, filler: Any, facet: str=None):
+        self.rows.append((frame, slot, RowBatch.FACET if facet is None else facet, filler))
+
+    def declare(self, frame: str):
+        self.declared.append(frame)
+
+    def commit(self) -> Space:
+        space = Space(self.namespace)
+
+        index = graph.index
+        for row in self.rows:
+            index.add_row(*row)
+
+        for frame in self.declared:
+            Frame(frame)
+
+        return space
+
+    def __len__(self):
+        return len(self.rows)
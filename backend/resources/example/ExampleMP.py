@@ -3,6 +3,8 @@ from ontograph.Frame import Frame
 
 
 class SelectGoalFromLanguageInput(AgentMethod):
+    reusable = True
+
     def run(self, input_tmr):
         print("TODO: choose a goal intelligently")
         return Frame("@EXE.BUILD-A-CHAIR")
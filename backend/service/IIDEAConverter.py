@@ -49,11 +49,11 @@ class IIDEAConverter(object):
 
     @classmethod
     def convert_input(cls, input: Frame):
-        status = XMR(input).status().value.lower()
+        header = XMR(input).header()
 
         return {
-            "name": input["REFERS-TO-SPACE"][0],
-            "status": status
+            "name": header.space,
+            "status": header.status.value.lower()
         }
 
     @classmethod
@@ -197,7 +197,8 @@ class IIDEAConverter(object):
         if wrt_effector.on_capability() == capability and wrt_effector.on_decision() is not None:
             callbacks = wrt_effector.on_decision().callbacks()
             callbacks = list(filter(lambda callback: callback.effector() == wrt_effector, callbacks))
-            callbacks = list(map(lambda cb: {"name": cb.frame.id, "waiting": cb.status() == Callback.Status.WAITING}, callbacks))
+            delivered = agent.delivered_callbacks()
+            callbacks = list(map(lambda cb: {"name": cb.frame.id, "waiting": cb.status() == Callback.Status.WAITING and cb not in delivered}, callbacks))
 
         return {
             "name": capability.frame.id,
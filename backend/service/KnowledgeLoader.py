@@ -1,3 +1,4 @@
+from backend.models.tmr import TMRFrame
 from backend.utils.AgentOntoLang import AgentOntoLang
 
 
@@ -8,6 +9,7 @@ class KnowledgeLoader(object):
     @classmethod
     def load_script(cls, script: str):
         AgentOntoLang().run(script)
+        TMRFrame.slot_kinds.invalidate()
 
     @classmethod
     def load_resource(cls, package: str, file: str):
@@ -1,4 +1,5 @@
 import json
+import queue
 import traceback
 from flask import Flask, redirect, request, abort, render_template, send_from_directory
 from flask_cors import CORS
@@ -6,6 +7,7 @@ from flask_socketio import SocketIO
 from pkgutil import get_data
 
 from backend import agent
+from backend.models.statement import VariableMap
 from backend.models.xmr import XMR
 from backend.service.AgentAdvanceThread import AgentAdvanceThread
 from backend.service.IIDEAConverter import IIDEAConverter
@@ -21,11 +23,16 @@ app = Flask(__name__, template_folder="../../frontend/templates/")
 CORS(app)
 socketio = SocketIO(app)
 
-agent.logger().enable()
-OntologyServiceLoader().load()
-KnowledgeLoader.load_resource("backend.resources", "exe.knowledge")
+# When this module is run as the main module, ingest workers (see IngestPool) import it again, with no agent
+if agent is not None:
+    agent.logger().enable()
+    OntologyServiceLoader().load()
+    KnowledgeLoader.load_resource("backend.resources", "exe.knowledge")
 thread = None
 
+# How long a request waits for room in the agent's input queue (if it is bounded, and set to block) before giving up
+INPUT_TIMEOUT = 5.0
+
 
 def build_payload():
     return {
@@ -42,9 +49,37 @@ def build_payload():
     }
 
 
+def queue_input(input: dict, source=None, type: str=None):
+    try:
+        agent.queue_input(input, source=source, type=type, timeout=INPUT_TIMEOUT)
+    except queue.Full:
+        abort(503)
+
+
 def graph_to_json(space: Space):
     frames = []
 
+    def add_filler(converted: dict, slot: str, filler):
+        if isinstance(filler, Frame):
+            converted["relations"].append({
+                "graph": space.name if filler.space() is None else filler.space().name,
+                "slot": slot,
+                "value": filler.id
+            })
+        else:
+            value = filler
+            if isinstance(value, type):
+                value = value.__module__ + '.' + value.__name__
+            elif isinstance(value, int):
+                value = value
+            else:
+                value = str(value)
+
+            converted["attributes"].append({
+                "slot": slot,
+                "value": value
+            })
+
     for frame in space:
 
         t = frame.__class__.__name__
@@ -63,29 +98,29 @@ def graph_to_json(space: Space):
 
         for slot in frame:
             slot.include_inherited = False
+            if slot.property == VariableMap.SCOPE:
+                continue
             for filler in slot:
-                if isinstance(filler, Frame):
-                    converted["relations"].append({
-                        "graph": space.name if filler.space() is None else filler.space().name,
-                        "slot": slot.property,
-                        "value": filler.id
-                    })
-                else:
-                    value = filler
-                    if isinstance(value, type):
-                        value = value.__module__ + '.' + value.__name__
-                    elif isinstance(value, int):
-                        value = value
-                    else:
-                        value = str(value)
-
-                    converted["attributes"].append({
-                        "slot": slot.property,
-                        "value": value
-                    })
+                add_filler(converted, slot.property, filler)
 
         frames.append(converted)
 
+        # Variables still held in memory by a varmap are shown as the frames they will be written as, without writing
+        # them (the graph is only written on the agent's thread)
+        for variable in VariableMap(frame).pending():
+            pending = {
+                "type": converted["type"],
+                "graph": converted["graph"],
+                "name": VariableMap.pending_id(frame, variable),
+                "relations": [],
+                "attributes": []
+            }
+            add_filler(pending, "NAME", variable.name())
+            add_filler(pending, "VALUE", variable.value())
+            add_filler(pending, "FROM", frame)
+            converted["relations"].append({"graph": converted["graph"], "slot": "_WITH", "value": pending["name"]})
+            frames.append(pending)
+
     return json.dumps(frames)
 
 
@@ -205,7 +240,7 @@ def iidea_input():
         tmr = analyze(data["input"])
 
     source = lookup_by_visual_id(data["source"])
-    agent._input(input=tmr, source=source, type=data["type"])
+    queue_input(tmr, source=source, type=data["type"])
 
     return json.dumps(build_payload())
 
@@ -219,7 +254,7 @@ def iidea_observe():
 
     observations = json.loads(get_data("tests.resources", "DemoJan2019_Observations_VMR.json").decode('ascii'))
     observation = observations[data["observation"]]
-    agent._input(observation, type=XMR.Type.VISUAL.name)
+    queue_input(observation, type=XMR.Type.VISUAL.name)
 
     return json.dumps(build_payload())
 
@@ -237,6 +272,11 @@ def iidea_callback():
     return json.dumps(build_payload())
 
 
+@app.route("/iidea/telemetry", methods=["GET"])
+def iidea_telemetry():
+    return json.dumps(agent.telemetry(effector=request.args.get("effector"), capability=request.args.get("capability")))
+
+
 @app.route("/yale/bootstrap", methods=["POST"])
 def yale_bootstrap():
     if not request.get_json():
@@ -262,7 +302,7 @@ def yale_visual_input():
 
     data = YaleUtils.visual_input(data, agent.environment)
 
-    agent._input(data, type="VISUAL")
+    queue_input(data, type="VISUAL")
 
     return "OK"
 
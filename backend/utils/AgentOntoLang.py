@@ -1,13 +1,15 @@
 from backend.models.agenda import Agenda, Goal, Plan, Step, Trigger
-from backend.models.effectors import Capability
+from backend.models.effectors import Capability, EffectorPool
 from backend.models.mps import AgentMethod, MPRegistry, OutputMethod
 from backend.models.output import OutputXMRTemplate
 from backend.models.statement import AddFillerStatement, AssertStatement, AssignFillerStatement, AssignVariableStatement, ExistsStatement, ExpectationStatement, ForEachStatement, IsStatement, MakeInstanceStatement, MeaningProcedureStatement, OutputXMRStatement, Statement, TransientFrameStatement, TransientTriple
+from backend.models.tmr import TMRFrame
 from backend.models.xmr import XMR
 from lark import Tree
+from ontograph import graph
 from ontograph.Frame import Frame
 from ontograph.Index import Identifier
-from ontograph.Query import Query, SearchComparator
+from ontograph.Query import IsAComparator, Query, SearchComparator
 from ontograph.OntoLang import AppendOntoLangProcessor, AssignOntoLangProcessor, OntoLang, OntoLangProcessor, OntoLangTransformer
 from ontograph.Space import Space
 from typing import Any, List, Tuple, Type, Union
@@ -37,9 +39,19 @@ class AgentOntoLang(OntoLang):
             processors = self.parse(input)
             AgentOntoLang.cached_processors[package + "." + resource] = processors
 
+        OutputXMRTemplate.seed()
+
         for p in processors:
             p.run()
 
+        # Effector pools declared in knowledge have their slot frames created once, here
+        if "EXE" in graph and "@EXE.EFFECTOR-POOL" in Space("EXE"):
+            for pool in Query(IsAComparator("@EXE.EFFECTOR-POOL")).start():
+                if pool.id != "@EXE.EFFECTOR-POOL" and "CAPACITY" in pool:
+                    EffectorPool(pool).materialize()
+
+        TMRFrame.slot_kinds.invalidate()
+
 
 class AgentOntoLangTransformer(OntoLangTransformer):
 
@@ -0,0 +1,35 @@
+from backend.models.tmr import TMR
+from backend.models.vmr import VMR
+from backend.models.xmr import RowBatch, XMR
+from typing import Iterable, List
+
+import multiprocessing
+
+
+class IngestPool(object):
+    """
+    A long-lived pool of worker processes that parse inputs into detached batches of index rows (see Agent.ingest).
+    Workers are spawned rather than forked, as the agent's process runs other threads (the capability executor, the
+    agent loop and the service's), and are started once and kept until the pool is shut down.  Workers import only the
+    parsing code: the backend package builds its agent in the main process alone.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._pool = multiprocessing.get_context("spawn").Pool(processes=workers)
+
+    def map(self, jobs: List[tuple]) -> Iterable[RowBatch]:
+        # Results are yielded in the order of the jobs, as they become available
+        return self._pool.imap(parse, jobs, chunksize=max(1, len(jobs) // (self.workers * 4)))
+
+    def shutdown(self):
+        self._pool.close()
+        self._pool.join()
+
+
+def parse(job: tuple) -> RowBatch:
+    # Runs on an ingest worker process (or inline, if there is no pool); a job is (kind, input, namespace, slot kinds).
+    kind, input, namespace, slot_kinds = job
+    if kind == XMR.Type.VISUAL.name:
+        return VMR.rows(input, namespace)
+    return TMR.rows(input, namespace, slot_kinds=slot_kinds)
@@ -0,0 +1,81 @@
+from collections import deque
+from enum import Enum
+from typing import Any, List, Tuple
+
+import queue
+import threading
+import time
+
+
+class InputQueue(object):
+    """
+    A thread-safe queue of (input, source, type) entries, filled by the service (from request threads) and drained by
+    the agent at the start of Decide.  With a bound, the overflow policy decides what happens when the queue is full:
+    BLOCK waits for the agent to drain it (or raises queue.Full after a timeout), DROP-OLDEST discards the oldest entry,
+    and COALESCE discards the oldest visual entry (each observation is a full scene, so a newer one supersedes it),
+    blocking if there are no visual entries to discard.  A bound of 0 is unbounded.
+    """
+
+    class Policy(Enum):
+        BLOCK = "BLOCK"
+        DROP_OLDEST = "DROP-OLDEST"
+        COALESCE = "COALESCE"
+
+    def __init__(self, bound: int=0, policy: 'InputQueue.Policy'=None):
+        self._entries = deque()
+        self._condition = threading.Condition()
+        self.bound = bound
+        self.policy = InputQueue.Policy.BLOCK if policy is None else policy
+        self.dropped = 0
+        self.coalesced = 0
+
+    def configure(self, bound: int, policy: 'InputQueue.Policy'):
+        if isinstance(policy, str):
+            policy = InputQueue.Policy(policy)
+
+        with self._condition:
+            self.bound = bound
+            self.policy = policy
+            self._condition.notify_all()
+
+    def put(self, input: dict, source: Any=None, type: str=None, timeout: float=None):
+        with self._condition:
+            deadline = None if timeout is None else time.time() + timeout
+
+            while self._is_full():
+                if self.policy == InputQueue.Policy.DROP_OLDEST:
+                    self._entries.popleft()
+                    self.dropped += 1
+                    continue
+
+                if self.policy == InputQueue.Policy.COALESCE and self._discard_visual():
+                    self.coalesced += 1
+                    continue
+
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    raise queue.Full()
+                self._condition.wait(remaining)
+
+            self._entries.append((input, source, type))
+
+    def drain(self) -> List[Tuple[dict, Any, str]]:
+        with self._condition:
+            entries = list(self._entries)
+            self._entries.clear()
+            self._condition.notify_all()
+            return entries
+
+    def _is_full(self) -> bool:
+        return self.bound > 0 and len(self._entries) >= self.bound
+
+    def _discard_visual(self) -> bool:
+        for entry in self._entries:
+            if entry[2] == "VISUAL":
+                self._entries.remove(entry)
+                return True
+        return False
+
+    def __len__(self):
+        with self._condition:
+            return len(self._entries)
@@ -1,3 +1,4 @@
+from backend.models.tmr import TMRFrame
 from backend.utils.LEIAEnvironment import MONGO_HOST, MONGO_PORT, ONTOLOGY_COLLECTION, ONTOLOGY_DATABASE
 from ontograph import graph
 from ontograph.Index import Identifier
@@ -43,6 +44,8 @@ class OntologyServiceLoader(object):
                     filler = Identifier("@ONT." + filler.upper())
                 index.add_row(name, prop["slot"].upper(), prop["facet"].upper(), filler)
 
+        TMRFrame.slot_kinds.invalidate()
+
 
 class OntologyBinaryLoader(object):
 
@@ -70,4 +73,6 @@ class OntologyBinaryLoader(object):
                         if filler is None:
                             continue
                         count += 1
-                        index.add_row(name, prop.upper(), facet.upper(), filler)
\ No newline at end of file
+                        index.add_row(name, prop.upper(), facet.upper(), filler)
+
+        TMRFrame.slot_kinds.invalidate()
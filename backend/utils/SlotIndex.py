@@ -0,0 +1,124 @@
+from ontograph import graph
+from ontograph.Frame import Frame
+from ontograph.Index import Identifier
+from ontograph.Query import ExistsComparator, Query
+from ontograph.Space import Space
+from typing import Any, Dict, List, Set
+
+import threading
+
+
+class SlotIndex(object):
+    """
+    An opt-in inverted index (filler -> frames) for declared slots, so that reverse lookups ("which frames have X in
+    slot S?") do not query the whole graph.  The index for a slot is built on its first lookup, with one graph query for
+    every frame holding the slot (so frames written directly beforehand, for example loaded from knowledge, are found),
+    and is then maintained on write: later writes to a declared slot must go through set (or add / remove) to be
+    indexed.  Lookups are answered from the index alone.  Entries are verified on read (the frame must still exist and
+    still hold the filler), so frames deleted or changed elsewhere are dropped rather than returned.  Lookups on
+    undeclared slots always query the graph.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._slots: Set[str] = set()
+        self._index: Dict[str, Dict[Any, Set[str]]] = {}
+        self._built: Set[str] = set()
+
+    def declare(self, slot: str):
+        with self._lock:
+            self._slots.add(slot)
+            self._index.setdefault(slot, {})
+
+    def is_declared(self, slot: str) -> bool:
+        return slot in self._slots
+
+    def set(self, frame: Frame, slot: str, filler: Any):
+        # Writes the slot (replacing its fillers), and indexes the new filler.
+        if self.is_declared(slot):
+            for old in frame[slot]:
+                self._unindex(frame, slot, old)
+        frame[slot] = filler
+        if self.is_declared(slot):
+            self._add(frame, slot, filler)
+
+    def add(self, frame: Frame, slot: str, filler: Any):
+        frame[slot] += filler
+        if self.is_declared(slot):
+            self._add(frame, slot, filler)
+
+    def remove(self, frame: Frame, slot: str, filler: Any):
+        frame[slot] -= filler
+        if self.is_declared(slot):
+            self._unindex(frame, slot, filler)
+
+    def forget(self, frame: Frame):
+        # Drops every entry for the frame (for example, before it is deleted).
+        with self._lock:
+            for fillers in self._index.values():
+                for frames in fillers.values():
+                    frames.discard(frame.id)
+
+    def lookup(self, slot: str, filler: Any) -> List[Frame]:
+        if not self.is_declared(slot):
+            return list(Query(ExistsComparator(slot=slot, filler=filler)).start())
+
+        self._build(slot)
+
+        with self._lock:
+            ids = list(self._index[slot].get(SlotIndex._key(filler), set()))
+
+        results = []
+        for id in sorted(ids):
+            frame = Frame(id) if SlotIndex._exists(id) else None
+            if frame is not None and filler in frame[slot]:
+                results.append(frame)
+            else:
+                with self._lock:
+                    self._index[slot].get(SlotIndex._key(filler), set()).discard(id)
+
+        return results
+
+    def clear(self):
+        with self._lock:
+            for slot in self._slots:
+                self._index[slot] = {}
+            self._built.clear()
+
+    def _build(self, slot: str):
+        # Indexes every frame already holding the slot, the first time the slot is looked up.
+        with self._lock:
+            if slot in self._built:
+                return
+
+        frames = list(Query(ExistsComparator(slot=slot)).start())
+
+        with self._lock:
+            if slot in self._built:
+                return
+            for frame in frames:
+                for filler in frame[slot]:
+                    self._index[slot].setdefault(SlotIndex._key(filler), set()).add(frame.id)
+            self._built.add(slot)
+
+    def _add(self, frame: Frame, slot: str, filler: Any):
+        with self._lock:
+            self._index[slot].setdefault(SlotIndex._key(filler), set()).add(frame.id)
+
+    def _unindex(self, frame: Frame, slot: str, filler: Any):
+        with self._lock:
+            self._index[slot].get(SlotIndex._key(filler), set()).discard(frame.id)
+
+    @classmethod
+    def _key(cls, filler: Any) -> Any:
+        if isinstance(filler, Frame) or isinstance(filler, Identifier):
+            return filler.id
+        return filler
+
+    @classmethod
+    def _exists(cls, id: str) -> bool:
+        space = id.lstrip("@").split(".")[0]
+        return space in graph and id in Space(space)
+
+
+SlotFillerIndex = SlotIndex()
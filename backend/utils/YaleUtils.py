@@ -6,10 +6,15 @@ from typing import List
 from uuid import UUID
 
 from backend.utils.LEIAEnvironment import ontosem_service
+from backend.utils.SlotIndex import SlotFillerIndex
 from ontograph.Frame import Frame, Role
 from ontograph.Space import Space
 
 
+# Visual objects are looked up by the id the vision system gives them.
+SlotFillerIndex.declare("visual-object-id")
+
+
 def bootstrap(input: dict, space: Space):
     types = {
         "dowel": {"IS-A": "DOWEL"},
@@ -22,7 +27,7 @@ def bootstrap(input: dict, space: Space):
     }
 
     from backend.models.environment import Environment
-    env = Environment(space)
+    env = Environment.of(space)
     env.advance()
 
     for location in input["locations"]:
@@ -33,7 +38,7 @@ def bootstrap(input: dict, space: Space):
             visual_id = object["id"]
 
             object_frame = Frame("@" + space.name + "." + type["IS-A"] + ".?").add_parent("@ONT." + type["IS-A"])
-            object_frame["visual-object-id"] = int(visual_id)
+            SlotFillerIndex.set(object_frame, "visual-object-id", int(visual_id))
             for slot in type.keys():
                 if slot != "IS-A":
                     object_frame[slot] += type[slot]
@@ -43,7 +48,7 @@ def bootstrap(input: dict, space: Space):
         for human in location["faces"]:
             human_frame = Frame("@" + space.name + ".HUMAN.?").add_parent("@ONT.HUMAN")
             human_frame["HAS-NAME"] = human
-            human_frame["visual-object-id"] = human
+            SlotFillerIndex.set(human_frame, "visual-object-id", human)
 
             env.enter(human_frame, loc_frame)
 
@@ -96,13 +101,12 @@ def visual_input(input: dict, space: Space) -> dict:
 
 def lookup_by_visual_id(id: int):
     from ontograph import graph
-    from ontograph.Query import ExistsComparator, Query
 
     if "ENV" not in graph:
         return id
 
-    results = Query(ExistsComparator(slot="visual-object-id", filler=id)).start()
-    if len(list(results)) == 1:
+    results = SlotFillerIndex.lookup("visual-object-id", id)
+    if len(results) == 1:
         return results[0]
     return id
 
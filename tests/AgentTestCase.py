@@ -1,6 +1,6 @@
 from backend.Agent import Agent
 from backend.models.agenda import Decision, Expectation, Goal, Plan, Step, Trigger
-from backend.models.effectors import Capability, Effector
+from backend.models.effectors import Capability, CapabilityExecutor, Effector, EffectorPool
 from backend.models.output import OutputXMRTemplate
 from backend.models.statement import OutputXMRStatement, VariableMap
 from backend.models.tmr import TMR
@@ -94,6 +94,120 @@ class AgentTestCase(unittest.TestCase):
         self.assertIn("TMR#3", self.agent)
         self.assertTrue(Frame("@INPUTS.XMR.3")["TYPE"] == XMR.Type.LANGUAGE)
 
+    def test_queue_input(self):
+        self.agent.queue_input(self.tmr())
+        self.agent.queue_input(self.tmr(), type="LANGUAGE")
+
+        # Queued inputs are only registered at the start of Decide
+        self.assertEqual(0, len(self.agent.pending_inputs()))
+        self.assertEqual(2, len(self.agent.input_queue()))
+
+        self.agent._decide()
+
+        self.assertEqual(2, len(self.agent.pending_inputs()))
+        self.assertEqual(0, len(self.agent.input_queue()))
+        self.assertIn("TMR#1", self.agent)
+        self.assertIn("TMR#2", self.agent)
+
+    def test_input_queue_preferences(self):
+        from backend.utils.InputQueue import InputQueue
+
+        self.agent.identity["INPUT_QUEUE_BOUND"] = 1
+        self.agent.identity["INPUT_QUEUE_POLICY"] = "DROP-OLDEST"
+
+        # Preferences are applied once per Decide, not on each request
+        self.agent.queue_input(self.tmr())
+        self.agent.queue_input(self.tmr())
+        self.assertEqual(0, self.agent.input_queue().bound)
+        self.assertEqual(2, len(self.agent.input_queue()))
+        self.agent.input_queue().drain()
+
+        self.agent.configure_input_queue()
+
+        self.agent.queue_input(self.tmr())
+        self.agent.queue_input(self.tmr())
+
+        self.assertEqual(1, self.agent.input_queue().bound)
+        self.assertEqual(InputQueue.Policy.DROP_OLDEST, self.agent.input_queue().policy)
+        self.assertEqual(1, len(self.agent.input_queue()))
+
+    def test_retain_inputs(self):
+        xmrs = list(map(lambda i: TMR.from_json(self.tmr()), range(3)))
+        for xmr in xmrs:
+            self.agent.identity["HAS-INPUT"] += xmr.frame
+
+        xmrs[0].set_status(XMR.InputStatus.UNDERSTOOD)
+        xmrs[1].set_status(XMR.InputStatus.ACKNOWLEDGED)
+
+        # 1) By default, nothing is evicted
+        self.agent._retain_inputs()
+        self.assertEqual(3, len(self.agent.identity["HAS-INPUT"]))
+
+        # 2) Only processed inputs beyond the most recent N are evicted; their spaces are removed (all but the root
+        # frame), but their frames are archived with a rendering
+        root = xmrs[0].root()
+        self.agent.identity["INPUT_RETENTION_COUNT"] = 1
+        self.agent._retain_inputs()
+
+        self.assertEqual([xmrs[1].frame, xmrs[2].frame], list(self.agent.identity["HAS-INPUT"]))
+        self.assertEqual([root], list(Space("TMR#1")))
+        self.assertEqual(root, xmrs[0].root())
+        self.assertTrue(xmrs[0].is_archived())
+        self.assertEqual("Test.", XMR.from_instance(xmrs[0].frame).render())
+        self.assertIn(xmrs[0].frame.id, Space("INPUTS"))
+
+    def test_retain_inputs_by_age(self):
+        xmrs = list(map(lambda i: TMR.from_json(self.tmr()), range(2)))
+        for xmr in xmrs:
+            self.agent.identity["HAS-INPUT"] += xmr.frame
+
+        xmrs[0].set_status(XMR.InputStatus.UNDERSTOOD)
+        xmrs[0].frame["PROCESSED"] = xmrs[0].processed() - 60
+        xmrs[1].set_status(XMR.InputStatus.UNDERSTOOD)
+
+        self.agent.identity["INPUT_RETENTION_SECONDS"] = 30
+        self.agent.identity["INPUT_RETENTION_MODE"] = "DELETE"
+        self.agent._retain_inputs()
+
+        self.assertEqual([xmrs[1].frame], list(self.agent.identity["HAS-INPUT"]))
+        self.assertNotIn(xmrs[0].frame.id, Space("INPUTS"))
+        self.assertEqual(0, len(Space("TMR#1")))
+        self.assertNotEqual(0, len(Space("TMR#2")))
+
+    def test_ingest(self):
+        from backend.models.vmr import VMR
+        from backend.utils.AtomicCounter import AtomicCounter
+
+        VMR.counter = AtomicCounter()
+        self.agent.identity["INGEST_WORKERS"] = 1
+
+        vmr = {"ENVIRONMENT": {"_refers_to": "ENV", "timestamp": 1, "contains": {}}, "EVENTS": {}}
+        xmrs = self.agent.ingest([self.tmr(), vmr, self.tmr()])
+
+        self.assertEqual(["TMR#1", "VMR#1", "TMR#2"], list(map(lambda xmr: xmr.space().name, xmrs)))
+        self.assertEqual(list(map(lambda xmr: xmr.frame, xmrs)), list(self.agent.identity["HAS-INPUT"]))
+        self.assertEqual(3, len(self.agent.pending_inputs()))
+        self.assertEqual("Test.", xmrs[0].frame["SENTENCE"].singleton())
+        self.assertTrue(Frame("@TMR#2.EVENT.1") ^ "@ONT.EVENT")
+
+    def test_ingest_on_process_pool(self):
+        self.agent.identity["INGEST_WORKERS"] = 2
+
+        xmrs = self.agent.ingest([self.tmr(), self.tmr(), self.tmr()], type="LANGUAGE")
+
+        self.assertEqual(["TMR#1", "TMR#2", "TMR#3"], list(map(lambda xmr: xmr.space().name, xmrs)))
+        self.assertEqual(list(map(lambda xmr: xmr.frame, xmrs)), list(self.agent.identity["HAS-INPUT"]))
+        for name in ["TMR#1", "TMR#2", "TMR#3"]:
+            self.assertTrue(Frame("@" + name + ".EVENT.1") ^ "@ONT.EVENT")
+
+        # The pool is kept for later batches, and shut down on reset
+        pool = self.agent.ingest_pool()
+        self.agent.ingest([self.tmr(), self.tmr()], type="LANGUAGE")
+        self.assertIs(pool, self.agent.ingest_pool())
+
+        self.agent.reset()
+        self.assertIsNone(self.agent._ingest_pool)
+
     def test_iidea(self):
         agent = Agent()
         # agent.logger().enable()
@@ -163,8 +277,74 @@ class AgentTestCase(unittest.TestCase):
         # Fire the callback
         self.agent.callback(callback.frame.id)
 
-        # Is the callback marked as received?
-        self.assertEqual(Callback.Status.RECEIVED, callback.status())
+        # The callback is delivered to the inbox, but the graph is untouched until Assess
+        self.assertEqual(Callback.Status.WAITING, callback.status())
+        self.assertEqual([callback], self.agent.delivered_callbacks())
+
+        # Assess processes the delivered callback
+        self.agent._assess()
+        self.assertEqual([], self.agent.delivered_callbacks())
+        self.assertNotIn(callback.frame.id, self.agent.exe)
+        self.assertTrue(effector.is_free())
+
+    def test_callback_ignores_duplicates_and_removed_frames(self):
+        from backend.models.effectors import Callback
+
+        decision = Decision.build(self.agent.exe, "GOAL", "PLAN", "STEP")
+        effector = Effector.instance(self.agent.exe, Effector.Type.PHYSICAL, [])
+        callback1 = Callback.build(self.agent.exe, decision, effector)
+        callback2 = Callback.build(self.agent.exe, decision, effector)
+
+        self.agent.callback(callback1)
+        self.agent.callback(callback1.frame)
+        self.agent.callback(callback2.frame.id)
+
+        callback2.frame.delete()
+
+        self.assertEqual([callback1], self.agent.delivered_callbacks())
+
+    def test_callback_from_capability_worker(self):
+        from backend.models.effectors import Callback, CapabilityExecutor
+        from backend.models.mps import MPRegistry, OutputMethod
+
+        agent = self.agent
+
+        class TestMP(OutputMethod):
+            def run(self):
+                agent.callback(self.callback)
+
+        MPRegistry.register(TestMP)
+
+        self.agent.identity["EFFECTOR_WORKERS"] = 1
+
+        capability = Capability.instance(self.agent.exe, "CAPABILITY", "TestMP", ["@ONT.EVENT"])
+        effector = Effector.instance(self.agent.exe, Effector.Type.PHYSICAL, [capability])
+        output = XMR.instance(self.agent.exe, "OUTPUT-XMR", XMR.Signal.OUTPUT, XMR.Type.ACTION, XMR.OutputStatus.PENDING, "@SELF.ROBOT.1", "", capability=capability)
+
+        decision = Decision.build(self.agent.exe, "GOAL", "PLAN", "STEP")
+        effector.reserve(decision, output, capability)
+        decision.execute(self.agent, [effector])
+        self.agent.executor().shutdown()
+
+        # The callback is delivered to the inbox by the worker, and only processed on the loop thread during Assess
+        callback = Callback(Frame("@EXE.CALLBACK.1"))
+        self.assertEqual(Callback.Status.WAITING, callback.status())
+        self.assertEqual([callback], self.agent.delivered_callbacks())
+
+        self.agent._assess()
+        self.assertNotIn("@EXE.CALLBACK.1", self.agent.exe)
+        self.assertTrue(effector.is_free())
+
+    def test_reset_discards_loop_state(self):
+        self.agent.callback("@EXE.CALLBACK.1")
+        self.agent.timeouts().schedule("@EXE.CALLBACK.1", 10)
+        self.agent.queue_input({"a": 1})
+
+        self.agent.reset()
+
+        self.assertEqual(0, len(self.agent._inbox))
+        self.assertEqual([], self.agent.timeouts().pending())
+        self.assertEqual(0, len(self.agent._input_queue))
 
     def test_preferences(self):
         self.assertEqual(0.5, self.agent.preference("TEST-PREFERENCE", 0.5))
@@ -371,6 +551,28 @@ class AgentDecideTestCase(unittest.TestCase):
         self.assertIn(effector2.on_output(), [self.agent.decisions()[0].outputs()[0], self.agent.decisions()[1].outputs()[0]])
         self.assertNotEqual(effector1.on_output(), effector2.on_output())
 
+    def test_decide_reserves_effectors_from_pools(self):
+        capability = Capability.instance(self.g, "TEST-CAPABILITY", "", ["@ONT.EVENT"])
+        pool = EffectorPool.instance(self.g, Effector.Type.PHYSICAL, [capability], 2)
+        self.agent.identity["HAS-EFFECTOR"] += pool.frame
+
+        template = OutputXMRTemplate.build("template", XMR.Type.ACTION, capability, [])
+        statement = OutputXMRStatement.instance(self.g, template, [], self.agent.identity)
+
+        step = Step.build(self.g, 1, [statement])
+        plan = Plan.build(self.g, "plan-1", Plan.DEFAULT, [step])
+        definition = Goal.define(self.g, "goal-1", 0.5, 0.5, [plan], [], [], [])
+
+        for _ in range(3):
+            self.agent.agenda().add_goal(Goal.instance_of(self.g, definition, []))
+
+        self.agent._decide()
+
+        self.assertEqual(pool.slots(), self.agent.effectors())
+        self.assertEqual([], pool.free())
+        self.assertEqual(2, len(list(filter(lambda d: d.status() == Decision.Status.SELECTED, self.agent.decisions()))))
+        self.assertEqual(1, len(list(filter(lambda d: d.status() == Decision.Status.DECLINED, self.agent.decisions()))))
+
     def test_decide_reserves_multiple_effectors_for_single_decision(self):
         capability = Capability.instance(self.g, "TEST-CAPABILITY", "", ["@ONT.EVENT"])
         effector1 = Effector.instance(self.g, Effector.Type.PHYSICAL, [capability])
@@ -694,7 +896,7 @@ class AgentAssessTestCase(unittest.TestCase):
 
         self.g = self.agent.exe
 
-    def test_assess_processes_all_received_callbacks(self):
+    def test_assess_processes_all_delivered_callbacks(self):
         from backend.models.effectors import Callback
 
         # First, minimally define a goal
@@ -727,8 +929,8 @@ class AgentAssessTestCase(unittest.TestCase):
         decision2.frame["HAS-CALLBACK"] += callback2.frame
         decision2.frame["STATUS"] = Decision.Status.EXECUTING
 
-        # Set one of the callbacks to be received
-        callback1.received()
+        # Deliver one of the callbacks
+        self.agent.callback(callback1.frame.id)
 
         # Assess, and check that only one of the callbacks has been processed
         self.agent._assess()
@@ -762,6 +964,73 @@ class AgentAssessTestCase(unittest.TestCase):
         self.assertEqual(Decision.Status.FINISHED, decision1.status())
         self.assertEqual(Decision.Status.EXECUTING, decision2.status())
 
+    def test_assess_times_out_callbacks_and_releases_decisions_for_replanning(self):
+        from backend.models.effectors import Callback, TimerWheel
+
+        now = [100.0]
+        self.agent._timeouts = TimerWheel(tick=1.0, clock=lambda: now[0])
+
+        step = Step.build(self.g, 1, [])
+        capability = Capability.instance(self.g, "TEST-CAPABILITY", "TestMP", ["@ONT.EVENT"])
+        effector = Effector.instance(self.g, Effector.Type.PHYSICAL, [capability])
+
+        decision = Decision.build(self.g, "GOAL", "PLAN", step)
+        decision.frame["STATUS"] = Decision.Status.EXECUTING
+        decision.frame["HAS-EFFECTOR"] += effector.frame
+        self.agent.identity["HAS-DECISION"] += decision.frame
+
+        effector.reserve(decision, "OUTPUT", capability)
+        callback = Callback.build(self.g, decision, effector)
+        decision.frame["HAS-CALLBACK"] += callback.frame
+        self.agent.timeouts().schedule(callback.frame.id, 5)
+
+        # Before the timeout, nothing changes
+        now[0] = 102.0
+        self.agent._assess()
+        self.assertFalse(effector.is_free())
+        self.assertEqual(Decision.Status.EXECUTING, decision.status())
+
+        # After the timeout, the effector is released and the decision is removed so the step can be replanned
+        now[0] = 105.0
+        self.agent._assess()
+        self.assertTrue(effector.is_free())
+        self.assertNotIn(decision.frame, self.agent.identity["HAS-DECISION"])
+        self.assertNotIn(callback.frame.id, self.g)
+        self.assertTrue(step.is_pending())
+
+        # A late delivery of the lost callback is ignored
+        self.agent.callback(callback.frame.id)
+        self.agent._assess()
+        self.assertTrue(effector.is_free())
+
+    def test_assess_fails_callbacks_of_failed_capabilities(self):
+        from backend.models.effectors import Callback
+
+        step = Step.build(self.g, 1, [])
+        capability = Capability.instance(self.g, "TEST-CAPABILITY", "TestMP", ["@ONT.EVENT"])
+        effector = Effector.instance(self.g, Effector.Type.PHYSICAL, [capability])
+
+        decision = Decision.build(self.g, "GOAL", "PLAN", step)
+        decision.frame["STATUS"] = Decision.Status.EXECUTING
+        decision.frame["HAS-EFFECTOR"] += effector.frame
+        self.agent.identity["HAS-DECISION"] += decision.frame
+
+        effector.reserve(decision, "OUTPUT", capability)
+        callback = Callback.build(self.g, decision, effector)
+        decision.frame["HAS-CALLBACK"] += callback.frame
+        self.agent.timeouts().schedule(callback.frame.id, 5)
+
+        # As posted by a capability that raised on a worker thread
+        self.agent.executor()._queue.put(CapabilityExecutor.Failure(effector, capability, callback, Exception("failed")))
+
+        # The effector is released, and the decision is declined (and removed) so the step can be replanned
+        self.agent._assess()
+        self.assertTrue(effector.is_free())
+        self.assertNotIn(decision.frame, self.agent.identity["HAS-DECISION"])
+        self.assertNotIn(callback.frame.id, self.g)
+        self.assertEqual([], self.agent.timeouts().pending())
+        self.assertTrue(step.is_pending())
+
     def test_assess_marks_executing_decisions_as_finished_if_no_pending_expectations_remain(self):
         # from backend.models.bootstrap import Bootstrap
         from backend.models.statement import IsStatement
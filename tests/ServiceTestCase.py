@@ -29,6 +29,19 @@ class ServiceTestCase(unittest.TestCase):
         response = self.app.post("/view", data="FROM * SEARCH FOR @ = @TEST.FRAME.1;")
         self.assertEqual(json.loads(response.data), [{"type": "Frame", "graph": "TEST", "name": "@TEST.FRAME.1", "relations": [], "attributes": []}])
 
+    def test_telemetry(self):
+        from backend.models.effectors import EffectorTelemetry
+
+        EffectorTelemetry.clear()
+        EffectorTelemetry.reserved("@EXE.EFFECTOR.1", "@EXE.CAPABILITY.1")
+
+        response = json.loads(self.app.get("/iidea/telemetry").data)
+        self.assertEqual(["@EXE.EFFECTOR.1"], list(response["effectors"].keys()))
+        self.assertEqual(["@EXE.CAPABILITY.1"], list(response["capabilities"].keys()))
+
+        response = json.loads(self.app.get("/iidea/telemetry?effector=@EXE.EFFECTOR.1").data)
+        self.assertEqual(1, response["reservations"])
+
     def test_graph_to_json_types(self):
         # from backend.models.view import View
 
@@ -71,6 +84,45 @@ class ServiceTestCase(unittest.TestCase):
 
         self.assertEqual(json.loads(graph_to_json(Space("TEST"))), expected)
 
+    def test_graph_to_json_pending_variables(self):
+        from backend.models.statement import VariableMap
+
+        vm = VariableMap(Frame("@TEST.VARMAP.1"))
+        vm.bind("X", 123)
+
+        expected = [{
+            "type": "Frame",
+            "graph": "TEST",
+            "name": "@TEST.VARMAP.1",
+            "relations": [{
+                "slot": "_WITH",
+                "graph": "TEST",
+                "value": "@TEST.VARMAP.1.X"
+            }],
+            "attributes": []
+        }, {
+            "type": "Frame",
+            "graph": "TEST",
+            "name": "@TEST.VARMAP.1.X",
+            "relations": [{
+                "slot": "FROM",
+                "graph": "TEST",
+                "value": "@TEST.VARMAP.1"
+            }],
+            "attributes": [{
+                "slot": "NAME",
+                "value": "X"
+            }, {
+                "slot": "VALUE",
+                "value": 123
+            }]
+        }]
+
+        # Variables held in memory are shown, but not written to the graph
+        self.assertEqual(json.loads(graph_to_json(Space("TEST"))), expected)
+        self.assertEqual(1, len(Space("TEST")))
+        self.assertEqual(123, vm.resolve("X"))
+
     def test_graph_to_json_attributes(self):
         f = Frame("@TEST.FRAME.1")
         f["ATTR"] = 123
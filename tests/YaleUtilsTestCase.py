@@ -2,6 +2,8 @@ import json
 import os
 
 from backend.Agent import Agent
+from backend.models.environment import Environment
+from backend.utils.SlotIndex import SlotFillerIndex
 from backend.utils.YaleUtils import bootstrap, format_learned_event_yale, lookup_by_visual_id, visual_input
 from ontograph import graph
 from ontograph.Frame import Frame
@@ -15,6 +17,8 @@ class YaleUtilsTestCase(ApprenticeAgentsTestCase):
 
     def setUp(self):
         graph.reset()
+        Environment.clear_shared()
+        SlotFillerIndex.clear()
 
     def test_bootstrap(self):
 
@@ -105,8 +109,7 @@ class YaleUtilsTestCase(ApprenticeAgentsTestCase):
         self.assertIn("bob", humans)
         self.assertEqual(2, len(humans))
 
-        from backend.models.environment import Environment
-        env = Environment(Space("ENV"))
+        env = Environment.of(Space("ENV"))
 
         self.assertEqual(Frame("@ENV.WORKSPACE.1"), env.location("@ENV.DOWEL.1"))
         self.assertEqual(Frame("@ENV.WORKSPACE.1"), env.location("@ENV.HUMAN.1"))
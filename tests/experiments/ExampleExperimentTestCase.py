@@ -46,8 +46,8 @@ class ExampleExperimentTestCase(ExperimentTestCase):
         self.assertEqual(1, len(agent.decisions()))
         self.assertDecisionExists(agent, status=Decision.Status.EXECUTING, goal="@SELF.GOAL.1", plan="@SELF.PLAN.1", step="@SELF.STEP.1", outputs=["@OUTPUTS.XMR.1"], effectors=["@SELF.MENTAL-EFFECTOR.1"], callbacks=["@SELF.CALLBACK.1"])
 
-        # 2d) The decision's callback is received
-        self.assertEqual(Callback.Status.RECEIVED, agent.decisions()[0].callbacks()[0].status())
+        # 2d) The decision's callback is delivered (it is processed at the start of the next Assess)
+        self.assertIn(agent.decisions()[0].callbacks()[0], agent.delivered_callbacks())
 
         # 2e) There is one instance of BUILD-A-CHAIR; it is pending
         self.assertGoalExists(agent, isa="@EXE.BUILD-A-CHAIR", status=Goal.Status.PENDING)
@@ -135,8 +135,8 @@ class ExampleExperimentTestCase(ExperimentTestCase):
         # 7c) Issue the callback
         agent.callback("@SELF.CALLBACK.1")
 
-        # 7d) The decision's callback is received
-        self.assertEqual(Callback.Status.RECEIVED, agent.decisions()[1].callbacks()[0].status())
+        # 7d) The decision's callback is delivered (it is processed at the start of the next Assess)
+        self.assertIn(agent.decisions()[1].callbacks()[0], agent.delivered_callbacks())
 
         # 7e) The goal is still marked as active
         self.assertGoalExists(agent, isa="@EXE.BUILD-A-CHAIR", status=Goal.Status.ACTIVE)
@@ -425,6 +425,10 @@ class GoalTestCase(unittest.TestCase):
         self.assertTrue(goal.frame["PLAN"] == plan)
         self.assertTrue(goal.frame["WHEN"] == condition)
         self.assertTrue(goal.frame["WITH"] == "VAR_X")
+        self.assertEqual(0, len(goal.frame["_WITH"]))
+        self.assertEqual(123, goal.resolve("VAR_X"))
+
+        goal.materialize()
         self.assertEqual(1, len(goal.frame["_WITH"]))
 
         var = goal.frame["_WITH"][0]
@@ -966,6 +970,32 @@ class PlanTestCase(unittest.TestCase):
         variable["VALUE"] = False
         self.assertFalse(plan.select(VariableMap(varmap)))
 
+    def test_select_with_async_mp(self):
+        from backend.models.mps import AsyncAgentMethod, Deferred
+        from backend.models.statement import MeaningProcedureStatement, MPRegistry
+
+        AgentOntoLang().load_knowledge("backend.resources", "exe.knowledge")
+
+        class TestMP(AsyncAgentMethod):
+            async def run(self, var1):
+                return var1
+
+        MPRegistry.register(TestMP)
+
+        mp_statement = MeaningProcedureStatement.instance(Space("TEST"), TestMP.__name__, ["$var1"])
+        varmap = VariableMap(Frame("@TEST.VARMAP.1"))
+        varmap.bind("$var1", True)
+
+        plan = Plan.build(Space("TEST"), "X", mp_statement, [])
+        self.assertTrue(plan.select(varmap))
+
+        result = plan.select(varmap, wait=False)
+        self.assertIsInstance(result, Deferred)
+        self.assertTrue(result.result())
+
+        plan = Plan.build(Space("TEST"), "X", mp_statement, [], negate=True)
+        self.assertFalse(plan.select(varmap, wait=False).result())
+
     def test_select_when_default(self):
         plan = Frame("@TEST.PLAN.1")
         plan["SELECT"] = Plan.DEFAULT
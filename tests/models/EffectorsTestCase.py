@@ -1,4 +1,4 @@
-from backend.models.effectors import Callback, Capability, Effector
+from backend.models.effectors import Callback, Capability, CapabilityExecutor, Effector, EffectorPool, Telemetry, TimerWheel
 from backend.models.mps import MPRegistry, OutputMethod
 from backend.models.xmr import XMR
 
@@ -121,6 +121,120 @@ class EffectorTestCase(unittest.TestCase):
         self.assertIsNone(effector.on_capability())
 
 
+class EffectorPoolTestCase(unittest.TestCase):
+
+    def setUp(self):
+        graph.reset()
+        self.g = Space("TEST")
+
+        Frame("@EXE.EFFECTOR-POOL")
+        Frame("@EXE.PHYSICAL-EFFECTOR")
+
+    def test_instance(self):
+        capability = Capability.instance(self.g, "TEST-CAPABILITY", "SomeMP", [])
+        pool = EffectorPool.instance(self.g, Effector.Type.PHYSICAL, [capability], 3, policy=EffectorPool.Policy.LEAST_LOADED)
+
+        self.assertEqual("@TEST.EFFECTOR-POOL.1", pool.frame.id)
+        self.assertEqual(Effector.Type.PHYSICAL, pool.type())
+        self.assertEqual(3, pool.capacity())
+        self.assertEqual(EffectorPool.Policy.LEAST_LOADED, pool.policy())
+        self.assertEqual([capability], pool.capabilities())
+
+    def test_slots(self):
+        capability = Capability.instance(self.g, "TEST-CAPABILITY", "SomeMP", [])
+        pool = EffectorPool.instance(self.g, Effector.Type.PHYSICAL, [capability], 3)
+
+        slots = pool.slots()
+        self.assertEqual(3, len(slots))
+        self.assertEqual(slots, pool.slots())
+        for slot in slots:
+            self.assertEqual(Effector.Type.PHYSICAL, slot.type())
+            self.assertEqual([capability], slot.capabilities())
+            self.assertEqual(pool, slot.pool())
+            self.assertTrue(slot.is_free())
+
+    def test_slots_from_knowledge(self):
+        frame = Frame("@TEST.GRIPPER-POOL").add_parent("@EXE.EFFECTOR-POOL")
+        frame["TYPE"] = "PHYSICAL"
+        frame["CAPACITY"] = 2
+        frame["POLICY"] = "LEAST-LOADED"
+
+        pool = EffectorPool(frame)
+        self.assertEqual(EffectorPool.Policy.LEAST_LOADED, pool.policy())
+        self.assertEqual(0, len(pool.slots()))
+
+        pool.materialize()
+        self.assertEqual(2, len(pool.slots()))
+
+        pool.materialize()
+        self.assertEqual(2, len(pool.slots()))
+
+    def test_allocate_lru(self):
+        pool = EffectorPool.instance(self.g, Effector.Type.PHYSICAL, [], 2)
+        slot1, slot2 = pool.slots()
+
+        self.assertEqual(slot1, pool.allocate())
+
+        slot1.reserve("DECISION", "OUTPUT", "CAPABILITY")
+        self.assertEqual(slot2, pool.allocate())
+
+        slot1.release()
+        self.assertEqual(slot2, pool.allocate())
+
+        slot2.reserve("DECISION", "OUTPUT", "CAPABILITY")
+        slot2.release()
+        self.assertEqual(slot1, pool.allocate())
+
+    def test_allocate_least_loaded(self):
+        pool = EffectorPool.instance(self.g, Effector.Type.PHYSICAL, [], 2, policy="LEAST-LOADED")
+        slot1, slot2 = pool.slots()
+
+        slot1.reserve("DECISION", "OUTPUT", "CAPABILITY")
+        slot1.release()
+        slot2.reserve("DECISION", "OUTPUT", "CAPABILITY")
+        slot2.release()
+        slot2.reserve("DECISION", "OUTPUT", "CAPABILITY")
+        slot2.release()
+
+        self.assertEqual(slot1, pool.allocate())
+
+    def test_allocate_excludes(self):
+        pool = EffectorPool.instance(self.g, Effector.Type.PHYSICAL, [], 2)
+        slot1, slot2 = pool.slots()
+
+        self.assertEqual(slot2, pool.allocate(exclude=[slot1]))
+        self.assertIsNone(pool.allocate(exclude=[slot1, slot2]))
+
+        slot1.reserve("DECISION", "OUTPUT", "CAPABILITY")
+        self.assertIsNone(pool.allocate(exclude=[slot2]))
+
+
+    def test_allocate_tracks_reservations(self):
+        pool = EffectorPool.instance(self.g, Effector.Type.PHYSICAL, [], 3)
+        slot1, slot2, slot3 = pool.slots()
+
+        slot1.reserve("DECISION", "OUTPUT", "CAPABILITY")
+        slot2.reserve("DECISION", "OUTPUT", "CAPABILITY")
+        self.assertEqual([slot3], pool.free())
+        self.assertEqual(slot3, pool.allocate())
+
+        slot3.reserve("DECISION", "OUTPUT", "CAPABILITY")
+        self.assertEqual([], pool.free())
+        self.assertIsNone(pool.allocate())
+
+        slot2.release()
+        self.assertEqual([slot2], pool.free())
+        self.assertEqual(slot2, pool.allocate())
+
+    def test_slots_does_not_write(self):
+        pool = EffectorPool.instance(self.g, Effector.Type.PHYSICAL, [], 2)
+        frames = len(list(self.g))
+
+        pool.slots()
+        pool.free()
+        pool.allocate()
+        self.assertEqual(frames, len(list(self.g)))
+
 class CapabilityTestCase(unittest.TestCase):
 
     def setUp(self):
@@ -158,6 +272,13 @@ class CapabilityTestCase(unittest.TestCase):
         self.assertIn(Frame("@TEST.A-EVENT"), Capability(f).events())
         self.assertIn(Frame("@TEST.B-EVENT"), Capability(f).events())
 
+    def test_capability_timeout(self):
+        f = Frame("@TEST.CAPABILITY")
+        self.assertIsNone(Capability(f).timeout())
+
+        f["TIMEOUT"] = 30
+        self.assertEqual(30.0, Capability(f).timeout())
+
     def test_instance(self):
         e1 = Frame("@TEST.PHYSICAL-EVENT")
         e2 = Frame("@TEST.MENTAL-EVENT")
@@ -190,6 +311,236 @@ class CapabilityTestCase(unittest.TestCase):
         self.assertEqual([output.frame, callback.frame], out)
 
 
+class CapabilityExecutorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        graph.reset()
+        self.g = Space("TEST")
+
+        Frame("@EXE.PHYSICAL-EFFECTOR").add_parent(Frame("@EXE.EFFECTOR"))
+        Frame("@EXE.MENTAL-EFFECTOR").add_parent(Frame("@EXE.EFFECTOR"))
+
+        MPRegistry.clear()
+
+    def reserved_effector(self, type: Effector.Type, mp: type) -> Effector:
+        MPRegistry.register(mp)
+
+        capability = Capability.instance(self.g, "TEST-CAPABILITY", mp.__name__, ["ONT.EVENT"])
+        output = XMR.instance(self.g, "TEST", XMR.Signal.OUTPUT, XMR.Type.ACTION, XMR.OutputStatus.PENDING, "@TEST.FRAME.1", "", capability=capability)
+        effector = Effector.instance(self.g, type, [capability])
+        effector.reserve("@TEST.DECISION", output, capability)
+
+        return effector
+
+    def test_dispatch_inline(self):
+        import threading
+
+        threads = []
+
+        class TestMP(OutputMethod):
+            def run(self):
+                threads.append(threading.current_thread())
+
+        effector = self.reserved_effector(Effector.Type.PHYSICAL, TestMP)
+
+        CapabilityExecutor().dispatch(None, effector, None)
+        self.assertEqual([threading.current_thread()], threads)
+
+    def test_dispatch_on_workers(self):
+        import threading
+
+        threads = []
+
+        class TestMP(OutputMethod):
+            def run(self):
+                threads.append(threading.current_thread())
+
+        effector = self.reserved_effector(Effector.Type.PHYSICAL, TestMP)
+
+        executor = CapabilityExecutor(workers=2)
+        executor.dispatch(None, effector, None)
+        executor.shutdown()
+
+        self.assertEqual(1, len(threads))
+        self.assertNotEqual(threading.current_thread(), threads[0])
+
+    def test_dispatch_mental_inline(self):
+        import threading
+
+        threads = []
+
+        class TestMP(OutputMethod):
+            def run(self):
+                threads.append(threading.current_thread())
+
+        effector = self.reserved_effector(Effector.Type.MENTAL, TestMP)
+
+        executor = CapabilityExecutor(workers=2)
+        executor.dispatch(None, effector, None)
+        executor.shutdown()
+
+        self.assertEqual([threading.current_thread()], threads)
+
+    def test_failures_are_posted(self):
+        class TestMP(OutputMethod):
+            def run(self):
+                raise Exception("failed")
+
+        effector = self.reserved_effector(Effector.Type.PHYSICAL, TestMP)
+
+        executor = CapabilityExecutor(workers=1)
+        executor.dispatch(None, effector, None)
+        executor.shutdown()
+
+        results = executor.drain()
+        self.assertEqual(1, len(results))
+        self.assertIsInstance(results[0], CapabilityExecutor.Failure)
+        self.assertEqual(effector, results[0].effector)
+        self.assertEqual(effector.on_capability(), results[0].capability)
+        self.assertEqual("failed", str(results[0].error))
+
+
+class TimerWheelTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 100.0
+        self.wheel = TimerWheel(tick=1.0, slots=8, clock=lambda: self.now)
+
+    def test_expire(self):
+        self.wheel.schedule("A", 2)
+        self.wheel.schedule("B", 5)
+
+        self.now = 101.0
+        self.assertEqual([], self.wheel.expire())
+
+        self.now = 102.0
+        self.assertEqual(["A"], self.wheel.expire())
+        self.assertEqual(["B"], self.wheel.pending())
+
+        self.now = 110.0
+        self.assertEqual(["B"], self.wheel.expire())
+        self.assertEqual(0, len(self.wheel))
+
+    def test_expire_beyond_one_rotation(self):
+        self.wheel.schedule("A", 20)
+
+        self.now = 110.0
+        self.assertEqual([], self.wheel.expire())
+
+        self.now = 119.0
+        self.assertEqual([], self.wheel.expire())
+
+        self.now = 120.0
+        self.assertEqual(["A"], self.wheel.expire())
+
+    def test_cancel(self):
+        self.wheel.schedule("A", 2)
+        self.assertTrue(self.wheel.cancel("A"))
+        self.assertFalse(self.wheel.cancel("A"))
+
+        self.now = 105.0
+        self.assertEqual([], self.wheel.expire())
+
+    def test_reschedule(self):
+        self.wheel.schedule("A", 2)
+        self.wheel.schedule("A", 4)
+
+        self.now = 102.0
+        self.assertEqual([], self.wheel.expire())
+
+        self.now = 104.0
+        self.assertEqual(["A"], self.wheel.expire())
+
+
+class TelemetryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        graph.reset()
+        self.g = Space("EXE")
+
+        self.now = 100.0
+        self.telemetry = Telemetry(clock=lambda: self.now)
+
+    def test_utilization(self):
+        self.telemetry.reserved("@EXE.EFFECTOR.1", "@EXE.CAPABILITY.1")
+        self.now = 104.0
+        self.telemetry.released("@EXE.EFFECTOR.1", "@EXE.CAPABILITY.1")
+        self.telemetry.reserved("@EXE.EFFECTOR.2", "@EXE.CAPABILITY.1")
+        self.now = 110.0
+
+        self.assertEqual({"reservations": 1, "operating": 4.0, "utilization": 0.4}, self.telemetry.stats(effector="@EXE.EFFECTOR.1"))
+        self.assertEqual({"reservations": 1, "operating": 6.0, "utilization": 0.6}, self.telemetry.stats(effector="@EXE.EFFECTOR.2"))
+
+        stats = self.telemetry.stats(capability="@EXE.CAPABILITY.1")
+        self.assertEqual(2, stats["reservations"])
+        self.assertEqual(10.0, stats["operating"])
+        self.assertEqual(0.5, stats["utilization"])
+
+    def test_waits_and_declines(self):
+        from backend.models.agenda import Decision
+
+        capability = Capability.instance(self.g, "TEST-CAPABILITY", "SomeMP", [])
+        output = Frame("@EXE.OUTPUT")
+        output["REQUIRES"] = capability.frame
+
+        decision = Decision.build(self.g, "GOAL", "PLAN", "STEP")
+        decision.frame["HAS-OUTPUT"] = output
+
+        self.telemetry.declined(decision)
+        self.now = 102.0
+        self.telemetry.declined(decision)
+        self.now = 105.0
+        self.telemetry.selected(decision)
+
+        stats = self.telemetry.stats(capability=capability.frame)
+        self.assertEqual(1, stats["selections"])
+        self.assertEqual(2, stats["declines"])
+        self.assertAlmostEqual(2 / 3, stats["decline-rate"])
+        self.assertEqual(5.0, stats["mean-wait"])
+        self.assertEqual(5.0, stats["max-wait"])
+
+        self.telemetry.selected(decision)
+        stats = self.telemetry.stats(capability=capability.frame)
+        self.assertEqual(2.5, stats["mean-wait"])
+
+    def test_declines_for_unavailable_capabilities_only(self):
+        from backend.models.agenda import Decision
+
+        decision = Decision.build(self.g, "GOAL", "PLAN", "STEP")
+        self.telemetry.declined(decision, ["@EXE.CAPABILITY.1"])
+        self.telemetry.declined(decision, [])
+
+        self.assertEqual(["@EXE.CAPABILITY.1"], list(self.telemetry.stats()["capabilities"].keys()))
+        self.assertEqual(1, self.telemetry.stats(capability="@EXE.CAPABILITY.1")["declines"])
+
+    def test_retain(self):
+        from backend.models.agenda import Decision
+
+        decision1 = Decision.build(self.g, "GOAL", "PLAN", "STEP-1")
+        decision2 = Decision.build(self.g, "GOAL", "PLAN", "STEP-2")
+        self.telemetry.declined(decision1, ["@EXE.CAPABILITY.1"])
+        self.telemetry.declined(decision2, ["@EXE.CAPABILITY.1"])
+
+        self.telemetry.retain([decision2])
+        self.assertEqual(1, len(self.telemetry._waiting))
+
+        self.now = 105.0
+        self.telemetry.retain([])
+        self.assertEqual(0, len(self.telemetry._waiting))
+
+    def test_stats_are_read_only(self):
+        self.telemetry.stats(effector="@EXE.EFFECTOR.1")
+        self.telemetry.stats(capability="@EXE.CAPABILITY.1")
+
+        self.assertEqual({"effectors": {}, "capabilities": {}}, self.telemetry.stats())
+
+    def test_clear(self):
+        self.telemetry.reserved("@EXE.EFFECTOR.1", "@EXE.CAPABILITY.1")
+        self.telemetry.clear()
+
+        self.assertEqual({"effectors": {}, "capabilities": {}}, self.telemetry.stats())
+
+
 class CallbackTestCase(unittest.TestCase):
 
     def setUp(self):
@@ -268,4 +619,50 @@ class CallbackTestCase(unittest.TestCase):
         self.assertNotEqual(output, effector.on_output())
         self.assertNotEqual(capability, effector.on_capability())
         self.assertNotIn(effector, decision.effectors())
-        self.assertNotIn(callback, decision.callbacks())
\ No newline at end of file
+        self.assertNotIn(callback, decision.callbacks())
+
+    def test_timed_out(self):
+        from backend.models.agenda import Decision
+
+        space = Space("EXE")
+
+        decision = Decision.build(space, "GOAL", "PLAN", "STEP")
+        effector = Effector.instance(space, Effector.Type.PHYSICAL, [])
+        effector.reserve(decision, Frame("@EXE.OUTPUT"), Frame("@EXE.CAPABILITY"))
+
+        callback = Callback.build(space, decision, effector)
+
+        decision.frame["HAS-CALLBACK"] += callback.frame
+        decision.frame["HAS-EFFECTOR"] += effector.frame
+
+        callback.timed_out()
+
+        self.assertIn(callback.frame.id, space)
+        self.assertEqual(Callback.Status.TIMED_OUT, callback.status())
+        self.assertTrue(effector.is_free())
+        self.assertNotIn(effector, decision.effectors())
+        self.assertNotIn(callback, decision.callbacks())
+        self.assertIn(callback, decision.timeouts())
+
+    def test_failed(self):
+        from backend.models.agenda import Decision
+
+        space = Space("EXE")
+
+        decision = Decision.build(space, "GOAL", "PLAN", "STEP")
+        effector = Effector.instance(space, Effector.Type.PHYSICAL, [])
+        effector.reserve(decision, Frame("@EXE.OUTPUT"), Frame("@EXE.CAPABILITY"))
+
+        callback = Callback.build(space, decision, effector)
+
+        decision.frame["HAS-CALLBACK"] += callback.frame
+        decision.frame["HAS-EFFECTOR"] += effector.frame
+
+        callback.failed()
+
+        self.assertIn(callback.frame.id, space)
+        self.assertEqual(Callback.Status.FAILED, callback.status())
+        self.assertTrue(effector.is_free())
+        self.assertNotIn(effector, decision.effectors())
+        self.assertNotIn(callback, decision.callbacks())
+        self.assertIn(callback, decision.failures())
@@ -1,4 +1,5 @@
-from backend.models.environment import Environment
+from backend.models import environment
+from backend.models.environment import Environment, SceneMatrix
 
 from ontograph import graph
 from ontograph.Frame import Frame
@@ -12,6 +13,7 @@ class EnvironmentTestCase(unittest.TestCase):
 
     def setUp(self):
         graph.reset()
+        Environment.clear_shared()
 
         Frame("@ENV.EPOCH")
         Frame("@ONT.LOCATION")
@@ -31,6 +33,44 @@ class EnvironmentTestCase(unittest.TestCase):
         self.assertEqual(2, Frame("@ENV.EPOCH.2")["TIME"].singleton())
         self.assertEqual(Frame("@ENV.EPOCH.1"), Frame("@ENV.EPOCH.2")["FOLLOWS"])
 
+    def test_of(self):
+        env = Environment.of(Space("ENV"))
+        self.assertIs(env, Environment.of(Space("ENV")))
+
+        env.advance()
+        self.assertEqual(1, len(Environment.of(Space("ENV")).history()))
+
+        # The shared instance is not kept in the graph, and is dropped (with the graph) when the agent resets
+        self.assertNotIn("@ENV.ENVIRONMENT-INDEX", graph)
+        graph.reset()
+        Environment.clear_shared()
+        Frame("@ENV.EPOCH")
+
+        self.assertIsNot(env, Environment.of(Space("ENV")))
+        self.assertEqual(0, len(Environment.of(Space("ENV")).history()))
+
+    @unittest.skipIf(environment.numpy is None, "NumPy is not installed.")
+    def test_of_keeps_scene_matrix(self):
+        obj = Frame("@ENV.TEST")
+        loc1 = Frame("@ENV.PLACE.?")
+        loc2 = Frame("@ENV.PLACE.?")
+
+        Environment.of(Space("ENV")).advance()
+        Environment.of(Space("ENV")).enter(obj, location=loc1)
+        scene = Environment.of(Space("ENV"))._scene()
+
+        # Later epochs are added to the same matrix, rather than each caller rebuilding it
+        Environment.of(Space("ENV")).advance()
+        Environment.of(Space("ENV")).move(obj, loc2)
+        Environment.of(Space("ENV")).advance()
+
+        env = Environment.of(Space("ENV"))
+        self.assertIs(scene, env._scene())
+        self.assertEqual([obj], env.moved(0, 1))
+        self.assertEqual([], env.moved(1, 2))
+        self.assertEqual([obj], env.objects_at(loc2))
+        self.assertEqual([obj], env.objects_at(loc1, 0))
+
     def test_history(self):
         env = Environment(Space("ENV"))
 
@@ -50,22 +90,22 @@ class EnvironmentTestCase(unittest.TestCase):
 
         # 1) The object is only added to the most recent epoch
         env.enter(obj)
-        self.assertNotIn(obj, Frame("@ENV.EPOCH.1")["CONTAINS"])
-        self.assertIn(obj, Frame("@ENV.EPOCH.2")["CONTAINS"])
+        self.assertNotIn(obj, env.view(0))
+        self.assertIn(obj, env.view(1))
 
         # 2) Objects in the most recent epoch are carried into the next epoch
         env.advance()
-        self.assertNotIn(obj, Frame("@ENV.EPOCH.1")["CONTAINS"])
-        self.assertIn(obj, Frame("@ENV.EPOCH.2")["CONTAINS"])
-        self.assertIn(obj, Frame("@ENV.EPOCH.3")["CONTAINS"])
+        self.assertNotIn(obj, env.view(0))
+        self.assertIn(obj, env.view(1))
+        self.assertIn(obj, env.view(2))
 
         # 3) Objects already in an epoch are not added twice (it becomes a no-op)
         env.enter(obj)
-        self.assertNotIn(obj, Frame("@ENV.EPOCH.1")["CONTAINS"])
-        self.assertIn(obj, Frame("@ENV.EPOCH.2")["CONTAINS"])
-        self.assertIn(obj, Frame("@ENV.EPOCH.3")["CONTAINS"])
-        self.assertEqual(1, len(Frame("@ENV.EPOCH.2")["CONTAINS"]))
-        self.assertEqual(1, len(Frame("@ENV.EPOCH.3")["CONTAINS"]))
+        self.assertNotIn(obj, env.view(0))
+        self.assertIn(obj, env.view(1))
+        self.assertIn(obj, env.view(2))
+        self.assertEqual(1, len(env.view(1)))
+        self.assertEqual(1, len(env.view(2)))
 
     def test_exit(self):
         env = Environment(Space("ENV"))
@@ -77,20 +117,20 @@ class EnvironmentTestCase(unittest.TestCase):
 
         # 1) The object is only removed from the most recent epoch
         env.exit(obj)
-        self.assertIn(obj, Frame("@ENV.EPOCH.1")["CONTAINS"])
-        self.assertNotIn(obj, Frame("@ENV.EPOCH.2")["CONTAINS"])
+        self.assertIn(obj, env.view(0))
+        self.assertNotIn(obj, env.view(1))
 
         # 2) Objects not in the most recent epoch are not carried into the next epoch
         env.advance()
-        self.assertIn(obj, Frame("@ENV.EPOCH.1")["CONTAINS"])
-        self.assertNotIn(obj, Frame("@ENV.EPOCH.2")["CONTAINS"])
-        self.assertNotIn(obj, Frame("@ENV.EPOCH.3")["CONTAINS"])
+        self.assertIn(obj, env.view(0))
+        self.assertNotIn(obj, env.view(1))
+        self.assertNotIn(obj, env.view(2))
 
         # 3) Objects not in an epoch cannot be removed (it becomes a no-op)
         env.exit(obj)
-        self.assertIn(obj, Frame("@ENV.EPOCH.1")["CONTAINS"])
-        self.assertNotIn(obj, Frame("@ENV.EPOCH.2")["CONTAINS"])
-        self.assertNotIn(obj, Frame("@ENV.EPOCH.3")["CONTAINS"])
+        self.assertIn(obj, env.view(0))
+        self.assertNotIn(obj, env.view(1))
+        self.assertNotIn(obj, env.view(2))
 
     def test_move(self):
         env = Environment(Space("ENV"))
@@ -152,4 +192,259 @@ class EnvironmentTestCase(unittest.TestCase):
         env.advance()
         env.enter(obj2)
 
-        self.assertEqual(env.view(1), env.current())
\ No newline at end of file
+        self.assertEqual(env.view(1), env.current())
+
+    def test_locations(self):
+        env = Environment(Space("ENV"))
+        obj1 = Frame("@ENV.TEST.?")
+        obj2 = Frame("@ENV.TEST.?")
+        loc = Frame("@ENV.PLACE.?")
+
+        env.advance()
+        env.enter(obj1)
+        env.enter(obj2, location=loc)
+        env.advance()
+        env.exit(obj1)
+
+        self.assertEqual({obj1.id: "@ONT.LOCATION", obj2.id: loc}, env.locations(0))
+        self.assertEqual({obj2.id: loc}, env.locations())
+
+    def test_epochs_are_deltas(self):
+        env = Environment(Space("ENV"), checkpoint=3)
+        obj1 = Frame("@ENV.TEST.?")
+        obj2 = Frame("@ENV.TEST.?")
+        loc = Frame("@ENV.PLACE.?")
+
+        env.advance()
+        env.enter(obj1)
+        env.enter(obj2)
+        env.advance()
+        env.move(obj2, loc)
+        env.advance()
+        env.exit(obj1)
+        env.advance()
+
+        # 1) Only the first epoch and every third one after it are checkpoints, holding the full state
+        self.assertEqual([True, False, False, True], list(map(env.is_checkpoint, env.history())))
+        self.assertEqual([obj2], list(Frame("@ENV.EPOCH.4")["CONTAINS"]))
+
+        # 2) Other epochs only record what changed
+        self.assertNotIn("CONTAINS", Frame("@ENV.EPOCH.2"))
+        self.assertEqual(1, len(Frame("@ENV.EPOCH.2")["LOCATION"]))
+        self.assertEqual([obj1], list(Frame("@ENV.EPOCH.3")["EXITED"]))
+
+        # 3) Unchanged epochs store no locations at all
+        env.advance()
+        self.assertNotIn("LOCATION", Frame("@ENV.EPOCH.5"))
+
+        # 4) The state of every epoch is reconstructed on demand
+        self.assertEqual([obj1, obj2], env.view(1))
+        self.assertEqual([obj2], env.view(2))
+        self.assertEqual({obj1.id: "@ONT.LOCATION", obj2.id: loc}, env.locations(1))
+        self.assertEqual({obj2.id: loc}, env.locations(4))
+
+    def test_compact(self):
+        env = Environment(Space("ENV"), checkpoint=10)
+        obj1 = Frame("@ENV.TEST.?")
+        obj2 = Frame("@ENV.TEST.?")
+        loc = Frame("@ENV.PLACE.?")
+
+        env.advance()
+        env.enter(obj1)
+        env.advance()
+        env.enter(obj2, location=loc)
+        env.advance()
+        env.exit(obj1)
+
+        self.assertEqual(2, env.compact(1))
+
+        # The remaining epoch becomes a checkpoint with the same state
+        self.assertEqual([Frame("@ENV.EPOCH.3")], env.history())
+        self.assertTrue(env.is_checkpoint(Frame("@ENV.EPOCH.3")))
+        self.assertNotIn("FOLLOWS", Frame("@ENV.EPOCH.3"))
+        self.assertEqual([obj2], env.current())
+        self.assertEqual({obj2.id: loc}, env.locations())
+
+        # Time continues from the remaining epochs
+        env.advance()
+        self.assertEqual(4, env.history()[-1]["TIME"].singleton())
+        self.assertEqual([obj2], env.current())
+
+    def test_retain(self):
+        env = Environment(Space("ENV"), retain=2)
+        obj = Frame("@ENV.TEST.?")
+
+        env.advance()
+        env.enter(obj)
+        env.advance()
+        env.advance()
+
+        self.assertEqual(2, len(env.history()))
+        self.assertEqual([obj], env.current())
+
+    def test_indexes_match_space(self):
+        env = Environment(Space("ENV"), checkpoint=2)
+        obj1 = Frame("@ENV.TEST.?")
+        obj2 = Frame("@ENV.TEST.?")
+        loc1 = Frame("@ENV.PLACE.?")
+        loc2 = Frame("@ENV.PLACE.?")
+
+        env.advance()
+        env.enter(obj1, location=loc1)
+        env.advance()
+        env.enter(obj2)
+        env.move(obj2, loc1)
+        env.move(obj2, loc2)
+        env.exit(obj1)
+        env.advance()
+        env.enter(obj1, location=loc2)
+        env.exit(obj2)
+        env.enter(obj2)
+
+        # A fresh environment rebuilds its indexes from the space, and agrees with the incrementally maintained ones
+        fresh = Environment(Space("ENV"), checkpoint=2)
+
+        self.assertEqual(env.history(), fresh.history())
+        for epoch in range(3):
+            self.assertEqual(env.view(epoch), fresh.view(epoch))
+            self.assertEqual(env.locations(epoch), fresh.locations(epoch))
+
+        self.assertEqual({obj2.id: loc2}, fresh.locations(1))
+        self.assertEqual({obj1.id: loc2, obj2.id: "@ONT.LOCATION"}, fresh.locations(2))
+
+        # Moving an object more than once in the same epoch reuses its location frame
+        self.assertEqual(2, len(Frame("@ENV.EPOCH.2")["LOCATION"]))
+
+    def test_movements(self):
+        env = Environment(Space("ENV"), checkpoint=2)
+        obj = Frame("@ENV.TEST.?")
+        loc1 = Frame("@ENV.PLACE.?")
+        loc2 = Frame("@ENV.PLACE.?")
+
+        env.advance()
+        env.enter(obj, location=loc1)
+        env.advance()
+        env.advance()
+        env.move(obj, loc2)
+        env.advance()
+        env.exit(obj)
+        env.enter(obj, location=loc2)
+        env.advance()
+        env.exit(obj)
+        env.advance()
+        env.enter(obj, location=loc1)
+
+        epochs = env.history()
+        expected = [(loc1, epochs[0], epochs[1]), (loc2, epochs[2], epochs[3]), (loc1, epochs[5], epochs[5])]
+
+        # Movement history is maintained as the environment changes, and matches one rebuilt from the space
+        self.assertEqual(expected, env.movements(obj))
+        self.assertEqual(expected, Environment(Space("ENV"), checkpoint=2).movements(obj))
+
+        self.assertEqual(loc1, env.location(obj, epoch=1))
+        self.assertEqual(loc2, env.location(obj, epoch=3))
+        self.assertRaises(Exception, env.location, obj, epoch=4)
+        self.assertEqual(loc1, env.location(obj))
+
+    def test_present(self):
+        env = Environment(Space("ENV"))
+        obj1 = Frame("@ENV.TEST.?")
+        obj2 = Frame("@ENV.TEST.?")
+
+        env.advance()
+        env.enter(obj1)
+        env.advance()
+        env.exit(obj1)
+        env.advance()
+        env.enter(obj2)
+
+        self.assertEqual([obj1], env.present(0, 0))
+        self.assertEqual([], env.present(1, 1))
+        self.assertEqual([obj1, obj2], env.present(0))
+        self.assertEqual([obj2], env.present("@ENV.EPOCH.2", Frame("@ENV.EPOCH.3")))
+
+    def test_compact_keeps_movements(self):
+        env = Environment(Space("ENV"))
+        obj = Frame("@ENV.TEST.?")
+        loc = Frame("@ENV.PLACE.?")
+
+        env.advance()
+        env.enter(obj)
+        env.advance()
+        env.move(obj, loc)
+        env.advance()
+
+        self.assertEqual(2, len(env.movements(obj)))
+        env.compact(2)
+
+        epochs = env.history()
+        self.assertEqual([(loc, epochs[0], epochs[1])], env.movements(obj))
+        self.assertEqual([obj], env.present(0))
+
+    def test_compare_epochs(self):
+        env = Environment(Space("ENV"))
+        obj1 = Frame("@ENV.TEST.?")
+        obj2 = Frame("@ENV.TEST.?")
+        obj3 = Frame("@ENV.TEST.?")
+        loc1 = Frame("@ENV.PLACE.?")
+        loc2 = Frame("@ENV.PLACE.?")
+
+        env.advance()
+        env.enter(obj1, location=loc1)
+        env.enter(obj2, location=loc1)
+        env.advance()
+        env.move(obj1, loc2)
+        env.exit(obj2)
+        env.enter(obj3, location=loc2)
+
+        self.assertEqual([obj1], env.moved(0))
+        self.assertEqual([obj3], env.entered(0))
+        self.assertEqual([obj2], env.exited(0))
+        self.assertEqual([obj1, obj2], env.objects_at(loc1, 0))
+        self.assertEqual([obj1, obj3], env.objects_at(loc2))
+        self.assertEqual([], env.objects_at("@ENV.NOWHERE"))
+
+        # Epochs unknown to the environment are treated as empty
+        self.assertEqual([obj1, obj3], env.entered(Frame("@ENV.NO-SUCH-EPOCH", declare=False)))
+
+    def test_compare_epochs_without_numpy(self):
+        original = environment.numpy
+        environment.numpy = None
+        try:
+            self.test_compare_epochs()
+        finally:
+            environment.numpy = original
+
+    @unittest.skipIf(environment.numpy is None, "NumPy is not installed.")
+    def test_scene_matrix(self):
+        env = Environment(Space("ENV"), checkpoint=3)
+        objects = list(map(lambda i: Frame("@ENV.TEST.?"), range(100)))
+        locations = list(map(lambda i: Frame("@ENV.PLACE.?"), range(5)))
+
+        for epoch in range(80):
+            env.advance()
+            for i, obj in enumerate(objects):
+                if (i + epoch) % 7 == 0:
+                    env.exit(obj)
+                else:
+                    env.enter(obj, location=locations[(i * epoch) % 5])
+                    env.move(obj, locations[(i * epoch) % 5])
+            if epoch == 10:
+                # Built part way through, and kept in sync from then on
+                self.assertIsInstance(env._scene(), SceneMatrix)
+
+        # The matrix kept in sync with the environment matches one rebuilt from the space, and the per-object answers
+        fresh = Environment(Space("ENV"), checkpoint=3)
+        for epoch in [1, 40, 79]:
+            self.assertEqual(env.moved(epoch - 1, epoch), fresh.moved(epoch - 1, epoch))
+            self.assertEqual(set(env.entered(epoch - 1, epoch)), set(fresh.entered(epoch - 1, epoch)))
+            self.assertEqual(set(env.exited(epoch - 1, epoch)), set(fresh.exited(epoch - 1, epoch)))
+            self.assertEqual(env.objects_at(locations[2], epoch), fresh.objects_at(locations[2], epoch))
+
+            locations_then = env.locations(epoch - 1)
+            locations_now = env.locations(epoch)
+            moved = set(filter(lambda obj: obj in locations_then and obj in locations_now and locations_then[obj] != locations_now[obj], locations_now))
+            self.assertEqual(moved, set(map(lambda obj: obj.id, env.moved(epoch - 1, epoch))))
+
+        env.compact(10)
+        self.assertEqual(set(fresh.exited(-2, -1)), set(env.exited(-2, -1)))
@@ -1,11 +1,14 @@
 # from backend.models.graph import Frame, Graph, Literal
-from backend.models.mps import AgentMethod, Executable, MeaningProcedure, MPRegistry, Registry
+from backend.models.mps import AgentMethod, AsyncAgentMethod, Deferred, Executable, MeaningProcedure, MPRegistry, Registry
 from io import StringIO
 from ontograph import graph
 from ontograph.Frame import Frame
 
+import asyncio
 import contextlib
 import sys
+import threading
+import time
 import unittest
 
 
@@ -67,12 +70,276 @@ class RegistryTestCase(unittest.TestCase):
         self.assertEqual(proof_a, False)
         self.assertEqual(proof_b, 123)
 
+    def test_run_reusable(self):
+        instances = []
+
+        class TestMP(AgentMethod):
+            reusable = True
+
+            def run(self, *args, **kwargs):
+                instances.append(self)
+                return self.varmap
+
+        registry = Registry()
+        registry.register(TestMP)
+
+        self.assertEqual(1, registry.run(TestMP.__name__, None, varmap=1))
+        self.assertEqual(2, registry.run(TestMP.__name__, None, varmap=2))
+        self.assertIs(instances[0], instances[1])
+        self.assertEqual(1, registry.stats(TestMP.__name__)["reused"])
+
+    def test_run_reusable_is_not_shared_by_concurrent_calls(self):
+        class TestMP(AsyncAgentMethod):
+            reusable = True
+
+            async def run(self, *args, **kwargs):
+                await asyncio.sleep(0.1)
+                return self.varmap
+
+        registry = Registry()
+        registry.register(TestMP)
+
+        results = Deferred.wait_all([registry.run(TestMP.__name__, None, varmap=1), registry.run(TestMP.__name__, None, varmap=2)])
+        self.assertEqual([1, 2], results)
+
+    def test_run_pure_is_memoized(self):
+        calls = 0
+
+        class TestMP(AgentMethod):
+            pure = True
+
+            def run(self, *args, **kwargs):
+                nonlocal calls
+                calls += 1
+                return args[0] * 2
+
+        registry = Registry()
+        registry.register(TestMP)
+
+        self.assertEqual(2, registry.run(TestMP.__name__, None, 1))
+        self.assertEqual(2, registry.run(TestMP.__name__, None, 1))
+        self.assertEqual(4, registry.run(TestMP.__name__, None, 2))
+        self.assertEqual(2, calls)
+
+        stats = registry.stats(TestMP.__name__)
+        self.assertEqual(1, stats["hits"])
+        self.assertEqual(2, stats["misses"])
+        self.assertAlmostEqual(1 / 3, stats["hit-rate"])
+
+    def test_run_pure_memo_is_bounded(self):
+        calls = 0
+
+        class TestMP(AgentMethod):
+            pure = True
+
+            def run(self, *args, **kwargs):
+                nonlocal calls
+                calls += 1
+                return args[0]
+
+        registry = Registry(memo_size=2)
+        registry.register(TestMP)
+
+        registry.run(TestMP.__name__, None, 1)
+        registry.run(TestMP.__name__, None, 2)
+        registry.run(TestMP.__name__, None, 3)
+        self.assertEqual(3, calls)
+
+        registry.run(TestMP.__name__, None, 3)
+        self.assertEqual(3, calls)
+
+        registry.run(TestMP.__name__, None, 1)
+        self.assertEqual(4, calls)
+
+    def test_run_pure_with_unhashable_params(self):
+        calls = 0
+
+        class TestMP(AgentMethod):
+            pure = True
+
+            def run(self, *args, **kwargs):
+                nonlocal calls
+                calls += 1
+
+        registry = Registry()
+        registry.register(TestMP)
+
+        registry.run(TestMP.__name__, None, {1, 2})
+        registry.run(TestMP.__name__, None, {1, 2})
+        self.assertEqual(2, calls)
+
+    def test_run_pure_memo_distinguishes_types(self):
+        class TestMP(AgentMethod):
+            pure = True
+
+            def run(self, *args, **kwargs):
+                return type(args[0])
+
+        registry = Registry()
+        registry.register(TestMP)
+
+        self.assertEqual(int, registry.run(TestMP.__name__, None, 1))
+        self.assertEqual(bool, registry.run(TestMP.__name__, None, True))
+
+    def test_run_pure_does_not_memoize_failures(self):
+        calls = 0
+
+        class TestMP(AgentMethod):
+            pure = True
+
+            def run(self, *args, **kwargs):
+                nonlocal calls
+                calls += 1
+                raise Exception
+
+        class TestAsyncMP(AsyncAgentMethod):
+            pure = True
+
+            async def run(self, *args, **kwargs):
+                nonlocal calls
+                calls += 1
+                raise Exception
+
+        registry = Registry()
+        registry.register(TestMP)
+        registry.register(TestAsyncMP)
+
+        for i in range(2):
+            with self.assertRaises(Exception):
+                registry.run(TestMP.__name__, None, 1)
+        self.assertEqual(2, calls)
+
+        for i in range(2):
+            with self.assertRaises(Exception):
+                registry.run(TestAsyncMP.__name__, None, 1).result()
+        self.assertEqual(4, calls)
+
+    def test_register_resets_memo(self):
+        class TestMP(AgentMethod):
+            pure = True
+
+            def run(self, *args, **kwargs):
+                return 1
+
+        class OtherMP(AgentMethod):
+            pure = True
+
+            def run(self, *args, **kwargs):
+                return 2
+
+        registry = Registry()
+        registry.register(TestMP, name="X")
+        self.assertEqual(1, registry.run("X", None))
+
+        with contextlib.redirect_stdout(StringIO()):
+            registry.register(OtherMP, name="X")
+        self.assertEqual(2, registry.run("X", None))
+
     def test_run_throws_unknown_exception(self):
         registry = Registry()
         with self.assertRaises(Exception):
             registry.run("no-such-mp")
 
 
+class AsyncAgentMethodTestCase(unittest.TestCase):
+
+    def test_run_returns_deferred(self):
+        class TestMP(AsyncAgentMethod):
+            async def run(self, *args, **kwargs):
+                return args[0] + 1
+
+        registry = Registry()
+        registry.register(TestMP)
+
+        result = registry.run(TestMP.__name__, None, 1)
+        self.assertIsInstance(result, Deferred)
+        self.assertEqual(2, result.result())
+
+    def test_wait_all_runs_concurrently(self):
+        class TestMP(AsyncAgentMethod):
+            async def run(self, *args, **kwargs):
+                await asyncio.sleep(0.2)
+                return args[0]
+
+        registry = Registry()
+        registry.register(TestMP)
+
+        start = time.time()
+        results = Deferred.wait_all([registry.run(TestMP.__name__, None, 1), registry.run(TestMP.__name__, None, 2), 3])
+        elapsed = time.time() - start
+
+        self.assertEqual([1, 2, 3], results)
+        self.assertLess(elapsed, 0.4)
+
+    def test_wait_all_times_out(self):
+        class TestMP(AsyncAgentMethod):
+            async def run(self, *args, **kwargs):
+                await asyncio.sleep(args[0])
+                return args[0]
+
+        registry = Registry()
+        registry.register(TestMP)
+
+        fast = registry.run(TestMP.__name__, None, 0)
+        slow = registry.run(TestMP.__name__, None, 10)
+
+        start = time.time()
+        results = Deferred.wait_all([fast, slow], timeout=0.2)
+        elapsed = time.time() - start
+
+        self.assertEqual([0, None], results)
+        self.assertLess(elapsed, 1)
+        self.assertFalse(fast.timed_out())
+        self.assertTrue(slow.timed_out())
+
+    def test_wait_all_ignores_late_results(self):
+        finished = threading.Event()
+
+        class TestMP(AsyncAgentMethod):
+            async def run(self, *args, **kwargs):
+                # Ignores the cancellation, and carries on
+                try:
+                    await asyncio.sleep(args[0])
+                except asyncio.CancelledError:
+                    await asyncio.sleep(args[0])
+                finished.set()
+                return args[0]
+
+        registry = Registry()
+        registry.register(TestMP)
+
+        slow = registry.run(TestMP.__name__, None, 0.2)
+        continued = slow.then(lambda value: value + 1)
+
+        self.assertEqual([None], Deferred.wait_all([slow], timeout=0.05))
+        self.assertTrue(continued.timed_out())
+
+        # The MP finishes after the timeout; what it returns is ignored
+        self.assertTrue(finished.wait(timeout=5))
+        self.assertIsNone(slow.result())
+        self.assertIsNone(continued.result())
+        self.assertEqual([None], Deferred.wait_all([continued], timeout=0.05))
+
+    def test_then_applies_continuations_once(self):
+        calls = 0
+
+        class TestMP(AsyncAgentMethod):
+            async def run(self, *args, **kwargs):
+                return 1
+
+        def increment(value):
+            nonlocal calls
+            calls += 1
+            return value + 1
+
+        result = Deferred.chain(TestMP(None)(), increment)
+        self.assertEqual(2, result.result())
+        self.assertEqual(2, result.result())
+        self.assertEqual(1, calls)
+
+        self.assertEqual(2, Deferred.chain(1, increment))
+
+
 class MeaningProcedureTestCase(unittest.TestCase):
 
     def setUp(self):
@@ -1,6 +1,7 @@
 # from backend.models.graph import Frame, Graph, Literal, Network
-from backend.models.output import OutputXMRTemplate
+from backend.models.output import OutputXMRTemplate, TemplateRegistry
 from backend.models.xmr import XMR
+from backend.utils.AtomicCounter import AtomicCounter
 from ontograph import graph
 from ontograph.Frame import Frame
 from ontograph.Space import Space
@@ -11,6 +12,8 @@ class OutputXMRTemplateTestCase(unittest.TestCase):
 
     def setUp(self):
         graph.reset()
+        OutputXMRTemplate.counter = AtomicCounter()
+        OutputXMRTemplate.xmr_counter = AtomicCounter()
         self.capability = Frame("@TEST.CAPABILITY")
 
     def test_anchor(self):
@@ -153,4 +156,48 @@ class OutputXMRTemplateTestCase(unittest.TestCase):
         self.assertEqual(2, len(OutputXMRTemplate.list()))
         self.assertIn(template1, OutputXMRTemplate.list())
         self.assertIn(template2, OutputXMRTemplate.list())
-        self.assertNotIn(other, OutputXMRTemplate.list())
\ No newline at end of file
+        self.assertNotIn(other, OutputXMRTemplate.list())
+
+    def test_lookup_uses_registry(self):
+        template = OutputXMRTemplate.build("Test 1", XMR.Type.ACTION, self.capability, [])
+
+        # Templates not registered (for example, built by hand) are searched for, and then registered
+        f = Frame("@XMR-TEMPLATE#9.TEMPLATE-ANCHOR.?").add_parent("@EXE.TEMPLATE-ANCHOR")
+        f["NAME"] = "Test 2"
+        self.assertEqual(f, OutputXMRTemplate.lookup("Test 2").anchor())
+        self.assertEqual((Space("XMR-TEMPLATE#9"), f), TemplateRegistry.lookup("Test 2"))
+
+        g = Frame("@XMR-TEMPLATE#10.TEMPLATE-ANCHOR.?").add_parent("@EXE.TEMPLATE-ANCHOR")
+        g["NAME"] = "Test 3"
+        self.assertEqual({"Test 1", "Test 2", "Test 3"}, set(map(lambda template: template.name(), OutputXMRTemplate.list())))
+        self.assertIsNotNone(TemplateRegistry.lookup("Test 3"))
+
+        # The first template registered under a name is kept
+        OutputXMRTemplate.build("Test 1", XMR.Type.ACTION, self.capability, [])
+        self.assertEqual(template, OutputXMRTemplate.lookup("Test 1"))
+        self.assertEqual(template.anchor(), OutputXMRTemplate.lookup("Test 1").anchor())
+
+        # Entries whose anchor no longer exists are dropped
+        graph.reset()
+        self.assertIsNone(OutputXMRTemplate.lookup("Test 1"))
+        self.assertEqual([], OutputXMRTemplate.list())
+
+    def test_seed(self):
+        Space("XMR-TEMPLATE#3")
+        Space("XMR#5")
+        Space("XMR#OTHER")
+
+        OutputXMRTemplate.seed()
+
+        template = OutputXMRTemplate.build("Test Name", XMR.Type.ACTION, self.capability, [])
+        self.assertEqual(Space("XMR-TEMPLATE#4"), template.space)
+
+        xmr = template.create(Space("SELF"), [])
+        self.assertEqual(Space("XMR#6"), xmr.space())
+
+    def test_allocation_skips_existing_spaces(self):
+        Frame("@XMR#1.FRAME.?")
+
+        template = OutputXMRTemplate.build("Test Name", XMR.Type.ACTION, self.capability, [])
+        xmr = template.create(Space("SELF"), [])
+        self.assertEqual(Space("XMR#2"), xmr.space())
\ No newline at end of file
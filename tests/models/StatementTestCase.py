@@ -54,6 +54,11 @@ class VariableMapTestCase(unittest.TestCase):
         vm = VariableMap.instance_of(Space("TEST"), f, params)
         self.assertTrue(vm.frame["WITH"] == "VAR_X")
         self.assertTrue(vm.frame["WITH"] == "VAR_Y")
+        self.assertNotIn("@TEST.VARIABLE.1", graph)
+        self.assertEqual(vm.resolve("VAR_X"), 1)
+        self.assertEqual(vm.resolve("VAR_Y"), 2)
+
+        vm.materialize()
         self.assertTrue(vm.frame["_WITH"] == Identifier("@TEST.VARIABLE.1"))
         self.assertTrue(vm.frame["_WITH"] == Identifier("@TEST.VARIABLE.2"))
 
@@ -78,6 +83,7 @@ class VariableMapTestCase(unittest.TestCase):
 
         vm = VariableMap.instance_of(Space("TEST"), f, params, existing=existing)
         self.assertEqual(vm.frame, existing)
+        vm.materialize()
 
         self.assertTrue(existing["WITH"] == "VAR_X")
         self.assertTrue(existing["WITH"] == "VAR_Y")
@@ -152,6 +158,37 @@ class VariableMapTestCase(unittest.TestCase):
         self.assertEqual(vm.find("X"), v1)
         self.assertEqual(vm.find("Y"), v2)
 
+    def test_bind(self):
+        vm = VariableMap(Frame("@TEST.VARMAP.1"))
+
+        vm.bind("X", 1)
+        self.assertEqual(vm.resolve("X"), 1)
+        self.assertEqual(0, len(vm.frame["_WITH"]))
+
+        vm.bind("X", 2)
+        self.assertEqual(vm.resolve("X"), 2)
+
+    def test_bind_existing_frame(self):
+        vm = VariableMap(Frame("@TEST.VARMAP.1"))
+        Variable.instance(Space("TEST"), "X", 1, vm)
+
+        vm.bind("X", 2)
+        self.assertEqual(vm.resolve("X"), 2)
+        self.assertEqual(Variable(Frame("@TEST.VARIABLE.1")).value(), 2)
+
+    def test_materialize(self):
+        vm = VariableMap(Frame("@TEST.VARMAP.1"))
+        vm.bind("X", 1)
+        self.assertNotIn("@TEST.VARIABLE.1", graph)
+
+        vm.materialize()
+        self.assertIn("@TEST.VARIABLE.1", graph)
+        self.assertEqual(vm.find("X"), Frame("@TEST.VARIABLE.1"))
+        self.assertEqual(vm.resolve("X"), 1)
+
+        vm.materialize()
+        self.assertNotIn("@TEST.VARIABLE.2", graph)
+
     def test_variables(self):
         f = Frame("@TEST.VARMAP")
         f["WITH"] += "$var1"
@@ -385,6 +422,20 @@ class AssignFillerStatementTestCase(unittest.TestCase):
         self.assertTrue(target["X"] == 345)
         self.assertTrue(target["X"] != 123)
 
+    def test_run_refreshes_xmr_header(self):
+        from backend.models.xmr import XMR
+
+        xmr = XMR.instance(Space("TEST"), "XMR#1", XMR.Signal.INPUT, XMR.Type.LANGUAGE, XMR.InputStatus.RECEIVED, None, None)
+        self.assertEqual(XMR.InputStatus.RECEIVED, xmr.status())
+
+        assignfiller = Frame("@TEST.FRAME").add_parent("@EXE.ASSIGNFILLER-STATEMENT")
+        assignfiller["TO"] = xmr.frame
+        assignfiller["SLOT"] = "STATUS"
+        assignfiller["ASSIGN"] = "ACKNOWLEDGED"
+
+        Statement.from_instance(assignfiller).run(StatementScope(), None)
+        self.assertEqual(XMR.InputStatus.ACKNOWLEDGED, xmr.status())
+
     def test_run_variable_to(self):
         assignfiller = Frame("@TEST.FRAME").add_parent("@EXE.ASSIGNFILLER-STATEMENT")
         target = Frame("@TEST.TARGET")
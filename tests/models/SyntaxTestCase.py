@@ -0,0 +1,37 @@
+from backend.models.syntax import Syntax
+
+import unittest
+
+
+class SyntaxTestCase(unittest.TestCase):
+
+    def syntax(self) -> Syntax:
+        return Syntax({
+            "basicDeps": [["ROOT", -1, 0], ["COMP", 0, 1], ["SUBJECT", 1, 0], ["DIRECTOBJECT", 1, 3], ["ART", 3, 2]],
+            "sentence": "Let's build a chair.",
+            "0": {"token": "LET_US"},
+            "1": {"token": "BUILD"},
+            "2": {"token": "A"},
+            "3": {"token": "CHAIR"}
+        })
+
+    def test_index(self):
+        syntax = self.syntax()
+
+        self.assertEqual(["0", "1", "2", "3"], sorted(syntax.index.keys()))
+        self.assertEqual({"token": "CHAIR"}, syntax.index["3"])
+
+    def test_find_dependencies(self):
+        syntax = self.syntax()
+
+        self.assertEqual(5, len(syntax.find_dependencies()))
+        self.assertEqual([["SUBJECT", 1, 0]], syntax.find_dependencies(types="SUBJECT"))
+        self.assertEqual([["SUBJECT", 1, 0], ["DIRECTOBJECT", 1, 3]], syntax.find_dependencies(governors=1))
+        self.assertEqual([["ROOT", -1, 0], ["SUBJECT", 1, 0]], syntax.find_dependencies(dependents=[0]))
+        self.assertEqual([["COMP", 0, 1], ["DIRECTOBJECT", 1, 3]], syntax.find_dependencies(types=["DIRECTOBJECT", "COMP"]))
+        self.assertEqual([["DIRECTOBJECT", 1, 3]], syntax.find_dependencies(types=["DIRECTOBJECT", "SUBJECT"], governors=1, dependents=3))
+        self.assertEqual([], syntax.find_dependencies(types="SUBJECT", governors=0))
+        self.assertEqual([], syntax.find_dependencies(types="MISSING"))
+
+    def test_find_dependencies_without_dependencies(self):
+        self.assertEqual([], Syntax({"basicDeps": {}}).find_dependencies(types="SUBJECT"))
@@ -2,6 +2,7 @@ from backend.models.tmr import TMR, TMRFrame
 from backend.utils.AtomicCounter import AtomicCounter
 from ontograph import graph
 from ontograph.Frame import Frame
+from ontograph.Index import Identifier
 from ontograph.Space import Space
 
 from pkgutil import get_data
@@ -15,6 +16,7 @@ class TMRTestCase(unittest.TestCase):
         super().setUp()
         graph.reset()
         TMR.counter = AtomicCounter()
+        TMRFrame.slot_kinds.invalidate()
 
         Frame("@ONT.ALL")
         Frame("@ONT.OBJECT").add_parent("@ONT.ALL")
@@ -57,6 +59,34 @@ class TMRTestCase(unittest.TestCase):
         self.assertTrue(Frame("@TMR#1.BUILD.1")["AGENT"] == Frame("@TMR#1.SET.1"))
         self.assertTrue(Frame("@TMR#1.BUILD.1")["THEME"][0] ^ "@ONT.OBJECT")
 
+    def test_tmr_rows(self):
+        Frame("@ONT.RELATION").add_parent("@ONT.PROPERTY")
+        Frame("@ONT.THEME").add_parent("@ONT.RELATION")
+
+        tmr = {
+            "sentence": "",
+            "syntax": [{"basicDeps": {}}],
+            "tmr": [{"results": [{"TMR": {
+                "BUILD-1": {"concept": "BUILD", "THEME": "CHAIR-1", "TIME": "PRESENT", "sent-word-ind": [0, [1]]},
+                "CHAIR-1": {"concept": "CHAIR", "THEME": "TABLE-1", "sent-word-ind": [0, [3]]},
+            }}]}]
+        }
+
+        batch = TMR.rows(tmr, "TMR#9")
+
+        self.assertEqual("TMR#9", batch.namespace)
+        self.assertIn(("@TMR#9.BUILD.1", "THEME", "LOC", Identifier("@TMR#9.CHAIR.1")), batch.rows)
+        self.assertIn(("@TMR#9.BUILD.1", "TIME", "LOC", "PRESENT"), batch.rows)
+        self.assertIn(("@TMR#9.CHAIR.1", "THEME", "LOC", Identifier("@ONT.TABLE.1")), batch.rows)
+        self.assertEqual(["@ONT.TABLE.1"], batch.declared)
+        self.assertNotIn("TMR#9", list(map(lambda space: space.name, graph)))
+
+        space = batch.commit()
+
+        self.assertEqual(Frame("@TMR#9.CHAIR.1"), Frame("@TMR#9.BUILD.1")["THEME"][0])
+        self.assertTrue(Frame("@TMR#9.BUILD.1") ^ "@ONT.BUILD")
+        self.assertEqual(2, len(list(space)))
+
     def test_tmr_is_event_or_object(self):
         tmr = TMR.from_contents()
         tmr = tmr.space()
@@ -158,6 +188,48 @@ class TMRTestCase(unittest.TestCase):
         self.assertIn(o2, results)
         self.assertIn(o3, results)
 
+    def test_tmr_summary(self):
+        Frame("@ONT.PHYSICAL-OBJECT").add_parent("@ONT.OBJECT")
+        Frame("@ONT.RELATION").add_parent("@ONT.PROPERTY")
+        Frame("@ONT.PURPOSE-OF").add_parent("@ONT.RELATION")
+
+        tmr_dict = {
+            "sentence": "Test.",
+            "syntax": [{"basicDeps": {}}],
+            "tmr": [{"results": [{"TMR": {
+                "EVENT-1": {"concept": "EVENT", "PURPOSE-OF": "EVENT-2", "TIME": [[">", "FIND-ANCHOR-TIME"]]},
+                "EVENT-2": {"concept": "EVENT"},
+                "OBJECT-1": {"concept": "PHYSICAL-OBJECT"}
+            }}]}]
+        }
+
+        tmr = TMR.from_json(tmr_dict)
+        space = tmr.space().name
+
+        # The summary is computed on ingestion, and stored with the TMR
+        summary = tmr.frame["SUMMARY"].singleton()
+        self.assertEqual("@" + space + ".EVENT.2", summary.main_event)
+        self.assertTrue(summary.prefix)
+        self.assertFalse(summary.postfix)
+        self.assertEqual(["@" + space + ".OBJECT.1"], summary.find_by_concept("OBJECT"))
+        self.assertEqual(["@" + space + ".OBJECT.1"], summary.find_by_concept("@ONT.PHYSICAL-OBJECT"))
+        self.assertEqual(Frame("@" + space + ".EVENT.2"), tmr.root())
+
+        # Changes to the space after ingestion are not seen until the TMR is summarized again
+        Frame("@" + space + ".OBJECT.2").add_parent("@ONT.OBJECT")
+        self.assertEqual(1, len(tmr.find_by_concept("@ONT.OBJECT")))
+        tmr.summarize()
+        self.assertEqual(2, len(tmr.find_by_concept("@ONT.OBJECT")))
+
+    def test_tmr_frame_tmr(self):
+        tmr = TMR.from_contents()
+        other = TMR.from_contents()
+
+        event = TMRFrame("@" + tmr.space().name + ".EVENT.1")
+
+        self.assertEqual(tmr, event.tmr())
+        self.assertNotEqual(other, event.tmr())
+
     def test_render(self):
         tmr = Frame("@TEST.TMR")
 
@@ -173,6 +245,7 @@ class TMRFrameTestCase(unittest.TestCase):
     def setUp(self):
         super().setUp()
         graph.reset()
+        TMRFrame.slot_kinds.invalidate()
 
         # self.n = Network()
         # self.n.register("INPUTS")
@@ -223,6 +296,25 @@ class TMRFrameTestCase(unittest.TestCase):
         self.assertFalse(isinstance(instance["EXTRA-ONTOLOGICAL"][0], Frame))
         self.assertFalse(isinstance(instance["SECOND-ORDER-PROPERTY"][0], Frame))
 
+    def test_slot_kinds(self):
+        Frame("@ONT.RELATION").add_parent("@ONT.PROPERTY")
+        Frame("@ONT.ONTOLOGY-SLOT").add_parent("@ONT.PROPERTY")
+        Frame("@ONT.ATTRIBUTE").add_parent("@ONT.PROPERTY")
+        Frame("@ONT.THEME").add_parent("@ONT.RELATION")
+
+        self.assertTrue(TMRFrame.slot_kinds.is_reference("RELATION"))
+        self.assertTrue(TMRFrame.slot_kinds.is_reference("THEME"))
+        self.assertTrue(TMRFrame.slot_kinds.is_reference("ONTOLOGY-SLOT"))
+        self.assertFalse(TMRFrame.slot_kinds.is_reference("ATTRIBUTE"))
+        self.assertFalse(TMRFrame.slot_kinds.is_reference("UNKNOWN"))
+
+        # The table is only rebuilt once invalidated
+        Frame("@ONT.AGENT").add_parent("@ONT.RELATION")
+        self.assertFalse(TMRFrame.slot_kinds.is_reference("AGENT"))
+
+        TMRFrame.slot_kinds.invalidate()
+        self.assertTrue(TMRFrame.slot_kinds.is_reference("AGENT"))
+
     def test_tmr_imported_maps_unknown_identifiers_to_ontology(self):
         Frame("@ONT.RELATION").add_parent("@ONT.PROPERTY")
         Frame("@ONT.MADE-OF").add_parent("@ONT.RELATION")
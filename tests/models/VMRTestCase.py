@@ -1,3 +1,4 @@
+from backend.models.environment import Environment
 from backend.models.vmr import VMR
 from ontograph import graph
 from ontograph.Frame import Frame
@@ -13,6 +14,7 @@ class VMRTestCase(unittest.TestCase):
     def setUp(self):
         super().setUp()
         graph.reset()
+        Environment.clear_shared()
 
         Frame("@ONT.ALL")
         Frame("@ONT.OBJECT").add_parent("@ONT.ALL")
@@ -170,8 +172,6 @@ class VMRTestCase(unittest.TestCase):
         self.assertEqual([object1], Frame("@VMR#1.PHYSICAL-EVENT.2")["THEME"])
 
     def test_vmr_update_environment(self):
-        from backend.models.environment import Environment
-
         loc1 = Frame("@ENV.LOCATION.?")
         loc2 = Frame("@ENV.LOCATION.?")
         human1 = Frame("@ENV.HUMAN.?")
@@ -199,7 +199,7 @@ class VMRTestCase(unittest.TestCase):
         vmr = VMR.from_json(input1)
         vmr.update_environment(Space("ENV"))
 
-        e = Environment(Space("ENV"))
+        e = Environment.of(Space("ENV"))
         self.assertEqual(Frame("@ONT.LOCATION"), e.location(human1))
         self.assertEqual(Frame("@ENV.LOCATION.1"), e.location(object1))
         with self.assertRaises(Exception):
@@ -226,12 +226,141 @@ class VMRTestCase(unittest.TestCase):
         vmr = VMR.from_json(input2)
         vmr.update_environment(Space("ENV"))
 
-        e = Environment(Space("ENV"))
+        e = Environment.of(Space("ENV"))
         self.assertEqual(Frame("@ONT.LOCATION"), e.location(human2))
         self.assertEqual(Frame("@ENV.LOCATION.2"), e.location(object1))
         with self.assertRaises(Exception):
             e.location(human1)
 
+    def test_vmr_update_environment_applies_deltas(self):
+        loc1 = Frame("@ENV.LOCATION.?")
+        loc2 = Frame("@ENV.LOCATION.?")
+        human1 = Frame("@ENV.HUMAN.?")
+        human2 = Frame("@ENV.HUMAN.?")
+        object1 = Frame("@ENV.OBJECT.?")
+
+        def scene(human1: str, human2: str, object1: str) -> dict:
+            return {
+                "ENVIRONMENT": {
+                    "_refers_to": "ENV",
+                    "timestamp": "...",
+                    "contains": {
+                        "@ENV.HUMAN.1": {"LOCATION": human1},
+                        "@ENV.HUMAN.2": {"LOCATION": human2},
+                        "@ENV.OBJECT.1": {"LOCATION": object1}
+                    }
+                }
+            }
+
+        delta = VMR.from_json(scene("HERE", "NOT-HERE", "@ENV.LOCATION.1")).update_environment(Space("ENV"))
+        self.assertEqual({"entered": ["@ENV.HUMAN.1", "@ENV.OBJECT.1"], "exited": [], "moved": []}, {k: sorted(v) for k, v in delta.items()})
+
+        delta = VMR.from_json(scene("HERE", "NOT-HERE", "@ENV.LOCATION.1")).update_environment(Space("ENV"))
+        self.assertEqual({"entered": [], "exited": [], "moved": []}, delta)
+
+        delta = VMR.from_json(scene("NOT-HERE", "HERE", "@ENV.LOCATION.2")).update_environment(Space("ENV"))
+        self.assertEqual({"entered": ["@ENV.HUMAN.2"], "exited": ["@ENV.HUMAN.1"], "moved": ["@ENV.OBJECT.1"]}, delta)
+
+        e = Environment.of(Space("ENV"))
+        self.assertEqual(3, len(e.history()))
+        self.assertEqual(Frame("@ONT.LOCATION"), e.location(human2))
+        self.assertEqual(Frame("@ENV.LOCATION.2"), e.location(object1))
+        self.assertEqual(Frame("@ENV.LOCATION.1"), e.location(object1, epoch=1))
+        with self.assertRaises(Exception):
+            e.location(human1)
+
+    def test_vmr_update_environment_records_changes(self):
+        loc1 = Frame("@ENV.LOCATION.?")
+        loc2 = Frame("@ENV.LOCATION.?")
+        human = Frame("@ENV.HUMAN.?")
+
+        def scene(location: str) -> dict:
+            return {
+                "ENVIRONMENT": {
+                    "_refers_to": "ENV",
+                    "timestamp": "...",
+                    "contains": {
+                        "@ENV.HUMAN.1": {"LOCATION": location}
+                    }
+                }
+            }
+
+        vmr1 = VMR.from_json(scene("@ENV.LOCATION.1"))
+        vmr1.update_environment(Space("ENV"))
+        vmr2 = VMR.from_json(scene("@ENV.LOCATION.2"))
+        vmr2.update_environment(Space("ENV"))
+        vmr3 = VMR.from_json(scene("NOT-HERE"))
+        vmr3.update_environment(Space("ENV"))
+
+        change = vmr1.changes()[0]
+        self.assertEqual("ENTERED", change["TYPE"].singleton())
+        self.assertEqual(human, change["OBJECT"].singleton())
+        self.assertEqual(loc1, change["TO"].singleton())
+
+        change = vmr2.changes()[0]
+        self.assertEqual("MOVED", change["TYPE"].singleton())
+        self.assertEqual(loc1, change["FROM"].singleton())
+        self.assertEqual(loc2, change["TO"].singleton())
+
+        self.assertEqual(["EXITED"], list(map(lambda change: change["TYPE"].singleton(), vmr3.changes())))
+
+        # Rendering formats the recorded changes, regardless of how the environment has changed since
+        Environment.of(Space("ENV")).advance()
+        self.assertEqual("I see that @ENV.HUMAN.1 moved from the @ENV.LOCATION.1 to the @ENV.LOCATION.2.", vmr2.render())
+
+    def test_vmr_archive_clears_changes(self):
+        Frame("@ENV.LOCATION.?")
+        Frame("@ENV.HUMAN.?")
+
+        vmr = VMR.from_json({
+            "ENVIRONMENT": {
+                "_refers_to": "ENV",
+                "timestamp": "...",
+                "contains": {
+                    "@ENV.HUMAN.1": {"LOCATION": "@ENV.LOCATION.1"}
+                }
+            }
+        })
+        vmr.update_environment(Space("ENV"))
+        rendered = vmr.render()
+        self.assertEqual(1, len(vmr.changes()))
+
+        # The change records are removed with the space, and so are not left referenced by the archived frame
+        vmr.archive()
+        self.assertNotIn("HAS-CHANGE", vmr.frame)
+        self.assertEqual([], vmr.changes())
+        self.assertEqual(rendered, vmr.render())
+
+    def test_vmr_update_environment_keeps_interval_index(self):
+        loc1 = Frame("@ENV.LOCATION.?")
+        loc2 = Frame("@ENV.LOCATION.?")
+        human = Frame("@ENV.HUMAN.?")
+
+        def scene(location: str) -> dict:
+            return {
+                "ENVIRONMENT": {
+                    "_refers_to": "ENV",
+                    "timestamp": "...",
+                    "contains": {
+                        "@ENV.HUMAN.1": {"LOCATION": location}
+                    }
+                }
+            }
+
+        VMR.from_json(scene("@ENV.LOCATION.1")).update_environment(Space("ENV"))
+        index = Environment.of(Space("ENV"))._index()
+
+        # Later updates extend the same index, rather than each building a new one
+        VMR.from_json(scene("@ENV.LOCATION.2")).update_environment(Space("ENV"))
+        VMR.from_json(scene("@ENV.LOCATION.2")).update_environment(Space("ENV"))
+
+        env = Environment.of(Space("ENV"))
+        self.assertIs(index, env._index())
+
+        epochs = env.history()
+        self.assertEqual([(loc1, epochs[0], epochs[0]), (loc2, epochs[1], epochs[2])], env.movements(human))
+        self.assertEqual(loc1, env.location(human, epoch=0))
+
     def test_vmr_update_working_memory(self):
         Frame("@WM.PHYSICAL-EVENT.?")
 
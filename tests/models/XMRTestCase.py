@@ -1,7 +1,8 @@
 # from backend.models.graph import Frame, Literal, Network
+from backend.models.environment import Environment
 from backend.models.tmr import TMR
 from backend.models.vmr import VMR
-from backend.models.xmr import AMR, MMR, XMR
+from backend.models.xmr import AMR, MMR, XMR, XMRHeader
 from ontograph import graph
 from ontograph.Frame import Frame
 from ontograph.Space import Space
@@ -73,6 +74,34 @@ class XMRTestCase(unittest.TestCase):
 
         self.assertEqual(now, XMR(frame).timestamp())
 
+    def test_header(self):
+        source = Frame("@TEST.SOURCE")
+        xmr = XMR.instance(Space("TEST"), "XMR#1", XMR.Signal.INPUT, XMR.Type.LANGUAGE, XMR.InputStatus.RECEIVED, source, "@TEST.ROOT")
+
+        # The header is created with the XMR
+        header = xmr.frame["HEADER"].singleton()
+        self.assertIsInstance(header, XMRHeader)
+        self.assertEqual(XMR.Signal.INPUT, header.signal)
+        self.assertEqual(XMR.Type.LANGUAGE, header.type)
+        self.assertEqual(XMR.InputStatus.RECEIVED, header.status)
+        self.assertEqual(source, header.source)
+        self.assertEqual("XMR#1", header.space)
+        self.assertEqual(xmr.frame["TIMESTAMP"].singleton(), header.timestamp)
+
+        # Setting the status (or timestamp) refreshes the header
+        xmr.set_status(XMR.InputStatus.ACKNOWLEDGED)
+        self.assertEqual(XMR.InputStatus.ACKNOWLEDGED, XMR(xmr.frame).status())
+
+        xmr.set_timestamp(123.0)
+        self.assertEqual(123.0, XMR(xmr.frame).timestamp())
+
+        # Otherwise the header is trusted; other writes to its slots must refresh it
+        xmr.frame["STATUS"] = "UNDERSTOOD"
+        self.assertEqual(XMR.InputStatus.ACKNOWLEDGED, XMR(xmr.frame).status())
+
+        XMRHeader.refresh(xmr.frame)
+        self.assertEqual(XMR.InputStatus.UNDERSTOOD, XMR(xmr.frame).status())
+
     def test_root(self):
         root = Frame("@TEST.ROOT")
 
@@ -196,6 +225,25 @@ class AMRTestCase(unittest.TestCase):
 
         self.assertEqual("I am taking the GET(@ENV.BRACKET.1) action.", amr.render())
 
+    def test_render_archived(self):
+        Frame("@SELF.ROBOT.?")
+        Frame("@ENV.BRACKET.?")
+
+        root = Frame("@AMR.GET.?")
+        root["AGENT"] = Frame("@SELF.ROBOT.1")
+        root["THEME"] = Frame("@ENV.BRACKET.1")
+        Frame("@AMR.OBJECT.?")
+
+        amr = AMR.instance(Space("SELF"), "AMR", XMR.Signal.OUTPUT, XMR.Type.ACTION, XMR.OutputStatus.PENDING, "@SELF.ROBOT.1", root)
+        amr.archive()
+
+        # The root frame is kept (so ROOT does not dangle), and the rendering no longer reads it
+        self.assertEqual([root], list(Space("AMR")))
+        self.assertEqual(root, amr.root())
+
+        del root["THEME"]
+        self.assertEqual("I am taking the GET(@ENV.BRACKET.1) action.", amr.render())
+
 
 class MMRTestCase(unittest.TestCase):
 
@@ -236,6 +284,7 @@ class VMRTestCase(unittest.TestCase):
 
     def setUp(self):
         graph.reset()
+        Environment.clear_shared()
 
         self.env = Space("ENV")
         self.ont = Space("ONT")
@@ -249,12 +298,10 @@ class VMRTestCase(unittest.TestCase):
         self.assertEqual("@TEST.VMR.1", VMR(f).render())
 
     def test_render_entered_location(self):
-        from backend.models.environment import Environment
-
         human = Frame("@TEST.HUMAN")
         location = Frame("@TEST.LOCATION")
 
-        env = Environment(self.env)
+        env = Environment.of(self.env)
 
         epoch = env.advance()
         env.enter(human, location)
@@ -271,13 +318,11 @@ class VMRTestCase(unittest.TestCase):
         self.assertEqual("I see that Jake is now in the environment, at the workshop.", vmr.render())
 
     def test_render_changed_location(self):
-        from backend.models.environment import Environment
-
         human = Frame("@TEST.HUMAN")
         location1 = Frame("@TEST.LOCATION.?")
         location2 = Frame("@TEST.LOCATION.?")
 
-        env = Environment(self.env)
+        env = Environment.of(self.env)
 
         epoch = env.advance()
         env.enter(human, location1)
@@ -298,12 +343,10 @@ class VMRTestCase(unittest.TestCase):
         self.assertEqual("I see that Jake moved from the workshop to the bench.", vmr.render())
 
     def test_render_left_environment(self):
-        from backend.models.environment import Environment
-
         human = Frame("@TEST.HUMAN")
         location = Frame("@TEST.LOCATION.?")
 
-        env = Environment(self.env)
+        env = Environment.of(self.env)
 
         epoch = env.advance()
         env.enter(human, location)
@@ -4,6 +4,7 @@ from backend.models.mps import AgentMethod, MPRegistry
 from backend.models.output import OutputXMRTemplate
 from backend.models.statement import AddFillerStatement, AssertStatement, AssignFillerStatement, AssignVariableStatement, ExistsStatement, ExpectationStatement, ForEachStatement, IsStatement, MakeInstanceStatement, MeaningProcedureStatement, OutputXMRStatement, TransientFrameStatement
 from backend.models.xmr import XMR
+from backend.utils.AtomicCounter import AtomicCounter
 from ontograph import graph
 from ontograph.Frame import Frame
 from ontograph.Index import Identifier
@@ -621,6 +622,7 @@ class OntoAgentProcessorDefineOutputXMRTemplateTestCase(unittest.TestCase):
 
     def setUp(self):
         graph.reset()
+        OutputXMRTemplate.counter = AtomicCounter()
         self.capability = Frame("@TEST.CAPABILITY")
 
     def test_call(self):
@@ -0,0 +1,74 @@
+from backend.utils.InputQueue import InputQueue
+
+import queue
+import threading
+import unittest
+
+
+class InputQueueTestCase(unittest.TestCase):
+
+    def test_put_and_drain(self):
+        q = InputQueue()
+        q.put({"a": 1})
+        q.put({"b": 2}, source="SOURCE", type="VISUAL")
+
+        self.assertEqual(2, len(q))
+        self.assertEqual([({"a": 1}, None, None), ({"b": 2}, "SOURCE", "VISUAL")], q.drain())
+        self.assertEqual(0, len(q))
+        self.assertEqual([], q.drain())
+
+    def test_block_times_out(self):
+        q = InputQueue(bound=1)
+        q.put({"a": 1})
+
+        with self.assertRaises(queue.Full):
+            q.put({"b": 2}, timeout=0.01)
+
+        self.assertEqual([({"a": 1}, None, None)], q.drain())
+
+    def test_block_waits_for_drain(self):
+        q = InputQueue(bound=1)
+        q.put({"a": 1})
+
+        drained = []
+        timer = threading.Timer(0.05, lambda: drained.extend(q.drain()))
+        timer.start()
+
+        q.put({"b": 2}, timeout=5)
+        timer.join()
+
+        self.assertEqual([({"a": 1}, None, None)], drained)
+        self.assertEqual([({"b": 2}, None, None)], q.drain())
+
+    def test_drop_oldest(self):
+        q = InputQueue(bound=2, policy=InputQueue.Policy.DROP_OLDEST)
+        q.put({"a": 1})
+        q.put({"b": 2})
+        q.put({"c": 3})
+
+        self.assertEqual([({"b": 2}, None, None), ({"c": 3}, None, None)], q.drain())
+        self.assertEqual(1, q.dropped)
+
+    def test_coalesce(self):
+        q = InputQueue(bound=3, policy=InputQueue.Policy.COALESCE)
+        q.put({"v": 1}, type="VISUAL")
+        q.put({"l": 1}, type="LANGUAGE")
+        q.put({"v": 2}, type="VISUAL")
+        q.put({"v": 3}, type="VISUAL")
+
+        self.assertEqual([({"l": 1}, None, "LANGUAGE"), ({"v": 2}, None, "VISUAL"), ({"v": 3}, None, "VISUAL")], q.drain())
+        self.assertEqual(1, q.coalesced)
+
+    def test_coalesce_blocks_without_visual_inputs(self):
+        q = InputQueue(bound=1, policy=InputQueue.Policy.COALESCE)
+        q.put({"l": 1}, type="LANGUAGE")
+
+        with self.assertRaises(queue.Full):
+            q.put({"v": 1}, type="VISUAL", timeout=0.01)
+
+    def test_configure(self):
+        q = InputQueue()
+        q.configure(1, "DROP-OLDEST")
+
+        self.assertEqual(1, q.bound)
+        self.assertEqual(InputQueue.Policy.DROP_OLDEST, q.policy)
@@ -0,0 +1,89 @@
+from backend.utils.SlotIndex import SlotIndex
+from ontograph import graph
+from ontograph.Frame import Frame
+
+import unittest
+
+
+class SlotIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        graph.reset()
+
+        self.index = SlotIndex()
+        self.index.declare("XYZ")
+
+    def test_lookup(self):
+        f1 = Frame("@TEST.FRAME.?")
+        f2 = Frame("@TEST.FRAME.?")
+        f3 = Frame("@TEST.FRAME.?")
+
+        self.index.set(f1, "XYZ", 1)
+        self.index.set(f2, "XYZ", 1)
+        self.index.add(f3, "XYZ", 2)
+
+        self.assertEqual(1, f1["XYZ"].singleton())
+        self.assertEqual([f1, f2], self.index.lookup("XYZ", 1))
+        self.assertEqual([f3], self.index.lookup("XYZ", 2))
+        self.assertEqual([], self.index.lookup("XYZ", 3))
+
+    def test_lookup_frame_fillers(self):
+        f1 = Frame("@TEST.FRAME.?")
+        filler = Frame("@TEST.FILLER")
+
+        self.index.set(f1, "XYZ", filler)
+
+        self.assertEqual([f1], self.index.lookup("XYZ", filler))
+        self.assertEqual([f1], self.index.lookup("XYZ", "@TEST.FILLER"))
+
+    def test_maintained_on_write(self):
+        f1 = Frame("@TEST.FRAME.?")
+
+        self.index.set(f1, "XYZ", 1)
+        self.index.set(f1, "XYZ", 2)
+        self.assertEqual([], self.index.lookup("XYZ", 1))
+        self.assertEqual([f1], self.index.lookup("XYZ", 2))
+
+        self.index.remove(f1, "XYZ", 2)
+        self.assertEqual([], self.index.lookup("XYZ", 2))
+
+    def test_stale_entries_are_dropped(self):
+        f1 = Frame("@TEST.FRAME.?")
+        f2 = Frame("@TEST.FRAME.?")
+
+        self.index.set(f1, "XYZ", 1)
+        self.index.set(f2, "XYZ", 1)
+
+        # Frames deleted (or changed) without going through the index are not returned
+        f1.delete()
+        f2["XYZ"] = 2
+
+        self.assertEqual([], self.index.lookup("XYZ", 1))
+
+    def test_built_on_first_lookup(self):
+        f1 = Frame("@TEST.FRAME.?")
+        f2 = Frame("@TEST.FRAME.?")
+        f3 = Frame("@TEST.FRAME.?")
+
+        # Written without going through the index, before the first lookup
+        f1["XYZ"] = 1
+        f2["XYZ"] = 1
+        self.index.set(f3, "XYZ", 1)
+
+        self.assertEqual([f1, f2, f3], self.index.lookup("XYZ", 1))
+        self.assertEqual({f1.id, f2.id, f3.id}, self.index._index["XYZ"][1])
+
+        # Once built, lookups are answered from the index alone
+        f4 = Frame("@TEST.FRAME.?")
+        f4["XYZ"] = 2
+        self.assertEqual([], self.index.lookup("XYZ", 2))
+
+        # Clearing the index builds it again on the next lookup
+        self.index.clear()
+        self.assertEqual([f4], self.index.lookup("XYZ", 2))
+
+    def test_undeclared_slots_query_the_graph(self):
+        f1 = Frame("@TEST.FRAME.?")
+        f1["ABC"] = 1
+
+        self.assertEqual([f1], self.index.lookup("ABC", 1))